@@ -0,0 +1,7 @@
+"""Offline benchmark suite for the policy agent.
+
+- `stand_in`: deterministic local LLM clients (a configurable stand-in and a
+  record/replay wrapper) registered in the `src.clients` registry.
+- `synth`: generator of synthetic Solidity repositories.
+- `run`: times every pipeline stage and writes machine-readable results.
+"""
@@ -0,0 +1,346 @@
+"""Time the policy agent pipeline offline and write machine-readable results.
+
+Each stage is run `--repeat` times against a synthetic repository (or
+`--target-path`) with a local client, and min/median/mean/max seconds are
+recorded per stage:
+
+- `discovery`: the pruned `.sol` walk.
+- `ingest`: discovery plus parallel reads and de-duplication.
+- `build_combined_prompt`: `AgentRunner.build_combined_prompt`.
+- `agent_round_trip`: one `Agent.run` against the client.
+- `format_policy_json`: parsing the agent's response.
+- `write_output`: `AgentRunner.write_output`.
+
+Results are written as JSON to `--output`. With `--compare BASELINE` the stage
+medians are compared to an earlier result, and the exit status is 1 when a
+stage is slower than `--max-regression` allows.
+
+Usage:
+    python -m benchmarks.run --files 200 --latency 0.05 --repeat 5
+    python -m benchmarks.run --target-path ../bridge --client google --record rec.json
+    python -m benchmarks.run --target-path ../bridge --replay rec.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+if __name__ == "__main__" and __package__ is None:
+    # add repo root to sys.path so absolute imports like `src.agent_runner` work
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from datapizza.agents import Agent
+
+import benchmarks.stand_in  # noqa: F401 (registers the benchmark providers)
+from benchmarks.synth import generate_repo
+from src.agent_runner import AgentRunner
+from src.chunking import estimate_tokens
+from src.clients import get_client
+from src.formatter import format_policy_json
+from src.ingest import peak_memory_bytes, walk_sol_files
+from src.tools import list_sol_files, read_sol_file
+
+logger = logging.getLogger("policy_agent.benchmarks")
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = REPO_ROOT / "benchmarks" / "results"
+RESULTS_SCHEMA = 1
+
+BENCH_PROMPT = (
+    "You are an assistant that extracts cross-chain policy recommendations from "
+    "Solidity source code. Produce JSON with an array named 'policy'."
+)
+
+STAGES = (
+    "discovery",
+    "ingest",
+    "build_combined_prompt",
+    "agent_round_trip",
+    "format_policy_json",
+    "write_output",
+)
+
+
+def _version() -> str:
+    """Return the latest released version from CHANGELOG.md, or "unknown"."""
+    try:
+        for line in (REPO_ROOT / "CHANGELOG.md").read_text().splitlines():
+            if line.startswith("#") and "[" in line:
+                return line.split("[", 1)[1].split("]", 1)[0]
+    except OSError:
+        pass
+    return "unknown"
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Return the samples with their min/median/mean/max, in seconds."""
+    return {
+        "samples": samples,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "max": max(samples),
+    }
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> Tuple[Any, List[float]]:
+    samples = []
+    result = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return result, samples
+
+
+def run_suite(
+    target_path: str,
+    client: Any,
+    output_file: str,
+    repeat: int = 3,
+    prune: bool = False,
+    prompt_text: str = BENCH_PROMPT,
+) -> Dict[str, Any]:
+    """Time every pipeline stage over `target_path` with `client`.
+
+    Args:
+        target_path: Folder of Solidity sources.
+        client: The datapizza client answering the agent.
+        output_file: Where `write_output` writes the policy.
+        repeat: Number of timed runs per stage.
+        prune: Benchmark the pruned prompt instead of verbatim sources.
+        prompt_text: System prompt used for the run.
+
+    Returns:
+        The corpus description and per-stage timings.
+    """
+    runner = AgentRunner(
+        prompt_text, target_path, output_file, client=client, prune=prune
+    )
+    timings: Dict[str, List[float]] = {}
+
+    _, timings["discovery"] = _timed(
+        lambda: walk_sol_files(target_path, runner.ingest_config), repeat
+    )
+    ingested, timings["ingest"] = _timed(runner.ingest_sources, repeat)
+    prompt, timings["build_combined_prompt"] = _timed(
+        runner.build_combined_prompt, repeat
+    )
+
+    def round_trip() -> str:
+        agent = Agent(
+            name="policy_agent",
+            system_prompt=prompt_text,
+            client=client,
+            tools=[list_sol_files, read_sol_file],
+        )
+        return agent.run(prompt).text
+
+    text, timings["agent_round_trip"] = _timed(round_trip, repeat)
+    out, timings["format_policy_json"] = _timed(
+        lambda: format_policy_json(text), repeat
+    )
+    _, timings["write_output"] = _timed(lambda: runner.write_output(out), repeat)
+
+    return {
+        "corpus": {
+            "files": ingested.stats.files,
+            "bytes": ingested.stats.bytes,
+            "duplicates": ingested.stats.duplicates,
+            "prompt_chars": len(prompt),
+            "estimated_prompt_tokens": estimate_tokens(prompt),
+            "response_chars": len(text),
+            "policy_entries": len(out["policy"]),
+        },
+        "stages": {name: summarize(timings[name]) for name in STAGES},
+    }
+
+
+def compare(
+    result: Dict[str, Any], baseline: Dict[str, Any], max_regression: float
+) -> List[str]:
+    """Compare stage medians against a baseline result.
+
+    Returns:
+        One message per stage whose median grew by more than `max_regression`
+        (a fraction, e.g. 0.2 for 20%).
+    """
+    failures = []
+    for name, stage in result["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if not base or base["median"] <= 0:
+            continue
+        ratio = stage["median"] / base["median"]
+        logger.info(
+            "%-22s %.6fs vs %.6fs (x%.2f)", name, stage["median"], base["median"], ratio
+        )
+        if ratio > 1 + max_regression:
+            failures.append(
+                f"{name}: median {stage['median']:.6f}s is x{ratio:.2f} the baseline "
+                f"{base['median']:.6f}s"
+            )
+    return failures
+
+
+def _client(args: argparse.Namespace) -> Any:
+    if args.replay:
+        return get_client(
+            "replay", {"path": args.replay, "latency_scale": args.latency_scale}
+        )
+    cfg = {
+        "latency": args.latency,
+        "tokens_per_second": args.tokens_per_second,
+        "entries": args.entries,
+        "pad_chars": args.pad_chars,
+    }
+    if args.record:
+        return get_client(
+            "record", {"path": args.record, "provider": args.client, **cfg}
+        )
+    return get_client(args.client, cfg)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """CLI entry point of the benchmark suite."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    corpus = parser.add_argument_group("corpus")
+    corpus.add_argument(
+        "--target-path",
+        help="Benchmark an existing folder instead of a synthetic repository",
+    )
+    corpus.add_argument("--files", type=int, default=50)
+    corpus.add_argument("--functions", type=int, default=8)
+    corpus.add_argument("--bridge-ratio", type=float, default=0.25)
+    corpus.add_argument("--vendored", type=int, default=10)
+    corpus.add_argument("--seed", type=int, default=0)
+
+    client = parser.add_argument_group("client")
+    client.add_argument(
+        "--client",
+        default="stand-in",
+        help="Registered provider answering the agent (default: stand-in)",
+    )
+    client.add_argument("--latency", type=float, default=0.0)
+    client.add_argument("--tokens-per-second", type=float, default=0.0)
+    client.add_argument("--entries", type=int, default=None)
+    client.add_argument("--pad-chars", type=int, default=0)
+    client.add_argument(
+        "--record", help="Record the --client responses to this JSON file"
+    )
+    client.add_argument("--replay", help="Replay responses from this recording")
+    client.add_argument(
+        "--latency-scale",
+        type=float,
+        default=0.0,
+        help="Replay the recorded latency scaled by this factor",
+    )
+
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--prune", action="store_true")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/)")
+    parser.add_argument("--compare", help="Baseline results file to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    logger.setLevel(logging.INFO)
+    # the agent's console panels would otherwise dominate the round-trip timing;
+    # export DATAPIZZA_AGENT_LOG_LEVEL=DEBUG to include them
+    os.environ.setdefault(
+        "DATAPIZZA_AGENT_LOG_LEVEL", "INFO" if args.verbose else "WARNING"
+    )
+
+    started = datetime.now(timezone.utc)
+    with tempfile.TemporaryDirectory(prefix="policy-bench-") as tmp:
+        corpus_config: Dict[str, Any]
+        if args.target_path:
+            target = args.target_path
+            corpus_config = {"target_path": target}
+        else:
+            target = str(Path(tmp) / "repo")
+            corpus_config = {
+                "files": args.files,
+                "functions": args.functions,
+                "bridge_ratio": args.bridge_ratio,
+                "vendored": args.vendored,
+                "seed": args.seed,
+            }
+            generate_repo(target, **corpus_config)
+        suite = run_suite(
+            target,
+            _client(args),
+            str(Path(tmp) / "policy.json"),
+            repeat=args.repeat,
+            prune=args.prune,
+        )
+
+    result = {
+        "schema": RESULTS_SCHEMA,
+        "created": started.isoformat(timespec="seconds"),
+        "version": _version(),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "corpus": corpus_config,
+            "client": "replay" if args.replay else args.client,
+            "latency": args.latency,
+            "tokens_per_second": args.tokens_per_second,
+            "entries": args.entries,
+            "pad_chars": args.pad_chars,
+            "repeat": args.repeat,
+            "prune": args.prune,
+        },
+        **suite,
+        "peak_memory": peak_memory_bytes(),
+    }
+
+    output = Path(
+        args.output
+        or RESULTS_DIR
+        / f"bench-{result['version']}-{started.strftime('%Y%m%dT%H%M%SZ')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    for name, stage in result["stages"].items():
+        logger.info("%-22s median %.6fs", name, stage["median"])
+    logger.info("Wrote benchmark results to %s", output)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        failures = compare(result, baseline, args.max_regression)
+        for failure in failures:
+            logger.error("Regression: %s", failure)
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
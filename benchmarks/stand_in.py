@@ -0,0 +1,392 @@
+"""Deterministic local LLM clients for offline benchmarks.
+
+`StandInClient` answers every prompt with a synthetic policy derived from the
+functions it contains, after a configurable latency, so the pipeline can be
+timed without a network round-trip. `RecordReplayClient` records the responses
+of a real provider to a JSON file and replays them later, so real model output
+can be benchmarked repeatably.
+
+Importing this module registers three providers in `src.clients`:
+
+- `stand-in`: `StandInClient` (cfg: latency, tokens_per_second, entries,
+  pad_chars, chunk_chars, model).
+- `record`: `RecordReplayClient` wrapping `get_client(cfg["provider"], cfg)`
+  (cfg: path, provider and the wrapped provider's keys).
+- `replay`: `RecordReplayClient` answering from a recording (cfg: path,
+  latency_scale).
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from datapizza.core.clients import ClientResponse
+from datapizza.core.clients.client import Client
+from datapizza.type import Block, FunctionCallBlock, TextBlock
+
+from src.cache import make_key
+from src.chunking import estimate_tokens
+from src.clients import get_client, register
+
+logger = logging.getLogger("policy_agent.benchmarks")
+
+_FUNCTION_RE = re.compile(r"function\s+(\w+)\s*\(")
+
+RECORDING_VERSION = 1
+
+
+def _input_text(input: List[Block]) -> str:
+    return "\n".join(b.content for b in input if isinstance(b, TextBlock))
+
+
+class StandInClient(Client):
+    """A local client returning a deterministic policy after a simulated delay.
+
+    The response lists one entry per `function <name>(` found in the prompt,
+    each emitting `<name>Event`, in fenced JSON preceded by `pad_chars` of
+    filler prose. The same prompt always produces the same response.
+
+    Attributes:
+        latency: Seconds slept before the first output token.
+        tokens_per_second: Simulated generation speed (0 means instantaneous).
+        entries: Exact number of policy entries to return; None means one per
+            function in the prompt. Names are reused with a numeric suffix when
+            more entries than functions are requested.
+        pad_chars: Characters of filler text added around the JSON.
+        chunk_chars: Size of each delta in streaming mode.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        tokens_per_second: float = 0.0,
+        entries: Optional[int] = None,
+        pad_chars: int = 0,
+        chunk_chars: int = 64,
+        model: str = "stand-in",
+        system_prompt: str = "",
+    ):
+        super().__init__(model_name=model, system_prompt=system_prompt)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.entries = entries
+        self.pad_chars = pad_chars
+        self.chunk_chars = max(1, chunk_chars)
+
+    def response_text(self, prompt: str) -> str:
+        """Return the response the client gives for `prompt`."""
+        names = list(dict.fromkeys(_FUNCTION_RE.findall(prompt)))
+        if self.entries is not None:
+            base = names or ["fn"]
+            names = [
+                base[i % len(base)] + (str(i // len(base)) if i >= len(base) else "")
+                for i in range(self.entries)
+            ]
+        policy = [
+            {
+                "sourceFunction": {"name": n, "events": [f"{n}Event"]},
+                "destinationFunction": {"name": n},
+            }
+            for n in names
+        ]
+        filler = ("Analysis of the provided contracts. " * (self.pad_chars // 36 + 1))[
+            : self.pad_chars
+        ]
+        body = json.dumps({"policy": policy}, indent=2)
+        return f"{filler}\n```json\n{body}\n```\n"
+
+    def _generation_seconds(self, text: str) -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return estimate_tokens(text) / self.tokens_per_second
+
+    def _response(self, prompt: str, text: str, delta: str | None = None):
+        return ClientResponse(
+            content=[TextBlock(content=text)],
+            delta=delta,
+            stop_reason="stop",
+            prompt_tokens_used=estimate_tokens(prompt),
+            completion_tokens_used=estimate_tokens(text),
+        )
+
+    def _invoke(
+        self,
+        input,
+        tools=None,
+        memory=None,
+        tool_choice="auto",
+        temperature=None,
+        max_tokens=None,
+        system_prompt=None,
+        **kwargs,
+    ):
+        prompt = _input_text(input)
+        text = self.response_text(prompt)
+        time.sleep(self.latency + self._generation_seconds(text))
+        return self._response(prompt, text)
+
+    def _stream_invoke(
+        self,
+        input,
+        tools=None,
+        memory=None,
+        tool_choice="auto",
+        temperature=None,
+        max_tokens=None,
+        system_prompt=None,
+        **kwargs,
+    ) -> Iterator[ClientResponse]:
+        prompt = _input_text(input)
+        text = self.response_text(prompt)
+        time.sleep(self.latency)
+        so_far = ""
+        for i in range(0, len(text), self.chunk_chars):
+            delta = text[i : i + self.chunk_chars]
+            time.sleep(self._generation_seconds(delta))
+            so_far += delta
+            yield self._response(prompt, so_far, delta)
+
+    async def _a_invoke(self, input, **kwargs):
+        return self._invoke(input, **kwargs)
+
+    async def _a_stream_invoke(self, input, **kwargs):
+        for response in self._stream_invoke(input, **kwargs):
+            yield response
+
+    def _structured_response(self, *args, **kwargs):
+        raise NotImplementedError("StandInClient does not support structured output")
+
+    async def _a_structured_response(self, *args, **kwargs):
+        raise NotImplementedError("StandInClient does not support structured output")
+
+    def _convert_tool_choice(self, tool_choice):
+        return tool_choice
+
+
+class RecordReplayClient(Client):
+    """Record a real client's responses to disk, or replay them without it.
+
+    With `inner` set, every call is forwarded to `inner` and its response is
+    stored in the JSON file at `path`, keyed by a hash of the system prompt,
+    the input and the conversation memory. Without `inner`, responses are
+    answered from that file; a request that was never recorded raises
+    `KeyError`. Tool calls are replayed against the tools passed in by the
+    agent, so multi-step conversations replay exactly.
+
+    Attributes:
+        path: The recording file.
+        inner: The wrapped client in record mode, None in replay mode.
+        latency_scale: Replay sleeps for the recorded latency times this
+            factor (0 replays instantly).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        inner: Optional[Client] = None,
+        latency_scale: float = 0.0,
+        system_prompt: str = "",
+    ):
+        self.path = Path(path)
+        self.inner = inner
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._recording: Dict[str, Any] = {
+            "version": RECORDING_VERSION,
+            "model": None,
+            "responses": {},
+        }
+        if self.path.exists():
+            data = json.loads(self.path.read_text())
+            if data.get("version") == RECORDING_VERSION:
+                self._recording = data
+        elif inner is None:
+            raise FileNotFoundError(f"Recording not found: {self.path}")
+        model = inner.model_name if inner is not None else self._recording["model"]
+        super().__init__(model_name=model or "replay", system_prompt=system_prompt)
+
+    @staticmethod
+    def request_key(input, memory=None, system_prompt=None) -> str:
+        """Return the recording key of one client request."""
+        return make_key(
+            system_prompt or "",
+            json.dumps([b.to_dict() for b in input], sort_keys=True, default=str),
+            memory.json_dumps() if memory else "",
+        )
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self._recording, indent=2))
+        os.replace(tmp, self.path)
+
+    def _record(self, key: str, response: ClientResponse, seconds: float) -> None:
+        with self._lock:
+            self._recording["model"] = self.inner.model_name
+            self._recording["responses"][key] = {
+                "content": [b.to_dict() for b in response.content],
+                "seconds": seconds,
+                "stop_reason": response.stop_reason,
+                "prompt_tokens": response.prompt_tokens_used,
+                "completion_tokens": response.completion_tokens_used,
+            }
+            self._save()
+
+    def _lookup(self, key: str) -> Dict[str, Any]:
+        try:
+            return self._recording["responses"][key]
+        except KeyError:
+            raise KeyError(
+                f"Request {key[:12]} is not in recording {self.path}; record it first"
+            ) from None
+
+    @staticmethod
+    def _blocks(recorded: Dict[str, Any], tools) -> List[Block]:
+        by_name = {t.name: t for t in tools or []}
+        blocks: List[Block] = []
+        for data in recorded["content"]:
+            if data.get("type") == "function" and data.get("name") in by_name:
+                blocks.append(
+                    FunctionCallBlock(
+                        id=data.get("id", ""),
+                        arguments=data.get("arguments", {}),
+                        name=data["name"],
+                        tool=by_name[data["name"]],
+                    )
+                )
+            else:
+                blocks.append(Block.from_dict(data))
+        return blocks
+
+    def _replayed(self, recorded: Dict[str, Any], tools, delta=None):
+        return ClientResponse(
+            content=self._blocks(recorded, tools),
+            delta=delta,
+            stop_reason=recorded.get("stop_reason"),
+            prompt_tokens_used=recorded.get("prompt_tokens", 0),
+            completion_tokens_used=recorded.get("completion_tokens", 0),
+        )
+
+    def _invoke(
+        self,
+        input,
+        tools=None,
+        memory=None,
+        tool_choice="auto",
+        temperature=None,
+        max_tokens=None,
+        system_prompt=None,
+        **kwargs,
+    ):
+        key = self.request_key(input, memory, system_prompt)
+        if self.inner is not None:
+            started = time.perf_counter()
+            response = self.inner.invoke(
+                input=input,
+                tools=tools,
+                memory=memory,
+                tool_choice=tool_choice,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_prompt=system_prompt,
+                **kwargs,
+            )
+            self._record(key, response, time.perf_counter() - started)
+            return response
+        recorded = self._lookup(key)
+        time.sleep(recorded["seconds"] * self.latency_scale)
+        return self._replayed(recorded, tools)
+
+    def _stream_invoke(
+        self,
+        input,
+        tools=None,
+        memory=None,
+        tool_choice="auto",
+        temperature=None,
+        max_tokens=None,
+        system_prompt=None,
+        **kwargs,
+    ) -> Iterator[ClientResponse]:
+        key = self.request_key(input, memory, system_prompt)
+        if self.inner is not None:
+            started = time.perf_counter()
+            response = None
+            for response in self.inner.stream_invoke(
+                input=input,
+                tools=tools,
+                memory=memory,
+                tool_choice=tool_choice,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_prompt=system_prompt,
+                **kwargs,
+            ):
+                yield response
+            if response is not None:
+                self._record(key, response, time.perf_counter() - started)
+            return
+        recorded = self._lookup(key)
+        time.sleep(recorded["seconds"] * self.latency_scale)
+        final = self._replayed(recorded, tools)
+        if final.text:
+            yield ClientResponse(
+                content=[TextBlock(content=final.text)], delta=final.text
+            )
+        yield final
+
+    async def _a_invoke(self, input, **kwargs):
+        return self._invoke(input, **kwargs)
+
+    async def _a_stream_invoke(self, input, **kwargs):
+        for response in self._stream_invoke(input, **kwargs):
+            yield response
+
+    def _structured_response(self, *args, **kwargs):
+        raise NotImplementedError(
+            "RecordReplayClient does not support structured output"
+        )
+
+    async def _a_structured_response(self, *args, **kwargs):
+        raise NotImplementedError(
+            "RecordReplayClient does not support structured output"
+        )
+
+    def _convert_tool_choice(self, tool_choice):
+        return tool_choice
+
+
+def _register_benchmark_providers() -> None:
+    """Register the `stand-in`, `record` and `replay` providers."""
+
+    def stand_in_factory(cfg: Dict[str, Any]) -> StandInClient:
+        entries = cfg.get("entries")
+        return StandInClient(
+            latency=float(cfg.get("latency", 0.0)),
+            tokens_per_second=float(cfg.get("tokens_per_second", 0.0)),
+            entries=None if entries is None else int(entries),
+            pad_chars=int(cfg.get("pad_chars", 0)),
+            chunk_chars=int(cfg.get("chunk_chars", 64)),
+            model=cfg.get("model") or "stand-in",
+        )
+
+    def record_factory(cfg: Dict[str, Any]) -> RecordReplayClient:
+        inner_cfg = {k: v for k, v in cfg.items() if k not in ("path", "provider")}
+        inner = get_client(cfg["provider"], inner_cfg)
+        return RecordReplayClient(cfg["path"], inner=inner)
+
+    def replay_factory(cfg: Dict[str, Any]) -> RecordReplayClient:
+        return RecordReplayClient(
+            cfg["path"], latency_scale=float(cfg.get("latency_scale", 0.0))
+        )
+
+    register("stand-in", stand_in_factory)
+    register("record", record_factory)
+    register("replay", replay_factory)
+
+
+_register_benchmark_providers()
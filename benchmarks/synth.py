@@ -0,0 +1,190 @@
+"""Generator of synthetic Solidity repositories for benchmarks.
+
+The generated tree mimics a foundry bridge project: contracts under `src/`
+importing a few earlier files, a configurable share of bridge-like contracts
+that emit events and call other contracts, plain configuration contracts,
+an identical copy of one file (exercising de-duplication) and vendored
+libraries under `lib/` (exercising discovery pruning). Output is fully
+determined by the parameters and `seed`.
+
+Usage:
+    python -m benchmarks.synth OUT_DIR --files 200 --functions 8
+"""
+import argparse
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional
+
+
+@dataclass
+class SynthStats:
+    """Summary of a generated repository."""
+
+    files: int = 0
+    bytes: int = 0
+    functions: int = 0
+    events: int = 0
+    vendored: int = 0
+
+
+def _bridge_contract(rng: random.Random, i: int, functions: int) -> List[str]:
+    events = [f"Message{i}_{k}" for k in range(max(1, functions // 2))]
+    lines = [f"contract Bridge{i} {{"]
+    lines += [
+        f"    event {ev}(bytes32 indexed id, address sender, uint256 amount);"
+        for ev in events
+    ]
+    lines += [
+        "    IMessenger public messenger;",
+        "    mapping(bytes32 => bool) public processed;",
+    ]
+    for k in range(functions):
+        ev = events[k % len(events)]
+        if k % 2 == 0:
+            lines += [
+                f"    function sendMessage{i}_{k}(uint32 dstChain, bytes calldata payload) external payable {{",
+                f"        bytes32 id = keccak256(abi.encode(dstChain, payload, {rng.randint(0, 10**6)}));",
+                "        messenger.dispatch{value: msg.value}(dstChain, payload);",
+                f"        emit {ev}(id, msg.sender, msg.value);",
+                "    }",
+            ]
+        else:
+            lines += [
+                f"    function receiveMessage{i}_{k}(bytes32 id, bytes calldata payload) external {{",
+                '        require(!processed[id], "already processed");',
+                "        processed[id] = true;",
+                f"        emit {ev}(id, msg.sender, payload.length);",
+                "    }",
+            ]
+    lines.append("}")
+    return lines
+
+
+def _plain_contract(rng: random.Random, i: int, functions: int) -> List[str]:
+    lines = [
+        f"contract Config{i} {{",
+        "    address public owner;",
+        "    mapping(bytes32 => uint256) internal values;",
+    ]
+    for k in range(functions):
+        lines += [
+            f"    function setValue{i}_{k}(bytes32 key, uint256 value) external {{",
+            '        require(msg.sender == owner, "not owner");',
+            f"        values[key] = value + {rng.randint(0, 1000)};",
+            "    }",
+        ]
+    lines.append("}")
+    return lines
+
+
+_INTERFACE = """// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+
+interface IMessenger {
+    function dispatch(uint32 dstChain, bytes calldata payload) external payable;
+}
+"""
+
+_VENDORED = """// SPDX-License-Identifier: MIT
+// OpenZeppelin Contracts (last updated v5.0.0)
+pragma solidity ^0.8.20;
+
+library Vendored{i} {{
+    function tryAdd(uint256 a, uint256 b) internal pure returns (bool, uint256) {{
+        unchecked {{
+            uint256 c = a + b;
+            if (c < a) return (false, 0);
+            return (true, c);
+        }}
+    }}
+}}
+"""
+
+
+def generate_repo(
+    root: str,
+    files: int = 50,
+    functions: int = 8,
+    bridge_ratio: float = 0.25,
+    vendored: int = 10,
+    seed: int = 0,
+) -> SynthStats:
+    """Write a synthetic Solidity repository under `root`.
+
+    Args:
+        root: Destination folder (created if missing).
+        files: Number of contract files under `src/`, besides the interface
+            file and one duplicate.
+        functions: Functions per contract.
+        bridge_ratio: Share of contracts that are bridge-like.
+        vendored: Number of vendored library files under `lib/`.
+        seed: Seed of the pseudo-random choices (imports, constants).
+
+    Returns:
+        A `SynthStats` describing everything written, vendored files included.
+    """
+    rng = random.Random(seed)
+    base = Path(root)
+    (base / "src").mkdir(parents=True, exist_ok=True)
+    stats = SynthStats()
+
+    def write(rel: str, text: str) -> None:
+        path = base / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        stats.files += 1
+        stats.bytes += len(text.encode("utf-8"))
+
+    write("src/IMessenger.sol", _INTERFACE)
+    bridges = round(files * bridge_ratio)
+    for i in range(files):
+        is_bridge = i < bridges
+        imports = ['import "./IMessenger.sol";']
+        imports += [
+            f'import "./Contract{j}.sol";'
+            for j in sorted(rng.sample(range(i), min(i, 2)))
+        ]
+        body = (_bridge_contract if is_bridge else _plain_contract)(rng, i, functions)
+        header = ["// SPDX-License-Identifier: MIT", "pragma solidity ^0.8.20;", ""]
+        write(f"src/Contract{i}.sol", "\n".join(header + imports + [""] + body) + "\n")
+        stats.functions += functions
+        if is_bridge:
+            stats.events += max(1, functions // 2)
+
+    if files:
+        # an identical copy, as produced by flattening or vendoring in place
+        write("src/copies/Contract0.sol", (base / "src/Contract0.sol").read_text())
+    for i in range(vendored):
+        write(
+            f"lib/openzeppelin-contracts/contracts/utils/Vendored{i}.sol",
+            _VENDORED.format(i=i),
+        )
+        stats.vendored += 1
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """CLI entry point writing a synthetic repository."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output_dir")
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--functions", type=int, default=8)
+    parser.add_argument("--bridge-ratio", type=float, default=0.25)
+    parser.add_argument("--vendored", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    stats = generate_repo(
+        args.output_dir,
+        files=args.files,
+        functions=args.functions,
+        bridge_ratio=args.bridge_ratio,
+        vendored=args.vendored,
+        seed=args.seed,
+    )
+    print(asdict(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
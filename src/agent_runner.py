@@ -1,17 +1,112 @@
+import contextvars
+import copy
+import importlib
 import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple
 
-from datapizza.agents import Agent
-from datapizza.clients.google import GoogleClient
-from datapizza.tracing import ContextTracing
+from .cache import ResponseCache, client_identity, make_key
+from .chunking import estimate_tokens, plan_chunks
+from .formatter import (
+    CompactStreamParser,
+    PolicyRepair,
+    PolicyStreamParser,
+    _merge_policies,
+    format_policy_json,
+    repair_policy_json,
+)
+from .hedging import HedgeCancelled, Hedger
+from .incremental import (
+    attribute_entries,
+    dependencies,
+    hash_sources,
+    load_manifest,
+    manifest_path,
+    plan_update,
+    save_manifest,
+)
+from .indexer import SolidityIndex, minify_source, split_stable_prefix, stable_order
+from .ingest import (
+    FileCache,
+    IngestConfig,
+    IngestResult,
+    get_file_cache,
+    ingest,
+    register_file_cache,
+    unregister_file_cache,
+    walk_sol_files,
+)
+from .metrics import RunMetrics
+from .routing import Router
+from .sinks import PolicySink, RunRecord
+from .static_analysis import StaticReport, static_policy
+from .streaming import StreamEmitter
 
-from .formatter import format_policy_json
-from .tools import list_sol_files, read_sol_file
+if TYPE_CHECKING:
+    from datapizza.agents import Agent
 
 logger = logging.getLogger("policy_agent")
 
+# datapizza pulls in every provider SDK and takes seconds to import, so it is
+# only imported once an agent actually runs (see `__getattr__`).
+_LAZY_IMPORTS = {"Agent": "datapizza.agents", "StepResult": "datapizza.agents.agent"}
+
+
+def __getattr__(name: str) -> Any:
+    """Import the datapizza classes listed in `_LAZY_IMPORTS` on first access."""
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def _lazy(name: str) -> Any:
+    # module globals win, so a patched `agent_runner.Agent` is honored
+    return globals()[name] if name in globals() else __getattr__(name)
+
+
+# Prepended to the manifest in retrieval mode, which sends no source code
+RETRIEVAL_HEADER = (
+    "SOURCE FOLDER: {folder}\n"
+    "The source code is not included. Below is a manifest of every contract with "
+    "its events and function signatures. Inspect the code with the tools, passing "
+    "the source folder as `folder`: read_function(folder, contract, function) for "
+    "a function body, search_code(folder, pattern) for emit and call sites, "
+    "list_contract_events(folder, contract) for event declarations and their "
+    "emitters, and read_sol_file(folder, relative_path) for a whole file. Read "
+    "only what you need.\n\n"
+)
+# Closes the manifest; kept last so that the prompt's prefix does not change
+RETRIEVAL_FOOTER = "(sources {digest})\n"
+
+# Sent after an explicitly cached prefix that already holds every source file
+CACHED_SOURCES_PROMPT = "Analyze the source files above."
+
+# Sent instead of the sources when a response was cut off mid-array
+CONTINUATION_PROMPT = (
+    "SOURCE FOLDER: {folder}\n"
+    "Your previous answer was cut off after {count} complete policy entries. "
+    "Continue the same analysis from entry {next}: reply with {format} "
+    "with the remaining entries only. The sources are "
+    "not repeated; read what you need with the tools, passing the source folder "
+    "as `folder` (read_function, search_code, list_contract_events, "
+    "read_sol_file).\n\n"
+    "ENTRIES ALREADY RETURNED (source -> destination):\n{done}\n\n{manifest}"
+)
+CONTINUATION_FORMATS = {
+    False: 'a ```json block holding {"policy": [...]}',
+    True: "a ```policy block in the same compact row format, starting with its "
+    "own @events line",
+}
+
+
+class TokenBudgetExceeded(RuntimeError):
+    """Raised before any request is sent when the estimated input is over budget."""
+
 
 class AgentRunner:
     """Encapsulates the logic for running the Datapizza agent over a set of solidity files.
@@ -29,49 +124,760 @@ class AgentRunner:
         target_path: Filesystem path to the folder containing `.sol` source files.
         output_file: Path where the resulting JSON policy will be written.
         client: Optional Datapizza client instance used to call the LLM. If None, a
-            default `GoogleClient` without an API key is used (caller should provide a
-            configured client in production).
+            default `GoogleClient` without an API key is created on first use (caller
+            should provide a configured client in production).
+        cache: Optional `ResponseCache`. When set, identical prompt/source/client
+            combinations are answered from disk without calling the model.
+        prune: When True, only functions and events that look cross-chain relevant
+            are sent verbatim; everything else is summarized in a manifest.
+        chunk_tokens: When set, split the sources into import-connected chunks of
+            at most this many estimated tokens and analyze them concurrently.
+        max_workers: Maximum number of chunks analyzed at the same time.
+        incremental: When True, keep a per-file manifest next to the output and
+            re-analyze only changed files and the files importing them.
+        stream: When True, consume the model's streaming output and publish each
+            policy entry as soon as it is complete.
+        on_entry: Optional callback receiving each streamed (merged) entry.
+        stream_file: Optional JSONL sink for streamed entries ("-" for stdout).
+        ingest_config: Settings for source discovery and reading (ignore rules,
+            byte budgets, read parallelism, de-duplication).
+        last_ingest: The `IngestResult` of the most recent discovery.
+        metrics_file: Optional path receiving the run's metrics (Prometheus
+            textfile if it ends in `.prom`, JSON otherwise).
+        metrics: The `RunMetrics` of the most recent run.
+        hedger: Optional `Hedger` racing several providers per prompt; its
+            first client is the primary and defaults `client`.
+        minify: When True, comments, pragmas and redundant whitespace are
+            stripped from the sources (line numbers are preserved).
+        token_budget: Optional limit on the estimated input tokens of a run
+            (system prompt plus sources, summed over all prompts).
+        enforce_budget: When True, exceeding `token_budget` raises
+            `TokenBudgetExceeded` instead of logging a warning.
+        mode: "llm" (default) asks the model; "static" derives the policy with
+            `static_policy` only, without any model call; "hybrid" uses the
+            static policy when its confidence reaches `static_threshold` and
+            asks the model otherwise.
+        static_threshold: Minimum static confidence accepted in hybrid mode.
+        last_static: The `StaticReport` of the most recent static analysis.
+        sinks: Additional destinations (`src.sinks`) receiving every finished run.
+        project: Project name recorded by the sinks (defaults to the target
+            folder name).
+        router: Optional `Router` choosing the client of each prompt from its
+            estimated tokens; `client` is then only used for prompts it does
+            not route.
+        retrieval: When True, prompts hold only a manifest of contracts and
+            function signatures; the agent reads bodies, events and call sites
+            on demand through the index-backed tools of `src.tools`.
+        max_continuations: How many short continuation requests are sent for a
+            response cut off mid-array (0 keeps only the salvaged entries).
+        compact_output: When True, `prompt_text` asks for the compact row
+            format of `prompts/agent_prompt_compact.md`; streamed answers are
+            parsed with `CompactStreamParser`. Either format is formatted
+            into the canonical schema.
+        context_cache: When True, the system prompt and the stable prefix of
+            each prompt (vendored and library files, see `stable_order`) are
+            stored in an explicit provider context cache via
+            `ManagedClient.context_cache`, and only the rest is sent per request.
+            Clients without explicit caching use the regular agent. The
+            caches a run created are deleted when it ends.
+        context_cache_ttl: Lifetime in seconds of the created context caches,
+            bounding what a crashed run leaves behind.
     """
 
     def __init__(
-        self, prompt_text: str, target_path: str, output_file: str, client=None
+        self,
+        prompt_text: str,
+        target_path: str,
+        output_file: str,
+        client=None,
+        cache: ResponseCache | None = None,
+        prune: bool = False,
+        chunk_tokens: int | None = None,
+        max_workers: int = 4,
+        incremental: bool = False,
+        stream: bool = False,
+        on_entry: Callable[[Dict[str, Any]], None] | None = None,
+        stream_file: str | None = None,
+        ingest_config: IngestConfig | None = None,
+        metrics_file: str | None = None,
+        hedger: Hedger | None = None,
+        minify: bool = False,
+        token_budget: int | None = None,
+        enforce_budget: bool = False,
+        mode: str = "llm",
+        static_threshold: float = 0.6,
+        sinks: List[PolicySink] | None = None,
+        project: str | None = None,
+        router: Router | None = None,
+        retrieval: bool = False,
+        max_continuations: int = 2,
+        compact_output: bool = False,
+        context_cache: bool = False,
+        context_cache_ttl: float = 900,
     ):
         """Create an AgentRunner.
 
         Args:
             prompt_text: The prompt text (system + user instructions) to send to the agent.
             target_path: Directory containing `.sol` files to append to the prompt.
-            output_file: File path where the parsed policy JSON will be saved.
+            output_file: File path where the parsed policy JSON will be saved. May
+                be None when `sinks` are given (not in incremental mode).
             client: Optional Datapizza client instance. If omitted, a bare `GoogleClient`
-                will be created (suitable for local testing but not production).
+                is created when first needed (suitable for local testing but not
+                production).
+            cache: Optional response cache consulted before running the agent.
+            prune: Send a pruned view of the sources built by `SolidityIndex`
+                instead of every file verbatim.
+            chunk_tokens: Optional per-chunk token budget enabling chunked mode.
+            max_workers: Size of the thread pool used in chunked mode.
+            incremental: Enable manifest-driven incremental re-analysis.
+            stream: Enable streaming consumption and incremental emission.
+            on_entry: Callback for streamed entries (implies `stream`).
+            stream_file: JSONL path for streamed entries (implies `stream`).
+            ingest_config: Optional ingestion settings; defaults to
+                `IngestConfig.from_env()`.
+            metrics_file: Optional path the run's metrics are exported to.
+            hedger: Optional hedging policy over several providers.
+            minify: Strip comments and whitespace from the sources.
+            token_budget: Optional estimated input token budget per run.
+            enforce_budget: Fail instead of warning when over `token_budget`.
+            mode: "llm", "static" or "hybrid".
+            static_threshold: Static confidence needed to skip the model in
+                hybrid mode.
+            sinks: Additional destinations for every finished run.
+            project: Project name recorded by the sinks.
+            router: Optional token-aware routing table (not with `hedger`).
+            retrieval: Send a manifest instead of the sources and let the agent
+                retrieve code through its tools.
+            max_continuations: Continuation requests per truncated response.
+            compact_output: The prompt asks for compact rows instead of JSON.
+            context_cache: Send the stable prompt prefix through a provider
+                context cache where the client supports one.
+            context_cache_ttl: Lifetime in seconds of created context caches.
         """
+        if mode not in ("llm", "static", "hybrid"):
+            raise ValueError(f"Unknown analysis mode: {mode!r}")
+        if not output_file and (incremental or not sinks):
+            raise ValueError(
+                "An output file is required without sinks or in incremental mode"
+            )
+        if router is not None and hedger is not None:
+            raise ValueError("Routing and hedging cannot be combined")
         self.prompt_text = prompt_text
         self.target_path = target_path
         self.output_file = output_file
-        self.client = client or GoogleClient(api_key=None)
+        if client is None and hedger is not None:
+            client = hedger.clients[0][1]
+        self._client = client
+        self.hedger = hedger
+        self.router = router
+        self.retrieval = retrieval
+        self.max_continuations = max_continuations
+        self.compact_output = compact_output
+        self.context_cache = context_cache
+        self.context_cache_ttl = context_cache_ttl
+        self._context_handles: List[Tuple[Any, Any]] = []
+        self.cache = cache
+        self.prune = prune
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max_workers
+        self.incremental = incremental
+        self.stream = stream or on_entry is not None or stream_file is not None
+        self.on_entry = on_entry
+        self.stream_file = stream_file
+        self._emitter: StreamEmitter | None = None
+        self.ingest_config = ingest_config or IngestConfig.from_env()
+        self.last_ingest: IngestResult | None = None
+        self.metrics_file = metrics_file
+        self.minify = minify
+        self.token_budget = token_budget
+        self.enforce_budget = enforce_budget
+        self.mode = mode
+        self.static_threshold = static_threshold
+        self.last_static: StaticReport | None = None
+        self.sinks = list(sinks or [])
+        self.project = project or Path(target_path).resolve().name
+        self._started = time.time()
+        self.metrics = RunMetrics()
+
+    @property
+    def client(self) -> Any:
+        """The LLM client; a bare `GoogleClient` is created on first use if none was given."""
+        if self._client is None:
+            from datapizza.clients.google import GoogleClient
+
+            self._client = GoogleClient(api_key=None)
+        return self._client
+
+    @client.setter
+    def client(self, value: Any) -> None:
+        self._client = value
+
+    def ingest_sources(self) -> IngestResult:
+        """Discover and read the `.sol` files under `target_path`.
+
+        Uses the ingestion engine (pruned walk, parallel reads, de-duplication and
+        byte budgets) configured by `ingest_config`. The result is kept in
+        `last_ingest` for reporting. Discovery and reads are measured as the
+        `discovery` and `read` stages.
+        """
+        with self.metrics.stage("discovery") as stage:
+            files = walk_sol_files(self.target_path, self.ingest_config)
+            stage.set("files", len(files))
+        with self.metrics.stage("read") as stage:
+            self.last_ingest = ingest(self.target_path, self.ingest_config, files)
+            stage.add_bytes(self.last_ingest.stats.bytes)
+        return self.last_ingest
+
+    def read_sources(self) -> Dict[str, str]:
+        """Read every `.sol` file under `target_path`.
+
+        Returns:
+            A mapping of relative file path to file contents, sorted by path.
+            Files whose contents duplicate an earlier file are left out.
+        """
+        return self.ingest_sources().sources
+
+    def render_sources(self, sources: Dict[str, str]) -> str:
+        """Render source files as prompt text.
+
+        Files are labeled and pasted verbatim, or, when `prune` is enabled,
+        indexed and reduced to the relevant functions, their events and a
+        manifest of the rest. With `minify` the sources are passed through
+        `minify_source` first. In `retrieval` mode only the manifest of
+        `SolidityIndex.render_manifest` is rendered, after a note on the tools
+        the agent reads the code with.
+
+        Files are laid out by `stable_order`: vendored and library files come
+        first, project files last, so that edits to the project leave the
+        start of the prompt unchanged and provider prompt caches keep hitting.
+        """
+        sources = stable_order(sources)
+        if self.retrieval:
+            manifest = SolidityIndex.from_sources(sources).render_manifest()
+            # the digest keeps cache keys tied to the bodies the manifest omits
+            digest = make_key(*(f"{rel}\0{c}" for rel, c in sorted(sources.items())))
+            return (
+                RETRIEVAL_HEADER.format(folder=self.target_path)
+                + manifest
+                + RETRIEVAL_FOOTER.format(digest=digest[:16])
+            )
+        if self.minify:
+            sources = {rel: minify_source(content) for rel, content in sources.items()}
+        if self.prune:
+            pruned = SolidityIndex.from_sources(sources).render_pruned()
+            logger.info(
+                "Pruned sources from %d to %d chars",
+                sum(len(c) for c in sources.values()),
+                len(pruned),
+            )
+            return pruned
+        return "".join(
+            f"FILE: {rel}\n{content}\n\n" for rel, content in sources.items()
+        )
 
     def build_combined_prompt(self) -> str:
-        """Build the full prompt by concatenating the agent prompt with all `.sol` files.
+        """Build the user prompt covering every `.sol` file.
+
+        `prompt_text` is not repeated here: the agent receives it once, as its
+        system prompt.
+
+        Returns:
+            The labeled contents of each Solidity source file discovered under
+            `target_path`, rendered by `render_sources`.
+        """
+        return self.render_sources(self.read_sources())
+
+    def build_prompts(self, sources: Dict[str, str] | None = None) -> List[str]:
+        """Build one prompt per analysis unit.
+
+        Without `chunk_tokens` this is the single combined prompt. Otherwise the
+        sources are split by `plan_chunks` into import-connected chunks under the
+        token budget, and each chunk gets its own prompt. Prompts hold only the
+        rendered sources; `prompt_text` is sent once per request as the system
+        prompt.
+
+        The estimated input tokens of all prompts are logged and checked against
+        `token_budget` before anything is sent.
+
+        Args:
+            sources: Optional mapping of relative path to contents to build the
+                prompts from. Defaults to every file under `target_path`.
+
+        Raises:
+            TokenBudgetExceeded: if `enforce_budget` is set and the estimate is
+                over `token_budget`.
+        """
+        if sources is None:
+            sources = self.read_sources()
+        with self.metrics.stage("prompt") as stage:
+            if not self.chunk_tokens:
+                prompts = [self.render_sources(sources)]
+            else:
+                chunks = plan_chunks(sources, self.chunk_tokens)
+                logger.info(
+                    "Split %d files into %d chunks (budget %d tokens)",
+                    len(sources),
+                    len(chunks),
+                    self.chunk_tokens,
+                )
+                prompts = [
+                    self.render_sources({rel: sources[rel] for rel in chunk})
+                    for chunk in chunks
+                ]
+            tokens = len(prompts) * estimate_tokens(self.prompt_text) + sum(
+                estimate_tokens(p) for p in prompts
+            )
+            stage.add_bytes(sum(len(p) for p in prompts))
+            stage.set("prompts", len(prompts))
+            stage.set("estimated_tokens", tokens)
+        logger.info(
+            "Assembled %d prompt(s): ~%d input tokens (budget %s)",
+            len(prompts),
+            tokens,
+            self.token_budget or "none",
+        )
+        self.check_budget(tokens)
+        return prompts
+
+    def check_budget(self, tokens: int) -> None:
+        """Warn, or raise when `enforce_budget` is set, if `tokens` exceeds the budget."""
+        if not self.token_budget or tokens <= self.token_budget:
+            return
+        message = (
+            f"Estimated input of ~{tokens} tokens exceeds the budget of "
+            f"{self.token_budget} tokens (try --prune, --minify or --chunk-tokens)"
+        )
+        if self.enforce_budget:
+            raise TokenBudgetExceeded(message)
+        logger.warning(message)
+
+    def cache_key(self, combined: str, client: Any = None) -> str:
+        """Return the response cache key for a combined prompt.
+
+        The key covers the system prompt, the combined prompt (which embeds every
+        source file) and the identity of `client`, or `client_id()` if None.
+        """
+        identity = self.client_id() if client is None else client_identity(client)
+        return make_key(self.prompt_text, combined, identity)
+
+    def config_key(self) -> str:
+        """Return a key of every setting that shapes the policy of a given source.
+
+        Incremental runs reuse earlier contributions only under the same key:
+        the prompt, the answering model(s), how the sources are rendered
+        (prune, minify, retrieval, chunking), the output format and the
+        analysis mode.
+        """
+        return make_key(
+            self.prompt_text,
+            self.client_id() if self.mode != "static" else "",
+            json.dumps(
+                {
+                    "prune": self.prune,
+                    "minify": self.minify,
+                    "retrieval": self.retrieval,
+                    "chunk_tokens": self.chunk_tokens,
+                    "compact_output": self.compact_output,
+                    "max_continuations": self.max_continuations,
+                    "mode": self.mode,
+                    "static_threshold": self.static_threshold,
+                },
+                sort_keys=True,
+            ),
+        )
+
+    def client_id(self) -> str:
+        """Return the identity of the model(s) answering, for cache keys.
+
+        With a hedger every raced client is part of the identity; with a router
+        it is the identity of the routing table.
+        """
+        if self.hedger is not None:
+            return "|".join(client_identity(c) for _, c in self.hedger.clients)
+        if self.router is not None:
+            return self.router.identity()
+        return client_identity(self.client)
+
+    def write_output(self, out: Dict[str, Any]) -> None:
+        """Write the policy JSON to `self.output_file`, creating parent dirs."""
+        out_path = Path(self.output_file)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(json.dumps(out, indent=2))
+        logger.info("Wrote results to %s", out_path)
+
+    def analyze(self, prompt: str) -> Dict[str, Any]:
+        """Run the agent over one prompt and return the formatted policy.
+
+        The response cache, when configured, is consulted first and updated on a
+        miss. With a `router`, the prompt's estimated tokens select the client
+        (and the cache key covers that client only). A response cut off
+        mid-array is salvaged and completed with continuation requests (see
+        `_salvage`).
+        """
+        self.metrics.increment("prompts")
+        route, client = None, None
+        tokens = estimate_tokens(self.prompt_text) + estimate_tokens(prompt)
+        if self.router is not None:
+            route = self.router.select(tokens).route
+            client = self.router.client(route)
+            self.metrics.increment(f"routes.{route.name}")
+        key = None
+        if self.cache is not None:
+            key = self.cache_key(prompt, client)
+            entry = self.cache.get(key)
+            if entry is not None:
+                logger.info("Cache hit %s, skipping agent run", key[:12])
+                self.metrics.increment("cache_hits")
+                if self._emitter is not None:
+                    self._emitter.add_all(entry["policy"].get("policy", []))
+                return entry["policy"]
+
+        logger.info("Running agent with prompt length: %d", len(prompt))
+        if self.hedger is not None:
+            text, out, client = self._analyze_hedged(prompt)
+        else:
+            client = client or self.client
+            with self.metrics.stage("agent", stream=self._emitter is not None) as stage:
+                started = time.perf_counter()
+                text = self._agent_text(client, prompt)
+                stage.add_bytes(len(prompt) + len(text))
+                if route is not None:
+                    stage.set("route", route.name)
+                    self.router.observe(route, tokens, time.perf_counter() - started)
+            out = None
+        text, out = self._salvage(client, text, out)
+        if self.cache is not None:
+            self.cache.put(key, text, out)
+        return out
+
+    def _format(self, text: str, repair: PolicyRepair | None = None) -> Dict[str, Any]:
+        """Post-process a response with `format_policy_json`."""
+        with self.metrics.stage("format") as stage:
+            stage.add_bytes(len(text))
+            return format_policy_json(text, repair)
+
+    def _salvage(self, client, text: str, out: Dict[str, Any] | None = None):
+        """Format `text`, completing it with continuations if it was cut off.
+
+        A response whose policy array was never closed (typically because the
+        provider's output token limit was hit) keeps every complete entry, and
+        up to `max_continuations` short requests ask `client` for the entries
+        after the last one. They carry the list of entries already returned and
+        a manifest instead of the sources; the agent reads code through the
+        retrieval tools. Continuations stop once the array is closed or a reply
+        adds no entry.
+
+        Args:
+            client: The client that produced `text`.
+            text: The response text.
+            out: `text` already formatted, if the caller has it.
+
+        Returns:
+            The response text (continuations appended) and the formatted policy.
+        """
+        with self.metrics.stage("format"):
+            repair = repair_policy_json(text)
+        if not repair.truncated or not self.max_continuations:
+            return text, out if out is not None else self._format(text, repair)
+
+        entries = list(repair.entries)
+        parts = [text]
+        for attempt in range(1, self.max_continuations + 1):
+            logger.warning(
+                "Response %s; requesting continuation %d/%d from entry %d",
+                repair.describe(),
+                attempt,
+                self.max_continuations,
+                len(entries) + 1,
+            )
+            self.metrics.increment("continuations")
+            prompt = self._continuation_prompt(entries)
+            with self.metrics.stage("agent", continuation=attempt) as stage:
+                more = self._agent_text(client, prompt, retrieval=True)
+                stage.add_bytes(len(prompt) + len(more))
+            parts.append(more)
+            with self.metrics.stage("format"):
+                repair = repair_policy_json(more)
+            entries.extend(repair.entries)
+            if not repair.truncated or not repair.entries:
+                break
+        if repair.truncated:
+            logger.warning(
+                "Output still cut off after %d continuation(s), keeping %d entries",
+                attempt,
+                len(entries),
+            )
+        with self.metrics.stage("format"):
+            return "\n".join(parts), {"policy": _merge_policies(entries)}
+
+    def _continuation_prompt(self, entries: List[Dict[str, Any]]) -> str:
+        """Build the request for the entries after `entries` (see `_salvage`)."""
+        done = []
+        for i, entry in enumerate(entries, 1):
+            src = (entry.get("sourceFunction") or {}).get("name")
+            dst = (entry.get("destinationFunction") or {}).get("name")
+            done.append(f"{i}. {src} -> {dst}")
+        cache = get_file_cache(self.target_path)
+        return CONTINUATION_PROMPT.format(
+            folder=self.target_path,
+            format=CONTINUATION_FORMATS[self.compact_output],
+            count=len(entries),
+            next=len(entries) + 1,
+            done="\n".join(done) or "-",
+            manifest=cache.index.render_manifest() if cache is not None else "",
+        )
+
+    def _agent_text(self, client, prompt: str, cancel=None, retrieval=False) -> str:
+        """Run an agent backed by `client` over `prompt` and return its answer.
+
+        The agent streams when entries are emitted or when the run may be
+        cancelled (hedging), so that `cancel` is checked between chunks. The
+        retrieval tools are added in `retrieval` mode or when `retrieval` is set.
+        With `context_cache`, prompts carrying the sources go through
+        `_cached_text` first.
+        """
+        if self.context_cache and cancel is None and not (self.retrieval or retrieval):
+            text = self._cached_text(client, prompt)
+            if text is not None:
+                return text
+        streaming = self._emitter is not None or cancel is not None
+        from . import tools
+
+        toolset = [tools.list_sol_files, tools.read_sol_file]
+        if self.retrieval or retrieval:
+            toolset += [
+                tools.read_function,
+                tools.search_code,
+                tools.list_contract_events,
+            ]
+        agent = _lazy("Agent")(
+            name="policy_agent",
+            system_prompt=self.prompt_text,
+            client=client,
+            tools=toolset,
+            stream=streaming,
+        )
+        self.metrics.add_tokens(
+            estimated_input=estimate_tokens(self.prompt_text) + estimate_tokens(prompt)
+        )
+        if streaming:
+            text = self._stream_agent(agent, prompt, cancel)
+        else:
+            text = agent.run(prompt).text
+        self.metrics.add_tokens(estimated_output=estimate_tokens(text))
+        return text
+
+    def _cached_text(self, client, prompt: str) -> str | None:
+        """Answer `prompt` through a provider context cache of its stable prefix.
+
+        The system prompt and the prefix returned by `split_stable_prefix` are
+        cached once per content and TTL by `client.context_cache`; each request
+        then sends only the volatile rest of the prompt. No tools are offered,
+        since the sources are in the prompt.
+
+        Returns:
+            The response text, or None if the client has no explicit context
+            caching or the prefix is too small to be cached.
+        """
+        context_cache = getattr(client, "context_cache", None)
+        if context_cache is None:
+            return None
+        prefix, rest = split_stable_prefix(prompt)
+        handle = context_cache(self.prompt_text, prefix, self.context_cache_ttl)
+        if handle is None:
+            return None
+        self._context_handles.append((client, handle))
+        self.metrics.increment(
+            "context_cache.reused" if handle.uses > 1 else "context_cache.created"
+        )
+        self.metrics.add_tokens(
+            estimated_input=estimate_tokens(self.prompt_text) + estimate_tokens(prompt)
+        )
+        response = client.invoke_cached(handle, rest or CACHED_SOURCES_PROMPT)
+        text = response.text
+        self.metrics.add_tokens(estimated_output=estimate_tokens(text))
+        self.metrics.add_reported(
+            str(getattr(client, "model_name", "unknown")),
+            input=response.prompt_tokens_used or 0,
+            output=response.completion_tokens_used or 0,
+            cached=response.cached_tokens_used or 0,
+        )
+        if self._emitter is not None:
+            self._emitter.add_all(repair_policy_json(text).entries)
+        return text
+
+    def _release_context_caches(self) -> None:
+        """Release every context cache handle taken during the run."""
+        handles, self._context_handles = self._context_handles, []
+        for client, handle in handles:
+            client.release_context_cache(handle)
+
+    def _analyze_hedged(self, prompt: str):
+        """Race the hedger's clients over `prompt`.
+
+        The first response formatted into a non-empty policy wins and the other
+        attempts are cancelled. Streamed entries are emitted for the winner
+        only, once it is known.
 
         Returns:
-            A single string containing the prompt followed by labeled file contents for
-            each Solidity source file discovered under `target_path`.
+            The winning response text, its formatted policy and the client that
+            produced it.
         """
-        parts = [self.prompt_text, "\n\n"]
-        files = list_sol_files(self.target_path)
-        for rel in files:
-            content = read_sol_file(self.target_path, rel)
-            parts.append(f"FILE: {rel}\n{content}\n\n")
-        return "".join(parts)
+        with self.metrics.stage("agent", hedged=True) as stage:
+            (text, out), key = self.hedger.run(
+                lambda client, cancel: self._agent_text(client, prompt, cancel),
+                process=lambda text: (text, self._format(text)),
+                acceptable=lambda result: bool(result[1].get("policy")),
+            )
+            stage.set("provider", key)
+            stage.add_bytes(len(prompt) + len(text))
+        self.metrics.increment(f"hedge_wins.{key}")
+        if self._emitter is not None:
+            self._emitter.add_all(out.get("policy", []))
+        return text, out, self.hedger.client(key)
+
+    def _stream_agent(self, agent: "Agent", prompt: str, cancel=None) -> str:
+        """Run `agent` in streaming mode, emitting entries as they complete.
+
+        In a hedged attempt (`cancel` set) nothing is emitted, and the stream is
+        closed with `HedgeCancelled` as soon as the attempt is cancelled.
+
+        Returns:
+            The final response text, used for the canonical formatting pass.
+        """
+        emitter = self._emitter if cancel is None else None
+        parser = CompactStreamParser() if self.compact_output else PolicyStreamParser()
+        final_text = None
+        steps = agent.stream_invoke(prompt)
+        try:
+            for step in steps:
+                if cancel is not None and cancel.is_set():
+                    raise HedgeCancelled()
+                if isinstance(step, _lazy("StepResult")):
+                    final_text = step.text
+                elif getattr(step, "delta", None):
+                    entries = parser.feed(step.delta)
+                    if emitter is not None:
+                        emitter.add_all(entries)
+        finally:
+            steps.close()
+        return final_text if final_text is not None else parser.text
+
+    def analyze_sources(self, sources: Dict[str, str]) -> Dict[str, Any]:
+        """Analyze a set of source files and return the merged policy.
+
+        A single prompt is analyzed directly; chunks are analyzed concurrently
+        on up to `max_workers` threads and reduced through `_merge_policies`.
+        """
+        prompts = self.build_prompts(sources)
+        if len(prompts) == 1:
+            return self.analyze(prompts[0])
+        workers = max(1, min(self.max_workers, len(prompts)))
+        # run each chunk in a copy of the caller's context so that its spans
+        # join the run's trace
+        contexts = [contextvars.copy_context() for _ in prompts]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            partials = list(
+                pool.map(lambda ctx, p: ctx.run(self.analyze, p), contexts, prompts)
+            )
+        entries = [e for part in partials for e in part.get("policy", [])]
+        return {"policy": _merge_policies(entries)}
+
+    def analyze_static(self, sources: Dict[str, str]) -> StaticReport:
+        """Derive the policy of `sources` with `static_policy` (the `static` stage)."""
+        with self.metrics.stage("static") as stage:
+            report = static_policy(SolidityIndex.from_sources(sources))
+            stage.set("confidence", report.confidence)
+            stage.set("entries", len(report.policy))
+        logger.info(
+            "Static analysis: %d entries, confidence %.2f",
+            len(report.policy),
+            report.confidence,
+        )
+        self.last_static = report
+        return report
+
+    def _confident_static(self, sources: Dict[str, str]) -> Dict[str, Any] | None:
+        """Return the static policy in hybrid mode if it is confident enough."""
+        report = self.analyze_static(sources)
+        if report.confidence >= self.static_threshold:
+            self.metrics.increment("static_accepted")
+            return report.to_dict()
+        logger.info(
+            "Static confidence below %.2f, asking the model", self.static_threshold
+        )
+        return None
+
+    def _run_incremental(self, sources: Dict[str, str]):
+        """Re-analyze only changed files and their dependents.
+
+        Returns:
+            The merged policy and a callable persisting the new manifest, to be
+            invoked once the output has been written.
+        """
+        hashes = hash_sources(sources)
+        index = SolidityIndex.from_sources(sources)
+        graph = index.import_graph()
+        config = self.config_key()
+        mpath = manifest_path(self.output_file)
+        previous = load_manifest(mpath) if Path(self.output_file).exists() else None
+
+        affected = plan_update(previous, hashes, graph, config)
+        contributions: Dict[str, List[Dict[str, Any]]] = {}
+        if affected is None:
+            logger.info("No usable manifest, analyzing all %d files", len(sources))
+            affected = set(sources)
+        else:
+            contributions = {
+                p: entries
+                for p, entries in previous["contributions"].items()
+                if p in sources and p not in affected
+            }
+            logger.info(
+                "Incremental run: %d of %d files changed or depend on a change",
+                len(affected),
+                len(sources),
+            )
+
+        if affected:
+            # send the affected files together with the files they build on
+            context = dependencies(graph, affected)
+            fresh = self.analyze_sources(
+                {p: sources[p] for p in sources if p in context}
+            )
+            contributions.update(
+                attribute_entries(fresh.get("policy", []), index, sorted(affected))
+            )
+
+        entries = [copy.deepcopy(e) for p in sources for e in contributions.get(p, [])]
+        out = {"policy": _merge_policies(entries)}
+        return out, lambda: save_manifest(mpath, config, hashes, contributions, graph)
 
     def run(self) -> Dict[str, Any]:
         """Execute the agent and persist the normalized policy JSON.
 
         The method will:
-        - Instantiate an `Agent` with registered datapizza tools for reading files.
-        - Run the agent over the combined prompt.
-        - Post-process the agent's final textual response via `format_policy_json`.
-        - Write the resulting JSON to `self.output_file` and return it.
+        - Build one prompt, or one prompt per chunk when `chunk_tokens` is set,
+          holding the (optionally minified) sources; `prompt_text` is sent once as
+          the system prompt. The estimated input tokens are checked against
+          `token_budget` before the model is called.
+        - Analyze each prompt with `analyze`: return the cached policy when
+          `self.cache` holds one, otherwise run an `Agent` with the datapizza file
+          tools and post-process its response via `format_policy_json`.
+        - Run chunks concurrently on up to `max_workers` threads and reduce the
+          partial policies through `_merge_policies`.
+        - In streaming mode, publish each policy entry to `on_entry` and
+          `stream_file` as soon as the model has generated it.
+        - In incremental mode, analyze only files changed since the last run (and
+          their dependents) and merge with the entries of untouched files.
+        - Write the resulting JSON to `self.output_file`, hand the run to every
+          sink in `self.sinks` and return it.
+        - In static mode, derive the policy with `static_policy` and never
+          import or call the model; in hybrid mode, do so only when the static
+          confidence is below `static_threshold`.
+        - Measure every stage in `self.metrics` (also traced as
+          `policy_agent.<stage>` spans) and export them to `metrics_file`.
 
         Returns:
             The dictionary representing the canonical policy JSON written to disk.
@@ -80,22 +886,80 @@ class AgentRunner:
             Any exceptions raised by the underlying Datapizza client or I/O operations
             will propagate to the caller.
         """
-        agent = Agent(
-            name="policy_agent",
-            system_prompt=self.prompt_text,
-            client=self.client,
-            tools=[list_sol_files, read_sol_file],
-        )
-        combined = self.build_combined_prompt()
-        logger.info("Running agent with prompt length: %d", len(combined))
-
-        with ContextTracing().trace("my_ai_operation"):
-            res = agent.run(combined)
-            # post-process
-            out = format_policy_json(res.text)
-            # write output
-            out_path = Path(self.output_file)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(json.dumps(out, indent=2))
-            logger.info("Wrote results to %s", out_path)
-            return out
+        self.metrics = metrics = RunMetrics()
+        self._started = time.time()
+        emitter = StreamEmitter(self.on_entry, self.stream_file)
+        if self.mode == "static":
+            return self._run_static(emitter)
+        from datapizza.tracing import ContextTracing
+
+        with ContextTracing().trace("policy_agent.run") as current, emitter:
+            ingested = self.ingest_sources()
+            sources = ingested.sources
+            # serve the agent's file tools from memory for the duration of the run
+            file_cache = FileCache(self.target_path, ingested)
+            register_file_cache(file_cache)
+            self._emitter = emitter if self.stream else None
+            try:
+                out, save = None, None
+                if self.mode == "hybrid":
+                    out = self._confident_static(sources)
+                if out is not None:
+                    if self._emitter is not None:
+                        self._emitter.add_all(out["policy"])
+                elif self.incremental:
+                    out, save = self._run_incremental(sources)
+                else:
+                    out = self.analyze_sources(sources)
+            finally:
+                self._emitter = None
+                unregister_file_cache(file_cache)
+                self._release_context_caches()
+            self._write_stage(out, save)
+            metrics.collect_spans(current.get_spans())
+        self._finish_metrics()
+        return out
+
+    def _run_static(self, emitter: StreamEmitter) -> Dict[str, Any]:
+        """`run` in static mode: no model, no tracing backend, no cache."""
+        with emitter:
+            out = self.analyze_static(self.ingest_sources().sources).to_dict()
+            if self.stream:
+                emitter.add_all(out["policy"])
+            self._write_stage(out)
+        self._finish_metrics()
+        return out
+
+    def _write_stage(self, out: Dict[str, Any], save: Callable[[], None] | None = None):
+        """Write `out` and hand the run to the sinks (the `write` stage).
+
+        The incremental manifest is persisted once the output file exists.
+        """
+        with self.metrics.stage("write") as stage:
+            if self.output_file:
+                self.write_output(out)
+                stage.add_bytes(Path(self.output_file).stat().st_size)
+            if save is not None:
+                save()
+            if self.sinks:
+                record = RunRecord(
+                    project=self.project,
+                    target_path=self.target_path,
+                    policy=out.get("policy", []),
+                    started=self._started,
+                    finished=time.time(),
+                    mode=self.mode,
+                    client="" if self.mode == "static" else self.client_id(),
+                )
+                for sink in self.sinks:
+                    sink.write(record)
+                stage.set("sinks", len(self.sinks))
+
+    def _finish_metrics(self) -> None:
+        """Close the run's metrics, log them and export them to `metrics_file`."""
+        self.metrics.finish()
+        logger.info("Run metrics: %s", self.metrics.summary())
+        if self.hedger is not None:
+            self.hedger.stats.log()
+        if self.metrics_file:
+            self.metrics.export(self.metrics_file)
@@ -14,7 +14,14 @@ if __name__ == "__main__" and __package__ is None:
 from dotenv import load_dotenv
 
 from src.agent_runner import AgentRunner
+from src.batch import BatchRunner, discover_projects, load_manifest
+from src.cache import ResponseCache
 from src.clients import get_client
+from src.distributed import Worker, WorkQueue
+from src.hedging import Hedger
+from src.incremental import watch
+from src.routing import Router
+from src.sinks import RunRecord, SqliteSink, open_sink
 
 load_dotenv()
 
@@ -29,72 +36,767 @@ logger = logging.getLogger("policy_agent")
 
 # Configuration from environment
 PROMPT_FILE = os.getenv("PROMPT_FILE")
+COMPACT_PROMPT_FILE = os.getenv(
+    "COMPACT_PROMPT_FILE",
+    str(Path(__file__).resolve().parents[1] / "prompts" / "agent_prompt_compact.md"),
+)
 OUTPUT_FILE_DEFAULT = os.getenv("OUTPUT_FILE")
 
 
+DEFAULT_PROMPT = (
+    "You are an assistant that extracts cross-chain policy recommendations from Solidity source code. "
+    "Produce JSON with an array named 'policy'."
+)
+
+
+DEFAULT_COMPACT_PROMPT = (
+    "You are an assistant that extracts cross-chain policy recommendations from Solidity source code. "
+    "Reply with a ```policy block: an '@events' line listing every event name once, tab-separated, "
+    "then one line per entry: source function, destination function ('=' if the same), and its events "
+    "as $n positions in the @events line."
+)
+
+
+def load_prompt_text(compact: bool = False) -> str:
+    """Return the prompt read from `PROMPT_FILE`, or the built-in default prompt.
+
+    With `compact`, the compact output variant is read from
+    `COMPACT_PROMPT_FILE` (default: `prompts/agent_prompt_compact.md`).
+    """
+    path = COMPACT_PROMPT_FILE if compact else PROMPT_FILE
+    if path:
+        try:
+            prompt_text = Path(path).read_text()
+            logger.info("Loaded prompt from %s (length %d)", path, len(prompt_text))
+            return prompt_text
+        except Exception:
+            pass
+    return DEFAULT_COMPACT_PROMPT if compact else DEFAULT_PROMPT
+
+
+def add_analysis_args(parser: argparse.ArgumentParser) -> None:
+    """Register the flags shared by every command that runs an analysis."""
+    parser.add_argument(
+        "--client",
+        choices=["google", "openai", "ollama"],
+        help="Which LLM client to use (required unless --mode static or --routing-table): 'google', 'openai', or 'ollama'",
+    )
+    parser.add_argument(
+        "--routing-table",
+        default=os.getenv("ROUTING_TABLE"),
+        help="JSON routing table choosing provider and model per prompt from its estimated tokens",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["llm", "static", "hybrid"],
+        default=os.getenv("ANALYSIS_MODE", "llm"),
+        help="'llm' asks the model, 'static' uses local analysis only, 'hybrid' asks the model only when static confidence is low (default: llm)",
+    )
+    parser.add_argument(
+        "--static-threshold",
+        type=float,
+        default=float(os.getenv("STATIC_CONFIDENCE_THRESHOLD", "0.6")),
+        help="Static confidence (0-1) at which hybrid mode skips the model (default: 0.6)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        required=False,
+        default=None,
+        help="Directory for cached LLM responses (default: $CACHE_DIR or .cache/policy_agent)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always call the model, ignoring and not updating the response cache",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Index the sources locally and send only cross-chain relevant functions and events",
+    )
+    parser.add_argument(
+        "--retrieval",
+        action="store_true",
+        default=os.getenv("RETRIEVAL_MODE", "").lower() in ("1", "true", "yes"),
+        help="Send only a manifest of contracts and signatures; the agent reads code through its tools",
+    )
+    parser.add_argument(
+        "--sink",
+        action="append",
+        default=[s for s in os.getenv("SINKS", "").split(",") if s],
+        help="Also store every run in json:<path>, jsonl:<path> or sqlite:<path> (repeatable)",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        default=os.getenv("MINIFY_SOURCES", "").lower() in ("1", "true", "yes"),
+        help="Strip comments, pragmas and redundant whitespace from the sources (line numbers are kept)",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=int(os.getenv("TOKEN_BUDGET", "0")) or None,
+        help="Warn when a run's estimated input tokens exceed N",
+    )
+    parser.add_argument(
+        "--enforce-token-budget",
+        action="store_true",
+        default=os.getenv("TOKEN_BUDGET_ENFORCE", "").lower() in ("1", "true", "yes"),
+        help="Fail before calling the model instead of warning when over --token-budget",
+    )
+    parser.add_argument(
+        "--compact-output",
+        action="store_true",
+        default=os.getenv("COMPACT_OUTPUT", "").lower() in ("1", "true", "yes"),
+        help="Ask the model for compact rows instead of JSON objects (fewer output tokens)",
+    )
+    parser.add_argument(
+        "--max-continuations",
+        type=int,
+        default=int(os.getenv("MAX_CONTINUATIONS", "2")),
+        help="Continuation requests sent for a response cut off mid-array (0 keeps only the complete entries, default: 2)",
+    )
+    parser.add_argument(
+        "--context-cache",
+        action="store_true",
+        default=os.getenv("CONTEXT_CACHE", "").lower() in ("1", "true", "yes"),
+        help="Store the system prompt and vendored/library sources in an explicit provider context cache (Gemini) and reuse it",
+    )
+    parser.add_argument(
+        "--context-cache-ttl",
+        type=float,
+        default=float(os.getenv("CONTEXT_CACHE_TTL", "900")),
+        help="Lifetime in seconds of created context caches; a run deletes its caches when it ends (default: 900)",
+    )
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=int(os.getenv("CHUNK_TOKENS", "0")) or None,
+        help="Split sources into import-connected chunks of at most N estimated tokens, analyzed concurrently",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=int(os.getenv("MAX_WORKERS", "4")),
+        help="Maximum number of concurrent agent calls in chunked mode (default: 4)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-analyze only files changed since the last run and the files importing them",
+    )
+    parser.add_argument(
+        "--hedge-client",
+        action="append",
+        default=[],
+        choices=["google", "openai", "ollama"],
+        help="Backup provider raced against --client when it is slow or fails (repeatable, in order)",
+    )
+    parser.add_argument(
+        "--hedge-budget",
+        type=float,
+        default=float(os.getenv("HEDGE_BUDGET_SECONDS", "30")),
+        help="Seconds without a usable answer before the next --hedge-client starts (default: 30)",
+    )
+
+
+def parse_analysis_args(
+    parser: argparse.ArgumentParser, argv: List[str]
+) -> argparse.Namespace:
+    """Parse `argv`, requiring `--client` unless static-only or routed."""
+    args = parser.parse_args(argv)
+    if args.client is None and args.mode != "static" and not args.routing_table:
+        parser.error("--client is required unless --mode static or --routing-table")
+    if args.routing_table and args.hedge_client:
+        parser.error("--routing-table cannot be combined with --hedge-client")
+    for spec in args.sink:
+        if spec.partition(":")[0] not in ("json", "jsonl", "sqlite"):
+            parser.error(
+                f"invalid --sink '{spec}' (use json:, jsonl: or sqlite:<path>)"
+            )
+    return args
+
+
+def close_sinks(options: Dict[str, Any]) -> None:
+    """Close the sinks opened by `runner_options`."""
+    for sink in options.get("sinks", []):
+        sink.close()
+
+
+def runner_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """Build the `AgentRunner` keyword arguments shared by all analyses.
+
+    The client is created once here so that callers running many analyses
+    (e.g. batches) reuse the same instance. Static-only runs get no client;
+    with `--routing-table` the router creates clients per prompt instead.
+    Sinks are opened here too; callers close them with `close_sinks`.
+    """
+    common = {
+        "sinks": [open_sink(spec) for spec in args.sink],
+        "prompt_text": load_prompt_text(args.compact_output),
+        "prune": args.prune,
+        "retrieval": args.retrieval,
+        "max_continuations": args.max_continuations,
+        "compact_output": args.compact_output,
+        "context_cache": args.context_cache,
+        "context_cache_ttl": args.context_cache_ttl,
+        "chunk_tokens": args.chunk_tokens,
+        "max_workers": args.max_workers,
+        "incremental": args.incremental,
+        "minify": args.minify,
+        "token_budget": args.token_budget,
+        "enforce_budget": args.enforce_token_budget,
+        "mode": args.mode,
+        "static_threshold": args.static_threshold,
+    }
+    if args.mode == "static":
+        return common
+
+    router = Router.from_file(args.routing_table) if args.routing_table else None
+
+    # Select client implementation using the client registry/factory
+    client = None
+    try:
+        if args.client:
+            client = get_client(args.client)
+    except KeyError as ke:
+        raise RuntimeError(str(ke)) from ke
+
+    hedger = None
+    if args.hedge_client:
+        try:
+            backups = [(p, get_client(p)) for p in args.hedge_client]
+            hedger = Hedger([(args.client, client)] + backups, budget=args.hedge_budget)
+        except (KeyError, ValueError) as exc:
+            raise RuntimeError(str(exc)) from exc
+
+    cache = None if args.no_cache else ResponseCache.from_env(args.cache_dir)
+    return {
+        **common,
+        "client": client,
+        "cache": cache,
+        "hedger": hedger,
+        "router": router,
+    }
+
+
+def batch_main(argv: List[str]) -> Dict[str, Any]:
+    """Entry point for `app.py batch`: analyze many projects in one process.
+
+    Flags:
+        --manifest: JSON or line-based file listing project folders.
+        --projects-dir: Parent folder whose subdirectories are projects.
+        --output-dir: Directory for per-project outputs, state and summary index.
+        --jobs: Number of projects analyzed concurrently.
+        --metrics: Write each project's run metrics to `<name>.metrics.json`.
+        Plus every analysis flag accepted by the single-project command.
+    """
+    parser = argparse.ArgumentParser(
+        prog="app.py batch", description="Analyze many projects in one process"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "--manifest", help="File listing project folders (JSON array or one per line)"
+    )
+    source.add_argument(
+        "--projects-dir",
+        help="Parent directory; every subdirectory with .sol files is a project",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=os.getenv("BATCH_OUTPUT_DIR", "output/batch"),
+        help="Directory for per-project JSON, batch state and index (default: output/batch)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.getenv("BATCH_JOBS", "4")),
+        help="Number of projects analyzed concurrently (default: 4)",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Write per-project stage timings and token counts to <output-dir>/<name>.metrics.json",
+    )
+    add_analysis_args(parser)
+    args = parse_analysis_args(parser, argv)
+
+    if args.manifest:
+        try:
+            projects = load_manifest(args.manifest)
+        except ValueError as ve:
+            parser.error(str(ve))
+    else:
+        projects = discover_projects(args.projects_dir)
+
+    options = runner_options(args)
+    batch = BatchRunner(
+        projects,
+        output_dir=args.output_dir,
+        runner_factory=lambda target, output: AgentRunner(
+            target_path=target,
+            output_file=output,
+            project=Path(output).stem,
+            metrics_file=(
+                str(Path(output).with_suffix(".metrics.json")) if args.metrics else None
+            ),
+            **options,
+        ),
+        jobs=args.jobs,
+    )
+    try:
+        summary = batch.run()
+    finally:
+        close_sinks(options)
+    logger.info(
+        "Batch finished: %d done, %d failed, index at %s",
+        summary["done"],
+        summary["failed"],
+        batch.index_path,
+    )
+    return summary
+
+
+def worker_main(argv: List[str]) -> Dict[str, Any]:
+    """Entry point for `app.py worker`: one node of a sharded batch.
+
+    Start it on every machine with the same shared `--work-dir`. Each worker
+    claims projects through lease files, analyzes them and publishes the
+    merged index once the queue is drained; see `src/distributed.py`.
+
+    Flags:
+        --work-dir: Shared directory holding the queue, leases and outputs.
+        --manifest / --projects-dir: Projects to enqueue (optional; workers
+            started without them only consume the existing queue).
+        --jobs: Number of projects analyzed concurrently by this worker.
+        --worker-id: Id recorded in leases and results (default: host-pid).
+        --lease-seconds: Lease lifetime without heartbeat.
+        --max-attempts: Claims per project before it is recorded as failed.
+        --poll-interval: Seconds between claim attempts while others hold leases.
+        --no-wait: Exit once nothing can be claimed.
+        --metrics: Write each project's run metrics next to its output.
+        Plus every analysis flag accepted by the single-project command.
+    """
+    parser = argparse.ArgumentParser(
+        prog="app.py worker",
+        description="Analyze projects claimed from a shared work directory",
+    )
+    parser.add_argument(
+        "--work-dir",
+        default=os.getenv("WORK_DIR"),
+        help="Shared directory holding the queue, leases, outputs and index (required unless WORK_DIR is set)",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--manifest", help="File listing project folders to enqueue")
+    source.add_argument(
+        "--projects-dir",
+        help="Enqueue every subdirectory with .sol files of this directory",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.getenv("WORKER_JOBS", "1")),
+        help="Number of projects analyzed concurrently by this worker (default: 1)",
+    )
+    parser.add_argument(
+        "--worker-id",
+        default=os.getenv("WORKER_ID"),
+        help="Worker id recorded in leases and results (default: <host>-<pid>)",
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=float(os.getenv("WORKER_LEASE_SECONDS", "300")),
+        help="Seconds after which a lease without heartbeat is reclaimed (default: 300)",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=int(os.getenv("WORKER_MAX_ATTEMPTS", "3")),
+        help="Claims per project, failures and expired leases included, before it is recorded as failed (default: 3)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=float(os.getenv("WORKER_POLL_SECONDS", "5")),
+        help="Seconds between claim attempts while other workers hold the remaining leases (default: 5)",
+    )
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="Exit once nothing can be claimed instead of waiting for other workers' leases",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Write per-project run metrics to <work-dir>/outputs/<name>.metrics.json",
+    )
+    add_analysis_args(parser)
+    args = parse_analysis_args(parser, argv)
+    if not args.work_dir:
+        parser.error("--work-dir is required unless WORK_DIR is set")
+
+    queue = WorkQueue(
+        args.work_dir,
+        lease_seconds=args.lease_seconds,
+        max_attempts=args.max_attempts,
+    )
+    if args.manifest or args.projects_dir:
+        try:
+            projects = (
+                load_manifest(args.manifest)
+                if args.manifest
+                else discover_projects(args.projects_dir)
+            )
+        except ValueError as ve:
+            parser.error(str(ve))
+        logger.info("Enqueued %d new project(s)", queue.enqueue(projects))
+
+    options = runner_options(args)
+    worker = Worker(
+        queue,
+        runner_factory=lambda target, output: AgentRunner(
+            target_path=target,
+            output_file=output,
+            project=Path(output).stem,
+            metrics_file=(
+                str(Path(output).with_suffix(".metrics.json")) if args.metrics else None
+            ),
+            **options,
+        ),
+        worker_id=args.worker_id,
+        jobs=args.jobs,
+        poll_interval=args.poll_interval,
+        wait=not args.no_wait,
+    )
+    try:
+        return worker.run()
+    except KeyboardInterrupt:
+        logger.info("Worker interrupted; its leases expire and are reclaimed")
+        raise
+    finally:
+        close_sinks(options)
+
+
+def serve_main(argv: List[str]) -> None:
+    """Entry point for `app.py serve`: analyze jobs submitted over HTTP.
+
+    The client, prompt and response cache are created once and shared by
+    every job; see `src/server.py` for the HTTP API.
+
+    Flags:
+        --host / --port: TCP address to listen on.
+        --socket: Listen on this Unix socket instead of TCP.
+        --workers: Number of jobs analyzed concurrently.
+        --queue-size: Maximum number of queued jobs before submissions are refused.
+        --keep-jobs: Finished jobs remembered before the oldest are evicted.
+        --data-dir: Directory for job results and extracted uploads.
+        --allowed-root: Restrict `target_path` jobs to these folders (repeatable).
+        --max-upload-mb: Largest accepted source archive.
+        --max-extract-mb: Largest total size of an archive's extracted files.
+        Plus every analysis flag accepted by the single-project command.
+    """
+    parser = argparse.ArgumentParser(
+        prog="app.py serve",
+        description="Keep the agent warm and analyze jobs submitted over HTTP",
+    )
+    parser.add_argument(
+        "--host",
+        default=os.getenv("SERVE_HOST", "127.0.0.1"),
+        help="Address to listen on (default: 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.getenv("SERVE_PORT", "8080")),
+        help="TCP port to listen on (default: 8080)",
+    )
+    parser.add_argument(
+        "--socket",
+        default=os.getenv("SERVE_SOCKET"),
+        help="Listen on this Unix socket path instead of TCP",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("SERVE_WORKERS", "2")),
+        help="Number of jobs analyzed concurrently (default: 2)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=int(os.getenv("SERVE_QUEUE_SIZE", "100")),
+        help="Maximum number of queued jobs; further submissions get HTTP 503 (default: 100)",
+    )
+    parser.add_argument(
+        "--keep-jobs",
+        type=int,
+        default=int(os.getenv("SERVE_KEEP_JOBS", "1000")),
+        help="Finished jobs kept for status and result queries; older ones and their results are deleted (default: 1000)",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=os.getenv("SERVE_DATA_DIR", "output/serve"),
+        help="Directory for job results and uploaded sources (default: output/serve)",
+    )
+    parser.add_argument(
+        "--allowed-root",
+        action="append",
+        default=[
+            r for r in os.getenv("SERVE_ALLOWED_ROOTS", "").split(os.pathsep) if r
+        ],
+        help="Only accept target_path jobs under this folder (repeatable; default: any)",
+    )
+    parser.add_argument(
+        "--max-upload-mb",
+        type=float,
+        default=float(os.getenv("SERVE_MAX_UPLOAD_MB", "64")),
+        help="Largest accepted source archive in MiB (default: 64)",
+    )
+    parser.add_argument(
+        "--max-extract-mb",
+        type=float,
+        default=float(os.getenv("SERVE_MAX_EXTRACT_MB", "512")),
+        help="Largest total size of an archive's extracted files in MiB (default: 512)",
+    )
+    add_analysis_args(parser)
+    args = parse_analysis_args(parser, argv)
+
+    from src.server import JobManager, make_server
+
+    options = runner_options(args)
+    manager = JobManager(
+        runner_factory=lambda target, output: AgentRunner(
+            target_path=target, output_file=output, **options
+        ),
+        data_dir=args.data_dir,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        allowed_roots=args.allowed_root,
+        max_upload_bytes=int(args.max_upload_mb * 1024 * 1024),
+        keep_finished=args.keep_jobs,
+        max_extracted_bytes=int(args.max_extract_mb * 1024 * 1024),
+    )
+    server = make_server(manager, args.host, args.port, args.socket)
+    manager.start()
+    logger.info(
+        "Serving on %s with %d workers",
+        args.socket or f"http://{args.host}:{server.server_address[1]}",
+        manager.workers,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.server_close()
+        manager.stop()
+        close_sinks(options)
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+def query_main(argv: List[str]) -> Any:
+    """Entry point for `app.py query`: look up policies in a SQLite store.
+
+    Commands:
+        event NAME: projects and functions emitting event NAME.
+        function NAME: entries whose source or destination function is NAME.
+        project NAME: the stored policy JSON of a project.
+        projects: every project with its run count and latest entry count.
+        import FILE...: bulk-load policy JSON files (one project per file,
+            named after the file) in a single transaction.
+
+    NAME may contain `*` wildcards. Lookups consider each project's latest
+    run unless `--all-runs` is given.
+    """
+    parser = argparse.ArgumentParser(
+        prog="app.py query", description="Query the SQLite policy store"
+    )
+    parser.add_argument(
+        "--db",
+        default=os.getenv("POLICY_DB", "output/policies.db"),
+        help="SQLite store written by --sink sqlite:<path> (default: output/policies.db)",
+    )
+    parser.add_argument(
+        "--all-runs",
+        action="store_true",
+        help="Search every stored run instead of each project's latest",
+    )
+    parser.add_argument("--json", action="store_true", help="Print rows as JSON lines")
+    parser.add_argument(
+        "command", choices=["event", "function", "project", "projects", "import"]
+    )
+    parser.add_argument(
+        "names", nargs="*", help="Event, function or project name, or files to import"
+    )
+    args = parser.parse_args(argv)
+    if args.command != "projects" and not args.names:
+        parser.error(f"'{args.command}' needs a name")
+
+    records = []
+    if args.command == "import":
+        for f in args.names:
+            try:
+                doc = json.loads(Path(f).read_text())
+                mtime = Path(f).stat().st_mtime
+            except (OSError, ValueError) as exc:
+                parser.error(f"cannot import {f}: {exc}")
+            if not isinstance(doc, dict) or not isinstance(doc.get("policy", []), list):
+                parser.error(f"cannot import {f}: not a policy JSON document")
+            records.append(
+                RunRecord(
+                    project=Path(f).stem,
+                    target_path="",
+                    policy=doc.get("policy", []),
+                    started=mtime,
+                    finished=mtime,
+                    mode="import",
+                )
+            )
+
+    store = SqliteSink(args.db)
+    try:
+        if args.command == "import":
+            rows = [{"imported": store.write_many(records)}]
+        elif args.command == "project":
+            try:
+                policy = store.policy(args.names[0])
+            except KeyError:
+                parser.error(f"unknown project: {args.names[0]}")
+            print(json.dumps(policy, indent=2))
+            return None
+        elif args.command == "projects":
+            rows = store.projects()
+        elif args.command == "event":
+            rows = store.find_event(args.names[0], args.all_runs)
+        else:
+            rows = store.find_function(args.names[0], args.all_runs)
+    finally:
+        store.close()
+    for row in rows:
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print("\t".join("" if v is None else str(v) for v in row.values()))
+    return rows
+
+
+SUBCOMMANDS = {
+    "batch": batch_main,
+    "worker": worker_main,
+    "serve": serve_main,
+    "query": query_main,
+}
+
+
 def main(argv: List[str] | None = None):
     """Entry point for the CLI.
 
     This function reads optional command-line flags to override the environment
     configuration for the prompt file, the target folder containing `.sol` files,
     and the output JSON path. If flags are not provided, environment variables
-    (or hard-coded defaults) are used.
+    (or hard-coded defaults) are used. A leading subcommand name (e.g. `batch`,
+    `worker`, `serve`, `query`) dispatches to the matching entry point instead.
 
     Flags:
         --target-path: Path to the folder with Solidity files to analyze.
         --output-file: Path where the agent's resulting JSON will be written.
         --client: Which LLM client to use.
+        --routing-table: JSON table routing each prompt by estimated tokens.
+        --mode: llm, static (no model call) or hybrid.
+        --static-threshold: Static confidence at which hybrid mode skips the model.
+        --cache-dir: Directory for the on-disk LLM response cache.
+        --no-cache: Disable the response cache for this run.
+        --prune: Send only cross-chain relevant functions plus a manifest.
+        --retrieval: Send only a manifest; the agent retrieves code via tools.
+        --minify: Strip comments and whitespace from the sources.
+        --token-budget: Estimated input token budget per run.
+        --enforce-token-budget: Fail instead of warning when over budget.
+        --compact-output: Ask for compact rows instead of JSON objects.
+        --max-continuations: Continuations requested for a truncated response.
+        --context-cache: Reuse an explicit provider cache of the stable prefix.
+        --context-cache-ttl: Lifetime in seconds of created context caches.
+        --chunk-tokens: Analyze the sources in chunks of at most this many tokens.
+        --max-workers: Number of chunks analyzed concurrently.
+        --incremental: Re-analyze only changed files and their dependents.
+        --sink: Extra destination(s) for the run (json:, jsonl:, sqlite:<path>).
+        --hedge-client: Backup provider(s) raced against --client.
+        --hedge-budget: Seconds before the next backup provider starts.
+        --watch: Keep running, re-analyzing incrementally on file changes.
+        --stream: Emit policy entries as JSONL while the model generates them.
+        --stream-file: JSONL sink for streamed entries ('-' for stdout).
+        --metrics-file: Export stage timings and token counts (JSON, or a
+            Prometheus textfile when the name ends in `.prom`).
     """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in SUBCOMMANDS:
+        return SUBCOMMANDS[argv[0]](argv[1:])
+
     parser = argparse.ArgumentParser(description="Run the cross-chain policy agent")
     parser.add_argument(
         "--target-path",
         required=True,
         help="Path to folder containing .sol files (required)",
     )
-    parser.add_argument(
-        "--client",
-        required=True,
-        choices=["google", "openai", "ollama"],
-        help="Which LLM client to use (required): 'google', 'openai', or 'ollama'",
-    )
     parser.add_argument(
         "--output-file",
         required=False,
         default=OUTPUT_FILE_DEFAULT,
         help=f"Path to write JSON output (default: {OUTPUT_FILE_DEFAULT})",
     )
-    args = parser.parse_args(argv)
-
-    # Load prompt
-    if PROMPT_FILE:
-        try:
-            prompt_text = Path(PROMPT_FILE).read_text()
-            logger.info(
-                "Loaded prompt from %s (length %d)", PROMPT_FILE, len(prompt_text)
-            )
-        except Exception:
-            prompt_text = (
-                "You are an assistant that extracts cross-chain policy recommendations from Solidity source code. "
-                "Produce JSON with an array named 'policy'."
-            )
-    else:
-        prompt_text = (
-            "You are an assistant that extracts cross-chain policy recommendations from Solidity source code. "
-            "Produce JSON with an array named 'policy'."
-        )
-    # Select client implementation using the client registry/factory
-    try:
-        client = get_client(args.client)
-    except KeyError as ke:
-        raise RuntimeError(str(ke)) from ke
+    add_analysis_args(parser)
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Watch --target-path and re-run incrementally on changes (implies --incremental)",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=2.0,
+        help="Seconds without further changes before a watch re-run starts (default: 2)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream the model output and emit each policy entry as JSONL as soon as it completes",
+    )
+    parser.add_argument(
+        "--stream-file",
+        default="-",
+        help="JSONL sink for streamed entries; '-' writes to stdout (default: -)",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=os.getenv("METRICS_FILE"),
+        help="Write stage timings, token counts and peak memory here (.prom for a Prometheus textfile, JSON otherwise)",
+    )
+    args = parse_analysis_args(parser, argv)
+    if args.watch:
+        args.incremental = True
+    if not args.output_file and (args.incremental or not args.sink):
+        parser.error("--output-file is required unless a --sink is given")
 
+    options = runner_options(args)
     runner = AgentRunner(
-        prompt_text=prompt_text,
         target_path=args.target_path,
         output_file=args.output_file,
-        client=client,
+        stream=args.stream,
+        stream_file=args.stream_file if args.stream else None,
+        metrics_file=args.metrics_file,
+        **options,
     )
-    runner.run()
+    try:
+        if args.watch:
+            try:
+                watch(runner, debounce=args.debounce)
+            except KeyboardInterrupt:
+                logger.info("Stopped watching %s", args.target_path)
+            return None
+        return runner.run()
+    finally:
+        close_sinks(options)
 
 
 if __name__ == "__main__":
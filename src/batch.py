@@ -0,0 +1,253 @@
+"""Batch analysis of many projects in one process.
+
+A batch is a list of projects, taken either from a manifest file or from the
+immediate subdirectories of a parent folder. Every project is analyzed by its
+own `AgentRunner`, but all runners share one client built once by the caller,
+so interpreter start-up, environment loading and client construction are paid
+once per batch instead of once per project.
+
+Completion state is persisted to `batch_state.json` in the output directory
+after every project. Re-running the same batch skips projects that already
+finished successfully, so an interrupted sweep resumes where it stopped.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List
+
+logger = logging.getLogger("policy_agent.batch")
+
+STATE_FILE = "batch_state.json"
+INDEX_FILE = "index.json"
+
+# Project names become output file names: no separators, no leading dot
+SAFE_NAME_RE = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9._-]*$")
+# ... and must not overwrite the batch's own files
+RESERVED_NAMES = frozenset(Path(f).stem for f in (STATE_FILE, INDEX_FILE))
+
+
+@dataclass
+class Project:
+    """A project to analyze: a unique name and the folder holding its sources."""
+
+    name: str
+    path: str
+
+
+def _unique_names(paths: List[str], taken: Iterable[str] = ()) -> List[Project]:
+    """Name projects after their folder, suffixing duplicates with a counter.
+
+    Names in `taken` and `RESERVED_NAMES` are never generated; the counter is
+    raised until the name is unused.
+    """
+    used = set(RESERVED_NAMES) | set(taken)
+    projects = []
+    for p in paths:
+        base = re.sub(r"[^A-Za-z0-9._-]", "-", Path(p).name).lstrip(".") or "project"
+        name, n = base, 1
+        while name in used:
+            n += 1
+            name = f"{base}-{n}"
+        used.add(name)
+        projects.append(Project(name=name, path=str(p)))
+    return projects
+
+
+def discover_projects(parent: str) -> List[Project]:
+    """Return every immediate subdirectory of `parent` that contains `.sol` files.
+
+    Projects are sorted by name so that batches are processed in a stable order.
+    """
+    base = Path(parent)
+    if not base.is_dir():
+        raise FileNotFoundError(f"Projects directory not found: {parent}")
+    dirs = sorted(
+        p for p in base.iterdir() if p.is_dir() and next(p.rglob("*.sol"), None)
+    )
+    return _unique_names([str(d) for d in dirs])
+
+
+def load_manifest(manifest: str) -> List[Project]:
+    """Load a list of projects from a manifest file.
+
+    The manifest is either a JSON array (of paths, or of objects with `path` and
+    optional `name`) or a plain text file with one path per line, where blank
+    lines and lines starting with `#` are ignored. Relative paths are resolved
+    against the manifest's directory. Entries without a `name` are named after
+    their folder, made filename-safe and kept distinct from the explicit names.
+
+    Raises:
+        ValueError: if explicit names are duplicated, reserved (`index`,
+            `batch_state`) or not safe file names (letters, digits, `.`, `_`
+            and `-`, not starting with a dot).
+    """
+    mpath = Path(manifest)
+    text = mpath.read_text()
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError:
+        items = [
+            line.strip()
+            for line in text.splitlines()
+            if line.strip() and not line.strip().startswith("#")
+        ]
+
+    def _resolve(p: str) -> str:
+        path = Path(p)
+        return str(path if path.is_absolute() else mpath.parent / path)
+
+    def _named(item: Any) -> bool:
+        return isinstance(item, dict) and bool(item.get("name"))
+
+    names = [i["name"] for i in items if _named(i)]
+    unsafe = [n for n in names if not SAFE_NAME_RE.match(n)]
+    if unsafe:
+        raise ValueError(f"Unsafe project names in {manifest}: {unsafe}")
+    reserved = sorted(set(names) & RESERVED_NAMES)
+    if reserved:
+        raise ValueError(f"Reserved project names in {manifest}: {reserved}")
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate project names in {manifest}: {duplicates}")
+    derived = iter(
+        _unique_names(
+            [
+                _resolve(i["path"] if isinstance(i, dict) else i)
+                for i in items
+                if not _named(i)
+            ],
+            taken=names,
+        )
+    )
+    return [
+        Project(name=i["name"], path=_resolve(i["path"]))
+        if _named(i)
+        else next(derived)
+        for i in items
+    ]
+
+
+class BatchRunner:
+    """Analyze a list of projects with bounded concurrency and resumable state.
+
+    Attributes:
+        projects: Projects to analyze, in order.
+        output_dir: Directory receiving `<name>.json` per project, the state file
+            and the summary index.
+        runner_factory: Callable `(target_path, output_file) -> AgentRunner` used to
+            build the runner for each project (typically sharing one client).
+        jobs: Maximum number of projects analyzed at the same time.
+    """
+
+    def __init__(
+        self,
+        projects: List[Project],
+        output_dir: str,
+        runner_factory: Callable[[str, str], Any],
+        jobs: int = 4,
+    ):
+        self.projects = projects
+        self.output_dir = Path(output_dir)
+        self.runner_factory = runner_factory
+        self.jobs = jobs
+        self._lock = threading.Lock()
+        self.state: Dict[str, Dict[str, Any]] = self._load_state()
+
+    @property
+    def state_path(self) -> Path:
+        return self.output_dir / STATE_FILE
+
+    @property
+    def index_path(self) -> Path:
+        return self.output_dir / INDEX_FILE
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return json.loads(self.state_path.read_text())
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            logger.warning("Ignoring corrupt batch state %s", self.state_path)
+            return {}
+
+    def _write_json(self, path: Path, data: Any) -> None:
+        """Write JSON atomically so an interrupted batch never leaves half a file."""
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, indent=2))
+        os.replace(tmp, path)
+
+    def is_done(self, project: Project) -> bool:
+        """Return True if `project` finished in a previous run and its output exists.
+
+        The recorded path must match too: a name may point at another folder
+        once the project list changed.
+        """
+        rec = self.state.get(project.name)
+        return bool(
+            rec
+            and rec.get("status") == "done"
+            and rec.get("path") == project.path
+            and Path(rec["output"]).exists()
+        )
+
+    def _run_one(self, project: Project) -> None:
+        output = self.output_dir / f"{project.name}.json"
+        started = time.perf_counter()
+        record: Dict[str, Any] = {"path": project.path, "output": str(output)}
+        try:
+            out = self.runner_factory(project.path, str(output)).run()
+            record.update(status="done", policies=len(out.get("policy", [])))
+        except Exception as exc:
+            logger.exception("Project %s failed", project.name)
+            record.update(status="failed", error=str(exc))
+        record["seconds"] = round(time.perf_counter() - started, 3)
+        record["finished"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        with self._lock:
+            self.state[project.name] = record
+            self._write_json(self.state_path, self.state)
+        logger.info(
+            "Project %s %s in %.1fs", project.name, record["status"], record["seconds"]
+        )
+
+    def run(self) -> Dict[str, Any]:
+        """Analyze all pending projects and write the summary index.
+
+        Projects already completed in a previous run are skipped; failed ones are
+        retried. A failing project is recorded and does not stop the batch.
+
+        Returns:
+            The summary index also written to `index.json`.
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        pending = [p for p in self.projects if not self.is_done(p)]
+        logger.info(
+            "Batch: %d projects, %d already done, %d pending",
+            len(self.projects),
+            len(self.projects) - len(pending),
+            len(pending),
+        )
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, self.jobs)) as pool:
+                list(pool.map(self._run_one, pending))
+        return self.write_index()
+
+    def write_index(self) -> Dict[str, Any]:
+        """Write and return the summary index of the current batch state."""
+        entries = []
+        for p in self.projects:
+            rec = self.state.get(p.name, {"status": "pending"})
+            entries.append({"name": p.name, "path": p.path, **rec})
+        index = {
+            "projects": entries,
+            "done": sum(1 for e in entries if e["status"] == "done"),
+            "failed": sum(1 for e in entries if e["status"] == "failed"),
+            "pending": sum(1 for e in entries if e["status"] == "pending"),
+        }
+        self._write_json(self.index_path, index)
+        return index
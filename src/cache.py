@@ -0,0 +1,167 @@
+"""On-disk, content-addressed cache for LLM responses.
+
+Entries are keyed by a SHA-256 digest of everything that can influence the
+model's answer: the system prompt, the combined source prompt and the identity
+of the client (class name and model). Each entry is stored as one small JSON
+file holding the raw response text and the formatted policy, so a hit can skip
+the agent round-trip entirely.
+
+Eviction is least-recently-used: a hit refreshes the entry's modification time,
+and `prune` removes expired entries first, then the oldest ones until the cache
+fits within the configured entry and byte limits.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("policy_agent.cache")
+
+DEFAULT_CACHE_DIR = ".cache/policy_agent"
+
+
+def client_identity(client: Any) -> str:
+    """Return a stable identity string for a datapizza client instance.
+
+    The identity combines the client class name with its configured model so
+    that switching provider or model never returns a stale cached answer.
+    Wrappers exposing the real client as `wrapped` (e.g. `ManagedClient`) are
+    unwrapped first.
+    """
+    while getattr(client, "wrapped", None) is not None:
+        client = client.wrapped
+    model = getattr(client, "model_name", None) or getattr(client, "model", None)
+    return f"{type(client).__name__}:{model}"
+
+
+def make_key(*parts: str) -> str:
+    """Hash an ordered sequence of strings into a hex cache key.
+
+    Parts are length-prefixed before hashing so that ("ab", "c") and ("a", "bc")
+    never collide.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        data = (part or "").encode("utf-8")
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """A directory of JSON cache entries with size/age based LRU eviction.
+
+    Attributes:
+        cache_dir: Directory holding one `<key>.json` file per entry.
+        max_entries: Maximum number of entries kept after pruning (0 = unlimited).
+        max_bytes: Maximum total size in bytes kept after pruning (0 = unlimited).
+        max_age: Maximum entry age in seconds since last use (0 = unlimited).
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_entries: int = 1000,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age: float = 30 * 24 * 3600,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    @classmethod
+    def from_env(cls, cache_dir: str | None = None) -> "ResponseCache":
+        """Build a cache configured from `CACHE_*` environment variables.
+
+        Args:
+            cache_dir: Optional directory overriding `CACHE_DIR`.
+        """
+        return cls(
+            cache_dir=cache_dir or os.getenv("CACHE_DIR") or DEFAULT_CACHE_DIR,
+            max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1000")),
+            max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+            max_age=float(os.getenv("CACHE_MAX_AGE_SECONDS", str(30 * 24 * 3600))),
+        )
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for `key`, or None on a miss.
+
+        Expired or unreadable entries are treated as misses and removed. A hit
+        refreshes the entry's modification time to mark it recently used.
+        """
+        path = self._path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if self.max_age and time.time() - stat.st_mtime > self.max_age:
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            entry = json.loads(path.read_text())
+        except Exception:
+            logger.warning("Discarding unreadable cache entry %s", path)
+            path.unlink(missing_ok=True)
+            return None
+        os.utime(path, None)
+        return entry
+
+    def put(self, key: str, raw_text: str, policy: Dict[str, Any]) -> None:
+        """Store a response under `key` and prune the cache afterwards.
+
+        The entry is written to a temporary file, unique per process and
+        thread, and renamed into place so that concurrent readers and writers
+        never observe a partially written entry.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(
+            json.dumps({"raw_text": raw_text, "policy": policy, "created": time.time()})
+        )
+        os.replace(tmp, path)
+        self.prune()
+
+    def prune(self) -> int:
+        """Evict expired entries, then least-recently-used ones over the limits.
+
+        Returns:
+            The number of entries removed.
+        """
+        if not self.cache_dir.exists():
+            return 0
+        now = time.time()
+        entries = []
+        removed = 0
+        for p in self.cache_dir.glob("*.json"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            if self.max_age and now - st.st_mtime > self.max_age:
+                p.unlink(missing_ok=True)
+                removed += 1
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+
+        entries.sort(key=lambda e: e[0])
+        total = sum(size for _, size, _ in entries)
+        while entries and (
+            (self.max_entries and len(entries) > self.max_entries)
+            or (self.max_bytes and total > self.max_bytes)
+        ):
+            _, size, p = entries.pop(0)
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        if removed:
+            logger.debug("Evicted %d cache entries from %s", removed, self.cache_dir)
+        return removed
@@ -0,0 +1,130 @@
+"""Token-budgeted chunk planning for map-reduce analysis.
+
+Large repositories do not fit in one model context, and one huge request is
+also the slowest way to get an answer. This module splits a set of Solidity
+files into chunks that stay under a token budget while keeping files that
+import each other together, so each chunk can be analyzed by an independent
+agent call and the partial policies merged afterwards.
+"""
+from typing import Dict, List
+
+from .indexer import SolidityIndex
+
+# Rough average for code across tokenizers; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Return a cheap estimate of the number of tokens in `text`."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _components(index: SolidityIndex) -> List[List[str]]:
+    """Group project files into connected components of the import graph.
+
+    Edges to vendored files are ignored: almost everything imports them, so
+    following those edges would collapse the whole repository into one group.
+    Within a component files are ordered dependencies-first.
+    """
+    graph = index.import_graph()
+    vendored = {p for p, fi in index.files.items() if fi.is_vendored}
+    adj: Dict[str, set] = {p: set() for p in graph}
+    for src, deps in graph.items():
+        if src in vendored:
+            continue
+        for dst in deps:
+            if dst not in vendored:
+                adj[src].add(dst)
+                adj[dst].add(src)
+
+    seen: set = set()
+    components: List[List[str]] = []
+    for start in graph:
+        if start in seen:
+            continue
+        seen.add(start)
+        stack, members = [start], set()
+        while stack:
+            node = stack.pop()
+            members.add(node)
+            for nxt in adj[node]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        components.append(_topo_order(members, graph))
+    return components
+
+
+def _topo_order(members: set, graph: Dict[str, List[str]]) -> List[str]:
+    """Order `members` so that imported files come before their importers."""
+    order: List[str] = []
+    visited: set = set()
+    for root in sorted(members):
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(graph.get(root, [])))]
+        while stack:
+            node, it = stack[-1]
+            for dep in it:
+                if dep in members and dep not in visited:
+                    visited.add(dep)
+                    stack.append((dep, iter(graph.get(dep, []))))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+    return order
+
+
+def plan_chunks(
+    sources: Dict[str, str], budget: int, index: SolidityIndex | None = None
+) -> List[List[str]]:
+    """Split files into chunks whose estimated size stays within `budget` tokens.
+
+    Import-connected components are packed whole, largest first, into the first
+    chunk with room (first-fit decreasing). A component larger than the budget
+    is split in dependency order, so each piece still carries the files it
+    builds on where possible. A single file larger than the budget gets a chunk
+    of its own.
+
+    Args:
+        sources: Mapping of relative path to file contents.
+        budget: Maximum estimated source tokens per chunk.
+        index: Optional pre-built index of `sources`.
+
+    Returns:
+        A list of chunks, each a list of relative file paths.
+    """
+    index = index or SolidityIndex.from_sources(sources)
+    cost = {p: estimate_tokens(src) for p, src in sources.items()}
+    pieces: List[List[str]] = []
+    for comp in _components(index):
+        if sum(cost[p] for p in comp) <= budget:
+            pieces.append(comp)
+            continue
+        current: List[str] = []
+        size = 0
+        for p in comp:
+            if current and size + cost[p] > budget:
+                pieces.append(current)
+                current, size = [], 0
+            current.append(p)
+            size += cost[p]
+        if current:
+            pieces.append(current)
+
+    pieces.sort(key=lambda piece: -sum(cost[p] for p in piece))
+    chunks: List[List[str]] = []
+    sizes: List[int] = []
+    for piece in pieces:
+        piece_cost = sum(cost[p] for p in piece)
+        for i, used in enumerate(sizes):
+            if used + piece_cost <= budget:
+                chunks[i].extend(piece)
+                sizes[i] += piece_cost
+                break
+        else:
+            chunks.append(list(piece))
+            sizes.append(piece_cost)
+    return chunks
@@ -9,16 +9,64 @@ if/else blocks in the CLI.
 The registry holds callables with signature: Callable[[dict], Any]
 which should accept a dict of keyword configuration values and return an
 instance implementing the expected datapizza client interface.
+
+Clients returned by `get_client` are cached per provider and configuration, so
+every caller shares one instance (and its HTTP connection pool), and are
+wrapped in a `ManagedClient` that applies the provider's rate limits and
+retries transient failures. See `get_client` for the configuration keys.
+
+Providers with explicit context caching (Gemini) register a
+`ContextCacheAdapter` with `register_context_cache`. `ManagedClient.context_cache`
+then creates a provider-side cache of a stable prompt prefix once and reuses
+its handle until it expires, and `ManagedClient.invoke_cached` sends only the
+rest of the prompt. Providers with automatic prefix caching (OpenAI) need no
+handle: a stable prefix is enough, and cached tokens show up in the usage.
 """
+import email.utils
+import json
 import logging
 import os
-from typing import Any, Callable, Dict
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .cache import make_key
+from .chunking import estimate_tokens
 
 logger = logging.getLogger("policy_agent.clients")
 
 # Registry mapping provider key -> factory callable
 _REGISTRY: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
 
+# Cached client instances keyed by provider + configuration
+_INSTANCES: Dict[str, Any] = {}
+_INSTANCES_LOCK = threading.Lock()
+
+# Limiters shared by every client of a provider
+_LIMITERS: Dict[str, "ProviderLimiter"] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+# Context-cache adapters by provider and the live handles they created
+_CONTEXT_CACHES: Dict[str, "ContextCacheAdapter"] = {}
+_HANDLES: Dict[str, "ContextCacheHandle"] = {}
+_HANDLES_LOCK = threading.Lock()
+# Held while a handle is created, so concurrent misses create a single cache
+_CREATE_LOCKS: Dict[str, threading.Lock] = {}
+
+# Keys of the `cfg` dict consumed here rather than by the provider factory
+MANAGED_KEYS = (
+    "reuse",
+    "rpm",
+    "tpm",
+    "max_concurrency",
+    "max_retries",
+    "backoff_base",
+    "backoff_max",
+)
+
 
 def register(provider: str, factory: Callable[[Dict[str, Any]], Any]) -> None:
     """Register a factory for a provider key.
@@ -29,8 +77,37 @@ def register(provider: str, factory: Callable[[Dict[str, Any]], Any]) -> None:
     logger.debug("Registered client provider '%s'", provider)
 
 
+def _env_name(provider: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]", "_", provider).upper()
+
+
+def _setting(cfg: Dict[str, Any], key: str, env: str, default: float) -> float:
+    value = cfg.get(key)
+    if value is None:
+        value = os.getenv(env)
+    return float(default if value in (None, "") else value)
+
+
 def get_client(provider: str, config: Dict[str, Any] | None = None) -> Any:
-    """Return a client instance for the given provider.
+    """Return a managed client instance for the given provider.
+
+    Instances are cached by provider and configuration: repeated calls with the
+    same arguments return the same `ManagedClient`, sharing the underlying
+    SDK client and its connection pool.
+
+    Besides the provider's own keys (api_key, model, ...), `config` accepts
+    the following keys, each falling back to an environment variable
+    (`<PROVIDER>` is the upper-cased provider key):
+
+    - `reuse`: set to False to build a fresh, uncached instance.
+    - `rpm` / `tpm`: requests and tokens per minute allowed for the provider,
+      shared by all its clients (`<PROVIDER>_RPM`, `<PROVIDER>_TPM`; 0 means
+      unlimited).
+    - `max_concurrency`: maximum simultaneous requests to the provider
+      (`<PROVIDER>_MAX_CONCURRENCY`; 0 means unlimited).
+    - `max_retries`, `backoff_base`, `backoff_max`: retry policy for rate
+      limits, 5xx responses and connection errors (`LLM_MAX_RETRIES`,
+      `LLM_BACKOFF_BASE`, `LLM_BACKOFF_MAX`; defaults 5, 1s and 60s).
 
     Args:
         provider: The provider key (e.g. 'google', 'openai').
@@ -49,13 +126,523 @@ def get_client(provider: str, config: Dict[str, Any] | None = None) -> Any:
             f"Unknown client provider: '{provider}'. Available: {list(_REGISTRY.keys())}"
         )
 
+    reuse = str(cfg.get("reuse", True)).lower() not in ("0", "false", "no")
+    key = make_key(provider, json.dumps(cfg, sort_keys=True, default=str))
+    if reuse:
+        with _INSTANCES_LOCK:
+            if key in _INSTANCES:
+                return _INSTANCES[key]
+
+    env = _env_name(provider)
     try:
-        return factory(cfg)
+        inner = factory({k: v for k, v in cfg.items() if k not in MANAGED_KEYS})
     except Exception as exc:
         # surface a clearer error message for optional dependencies
         raise RuntimeError(
             f"Failed to instantiate client for provider '{provider}': {exc}"
         ) from exc
+    client = ManagedClient(
+        inner,
+        provider,
+        limiter=provider_limiter(
+            provider,
+            rpm=_setting(cfg, "rpm", f"{env}_RPM", 0),
+            tpm=_setting(cfg, "tpm", f"{env}_TPM", 0),
+            max_concurrency=int(
+                _setting(cfg, "max_concurrency", f"{env}_MAX_CONCURRENCY", 0)
+            ),
+        ),
+        retry=RetryPolicy(
+            max_retries=int(_setting(cfg, "max_retries", "LLM_MAX_RETRIES", 5)),
+            base=_setting(cfg, "backoff_base", "LLM_BACKOFF_BASE", 1.0),
+            max_delay=_setting(cfg, "backoff_max", "LLM_BACKOFF_MAX", 60.0),
+        ),
+    )
+    if reuse:
+        with _INSTANCES_LOCK:
+            client = _INSTANCES.setdefault(key, client)
+    return client
+
+
+def clear_client_cache() -> None:
+    """Forget cached client instances, provider limiters and context-cache handles."""
+    with _INSTANCES_LOCK:
+        _INSTANCES.clear()
+    with _LIMITERS_LOCK:
+        _LIMITERS.clear()
+    with _HANDLES_LOCK:
+        _HANDLES.clear()
+        _CREATE_LOCKS.clear()
+
+
+@dataclass
+class ContextCacheHandle:
+    """A provider-side cache of a prompt prefix.
+
+    Attributes:
+        name: Provider identifier of the cache, passed with each request.
+        provider: Provider key the cache belongs to.
+        tokens: Estimated tokens of the cached system prompt and prefix.
+        expires: Epoch seconds after which the provider drops the cache.
+        uses: Requests sent with the handle so far.
+        holders: `context_cache` calls not yet matched by a
+            `release_context_cache`; the cache is deleted when it drops to 0.
+        key: Registry key of the handle.
+    """
+
+    name: str
+    provider: str
+    tokens: int
+    expires: float
+    uses: int = 0
+    holders: int = 0
+    key: str = ""
+
+
+class ContextCacheAdapter:
+    """Provider hooks behind `ManagedClient.context_cache` and `invoke_cached`.
+
+    Attributes:
+        min_tokens: Prefixes estimated below this size are not cached (providers
+            reject or do not discount small caches).
+    """
+
+    min_tokens = 0
+
+    def create(self, client: Any, system_prompt: str, prefix: str, ttl: float) -> str:
+        """Cache `system_prompt` and `prefix` for `ttl` seconds; return the cache name."""
+        raise NotImplementedError
+
+    def generate(self, client: Any, name: str, input: str, **kwargs: Any) -> Any:
+        """Answer `input` after the cached content `name`; return a `ClientResponse`."""
+        raise NotImplementedError
+
+    def delete(self, client: Any, name: str) -> None:
+        """Delete the cached content `name` before its TTL runs out."""
+
+
+def register_context_cache(provider: str, adapter: ContextCacheAdapter) -> None:
+    """Register the explicit context-cache support of `provider`."""
+    _CONTEXT_CACHES[provider] = adapter
+
+
+class TokenBucket:
+    """A thread-safe token bucket refilled continuously at `per_minute` / 60 per second.
+
+    `reserve` debits immediately and returns how long the caller must wait
+    before its reservation is covered, so waiting callers are served in order.
+    The bucket holds at most one minute worth of tokens.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self._tokens = per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n: float) -> float:
+        """Take `n` tokens (a negative `n` returns tokens) and return the wait in seconds."""
+        with self._lock:
+            now = time.monotonic()
+            rate = self.per_minute / 60.0
+            self._tokens = min(
+                self.per_minute, self._tokens + (now - self._updated) * rate
+            )
+            self._updated = now
+            # a single request larger than the bucket waits for a full bucket
+            self._tokens -= min(n, self.per_minute)
+            return max(0.0, -self._tokens / rate)
+
+
+class ProviderLimiter:
+    """Request, token and concurrency limits shared by all clients of a provider.
+
+    Attributes:
+        requests: Bucket of requests per minute, or None if unlimited.
+        tokens: Bucket of tokens per minute, or None if unlimited.
+        slots: Semaphore bounding simultaneous requests, or None if unlimited.
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, max_concurrency: int = 0):
+        self.settings = (rpm, tpm, max_concurrency)
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.slots = (
+            threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+        )
+
+    def acquire(self, tokens: int) -> float:
+        """Wait until a request of about `tokens` tokens may start.
+
+        Returns:
+            The seconds spent waiting for the rate limits.
+        """
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.reserve(1)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            logger.debug("Rate limit reached, waiting %.2fs", wait)
+            time.sleep(wait)
+        return wait
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Correct the token bucket once the provider reported the real usage."""
+        if self.tokens is not None and actual > 0:
+            self.tokens.reserve(actual - estimated)
+
+
+def provider_limiter(
+    provider: str, rpm: float = 0, tpm: float = 0, max_concurrency: int = 0
+) -> ProviderLimiter:
+    """Return the limiter shared by `provider`'s clients.
+
+    The first call for a provider creates it; a later call with different
+    limits replaces it for clients created afterwards.
+    """
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(provider)
+        if limiter is None or limiter.settings != (rpm, tpm, max_concurrency):
+            limiter = _LIMITERS[provider] = ProviderLimiter(rpm, tpm, max_concurrency)
+        return limiter
+
+
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+RETRY_STATUSES = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+_RETRY_DELAY_RE = re.compile(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s")
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Return the server-requested delay carried by `exc`, in seconds.
+
+    Reads the `Retry-After` header (seconds or HTTP date) of the error's HTTP
+    response, falling back to a `retryDelay` hint in the error body as sent by
+    Google's APIs.
+    """
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+    except Exception:
+        value = None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            parsed = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            parsed = None
+        if parsed is not None:
+            return max(0.0, parsed.timestamp() - time.time())
+    m = _RETRY_DELAY_RE.search(str(exc))
+    return float(m.group(1)) if m else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return True for rate limits, 5xx responses, timeouts and connection errors."""
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRY_STATUSES or status >= 500
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name or "RateLimit" in name
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff honoring server-requested delays.
+
+    Attempt `n` (from 0) waits a random time in `[0, min(max_delay, base * 2**n)]`
+    ("full jitter"), or the server's `Retry-After` if that is longer.
+    """
+
+    max_retries: int = 5
+    base: float = 1.0
+    max_delay: float = 60.0
+
+    def delay(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Return the wait before retrying after `exc`, or None to give up."""
+        if attempt >= self.max_retries or not is_retryable(exc):
+            return None
+        backoff = random.uniform(0, min(self.max_delay, self.base * 2**attempt))
+        server = retry_after(exc)
+        return max(backoff, server) if server is not None else backoff
+
+
+def _request_tokens(input: Any, memory: Any = None, system_prompt: Any = None) -> int:
+    parts = [input] if isinstance(input, str) else list(input or [])
+    if memory:
+        parts.extend(memory.iter_blocks())
+    text = "".join(
+        p if isinstance(p, str) else str(getattr(p, "content", "") or "") for p in parts
+    )
+    return estimate_tokens(text + (system_prompt or ""))
+
+
+class ManagedClient:
+    """Wrap a datapizza client with a provider limiter and a retry policy.
+
+    `invoke` and `stream_invoke` wait for the provider's rate limits, hold a
+    concurrency slot for the duration of the request and retry transient
+    failures. A streamed request is only retried if it failed before the first
+    chunk. Every other attribute is delegated to the wrapped client.
+
+    Attributes:
+        wrapped: The underlying datapizza client.
+        provider: The provider key the client was created for.
+        limiter: The provider's shared `ProviderLimiter`.
+        retry: The `RetryPolicy` applied to failed requests.
+    """
+
+    def __init__(
+        self,
+        wrapped: Any,
+        provider: str,
+        limiter: Optional[ProviderLimiter] = None,
+        retry: Optional[RetryPolicy] = None,
+    ):
+        self.wrapped = wrapped
+        self.provider = provider
+        self.limiter = limiter or ProviderLimiter()
+        self.retry = retry or RetryPolicy()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.wrapped, name)
+
+    @property
+    def supports_context_cache(self) -> bool:
+        """True if the provider registered a `ContextCacheAdapter`."""
+        return self.provider in _CONTEXT_CACHES
+
+    def context_cache(
+        self, system_prompt: str, prefix: str, ttl: float = 900
+    ) -> Optional[ContextCacheHandle]:
+        """Return a live cache of `system_prompt` + `prefix`, creating it if needed.
+
+        Handles are shared per provider, model and content, and recreated
+        shortly before they expire. Concurrent misses of one key wait for a
+        single creation. Each call must be matched by `release_context_cache`.
+
+        Returns:
+            The handle, or None if the provider has no explicit context caching
+            or the prefix is below its `min_tokens`.
+        """
+        adapter = _CONTEXT_CACHES.get(self.provider)
+        tokens = estimate_tokens(system_prompt + prefix)
+        if adapter is None or not prefix or tokens < adapter.min_tokens:
+            return None
+        model = getattr(self.wrapped, "model_name", None)
+        key = make_key(self.provider, str(model), system_prompt, prefix)
+        with _HANDLES_LOCK:
+            create_lock = _CREATE_LOCKS.setdefault(key, threading.Lock())
+        with create_lock:
+            with _HANDLES_LOCK:
+                handle = _HANDLES.get(key)
+                # keep a margin so that a request never races the expiry
+                if handle is not None and handle.expires > time.time() + min(
+                    60, ttl / 10
+                ):
+                    handle.uses += 1
+                    handle.holders += 1
+                    return handle
+            name = self._call(
+                tokens, lambda: adapter.create(self.wrapped, system_prompt, prefix, ttl)
+            )
+            handle = ContextCacheHandle(
+                name, self.provider, tokens, time.time() + ttl, 1, 1, key
+            )
+            logger.info(
+                "Created %s context cache %s (~%d tokens, ttl %ds)",
+                self.provider,
+                name,
+                tokens,
+                ttl,
+            )
+            with _HANDLES_LOCK:
+                _HANDLES[key] = handle
+        return handle
+
+    def release_context_cache(self, handle: ContextCacheHandle) -> None:
+        """Give back a handle from `context_cache`; delete it once unused.
+
+        A failed deletion is logged; the provider still drops the cache when
+        its TTL runs out.
+        """
+        with _HANDLES_LOCK:
+            handle.holders -= 1
+            if handle.holders > 0:
+                return
+            if _HANDLES.get(handle.key) is handle:
+                del _HANDLES[handle.key]
+        adapter = _CONTEXT_CACHES[handle.provider]
+        try:
+            self._call(0, lambda: adapter.delete(self.wrapped, handle.name))
+        except Exception as exc:
+            logger.warning(
+                "Could not delete %s context cache %s: %s",
+                handle.provider,
+                handle.name,
+                exc,
+            )
+            return
+        logger.info(
+            "Deleted %s context cache %s after %d requests",
+            handle.provider,
+            handle.name,
+            handle.uses,
+        )
+
+    def invoke_cached(
+        self, handle: ContextCacheHandle, input: str, **kwargs: Any
+    ) -> Any:
+        """Send `input` after the cached prefix of `handle`, within the limits."""
+        adapter = _CONTEXT_CACHES[handle.provider]
+        return self._call(
+            estimate_tokens(input),
+            lambda: adapter.generate(self.wrapped, handle.name, input, **kwargs),
+        )
+
+    def _call(self, estimated: int, request: Callable[[], Any]) -> Any:
+        """Run `request` within the limiter, retrying transient failures.
+
+        The concurrency slot is released before backing off, so a request
+        waiting out a `Retry-After` does not block the others.
+        """
+        attempt = 0
+        while True:
+            self.limiter.acquire(estimated)
+            slots = self.limiter.slots
+            if slots is not None:
+                slots.acquire()
+            error = None
+            try:
+                response = request()
+            except Exception as exc:
+                error = exc
+            finally:
+                if slots is not None:
+                    slots.release()
+            if error is not None:
+                self._backoff(error, attempt)
+                attempt += 1
+                continue
+            self.limiter.settle(estimated, _usage(response))
+            return response
+
+    def __repr__(self) -> str:
+        return f"ManagedClient({self.provider}, {self.wrapped!r})"
+
+    def _backoff(self, exc: BaseException, attempt: int) -> None:
+        delay = self.retry.delay(exc, attempt)
+        if delay is None:
+            raise exc
+        logger.warning(
+            "%s request failed (%s), retry %d/%d in %.1fs",
+            self.provider,
+            exc,
+            attempt + 1,
+            self.retry.max_retries,
+            delay,
+        )
+        time.sleep(delay)
+
+    def invoke(self, input: Any, *args: Any, **kwargs: Any) -> Any:
+        """Call the wrapped client's `invoke` within the limits, retrying failures."""
+        estimated = _request_tokens(
+            input, kwargs.get("memory"), kwargs.get("system_prompt")
+        )
+        return self._call(
+            estimated, lambda: self.wrapped.invoke(input, *args, **kwargs)
+        )
+
+    def stream_invoke(self, input: Any, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        """Stream from the wrapped client within the limits, retrying failures before the first chunk."""
+        estimated = _request_tokens(
+            input, kwargs.get("memory"), kwargs.get("system_prompt")
+        )
+        attempt = 0
+        while True:
+            self.limiter.acquire(estimated)
+            slots = self.limiter.slots
+            if slots is not None:
+                slots.acquire()
+            last, error = None, None
+            try:
+                for last in self.wrapped.stream_invoke(input, *args, **kwargs):
+                    yield last
+            except Exception as exc:
+                if last is not None:
+                    raise
+                error = exc
+            finally:
+                if slots is not None:
+                    slots.release()
+            if error is not None:
+                self._backoff(error, attempt)
+                attempt += 1
+                continue
+            self.limiter.settle(estimated, _usage(last))
+            return
+
+
+def _usage(response: Any) -> int:
+    return int(getattr(response, "prompt_tokens_used", 0) or 0) + int(
+        getattr(response, "completion_tokens_used", 0) or 0
+    )
+
+
+class GoogleContextCache(ContextCacheAdapter):
+    """Gemini explicit context caching through the GoogleClient's genai client.
+
+    A cached request carries neither system instruction nor tools (Gemini
+    requires both to live in the cache), so it is sent to the genai client
+    directly rather than through the datapizza request builder.
+    """
+
+    min_tokens = int(os.getenv("GOOGLE_CONTEXT_CACHE_MIN_TOKENS", "1024"))
+
+    def create(self, client: Any, system_prompt: str, prefix: str, ttl: float) -> str:
+        from google.genai import types
+
+        cache = client.client.caches.create(
+            model=client.model_name,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_prompt or None,
+                contents=[types.UserContent(parts=[types.Part(text=prefix)])],
+                ttl=f"{int(ttl)}s",
+            ),
+        )
+        return cache.name
+
+    def generate(self, client: Any, name: str, input: str, **kwargs: Any) -> Any:
+        from google.genai import types
+
+        response = client.client.models.generate_content(
+            model=client.model_name,
+            contents=input,
+            config=types.GenerateContentConfig(
+                cached_content=name,
+                temperature=kwargs.get("temperature") or client.temperature,
+                max_output_tokens=kwargs.get("max_tokens") or None,
+            ),
+        )
+        return client._response_to_client_response(response, {})
+
+    def delete(self, client: Any, name: str) -> None:
+        client.client.caches.delete(name=name)
 
 
 # Register built-in providers at import time.
@@ -144,6 +731,7 @@ def _register_builtin_providers() -> None:
     register("google", google_factory)
     register("openai", openai_factory)
     register("ollama", ollama_factory)
+    register_context_cache("google", GoogleContextCache())
 
 
 _register_builtin_providers()
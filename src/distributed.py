@@ -0,0 +1,440 @@
+"""Sharded batch execution by several worker processes over a shared directory.
+
+Workers on any number of machines cooperate through a work directory on a
+shared filesystem (NFS, SMB, a mounted bucket with POSIX semantics); no broker
+is needed. The directory holds:
+
+- `jobs/<name>.json`: one file per project to analyze, written by `enqueue`
+  (idempotent, so every worker may enqueue the same manifest),
+- `leases/<name>.lease`: the claim of a running project. It is created with
+  `O_CREAT | O_EXCL`, so exactly one worker wins a project, and renewed by a
+  heartbeat thread of its owner. A lease whose `expires` time has passed
+  belongs to a crashed or partitioned worker and is reclaimed by the next
+  worker looking for work,
+- `outputs/<name>.json`: the policy written by the project's `AgentRunner`,
+- `results/<name>.json`: the outcome of the project (status, entry count,
+  duration, worker), written atomically once the project finishes,
+- `index.json`: the merged run index of every project, published by each
+  worker when the queue is drained.
+
+Lease expiry relies on the workers' clocks being roughly in sync (NTP), and
+on `lease_seconds` being several heartbeat intervals long. A worker that
+finds its lease taken over on a heartbeat discards its result; the outputs of
+both attempts are equivalent analyses of the same sources.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .batch import INDEX_FILE, Project
+
+logger = logging.getLogger("policy_agent.distributed")
+
+JOBS_DIR = "jobs"
+LEASES_DIR = "leases"
+OUTPUTS_DIR = "outputs"
+RESULTS_DIR = "results"
+
+
+def default_worker_id() -> str:
+    """Return `<host>-<pid>`, unique among the workers of one sweep."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+@dataclass
+class Lease:
+    """A worker's claim on one project.
+
+    Attributes:
+        name: Project name.
+        path: Folder holding the project's sources.
+        worker: Id of the worker holding the lease.
+        token: Random id of this claim; a reclaimed lease gets a new one.
+        expires: Epoch seconds after which other workers may reclaim it.
+        attempt: Number of times the project was claimed, this claim included.
+    """
+
+    name: str
+    path: str
+    worker: str
+    token: str
+    expires: float
+    attempt: int = 1
+
+
+class WorkQueue:
+    """The shared work directory: jobs, leases, outputs, results and index.
+
+    Attributes:
+        root: The work directory.
+        lease_seconds: Lifetime of a lease without heartbeat.
+        max_attempts: Claims per project before it is recorded as failed
+            (failed runs and expired leases both count).
+    """
+
+    def __init__(self, root: str, lease_seconds: float = 300, max_attempts: int = 3):
+        self.root = Path(root)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        for sub in (JOBS_DIR, LEASES_DIR, OUTPUTS_DIR, RESULTS_DIR):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+
+    @property
+    def index_path(self) -> Path:
+        return self.root / INDEX_FILE
+
+    def output_path(self, name: str) -> Path:
+        return self.root / OUTPUTS_DIR / f"{name}.json"
+
+    def _lease_path(self, name: str) -> Path:
+        return self.root / LEASES_DIR / f"{name}.lease"
+
+    def _result_path(self, name: str) -> Path:
+        return self.root / RESULTS_DIR / f"{name}.json"
+
+    def _write_json(self, path: Path, data: Any) -> None:
+        """Write JSON atomically; the temporary name is unique per process and thread."""
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(data, indent=2))
+        os.replace(tmp, path)
+
+    def _read_json(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            logger.warning("Ignoring unreadable %s", path)
+            return None
+
+    def enqueue(self, projects: List[Project]) -> int:
+        """Add `projects` to the queue, skipping names already queued.
+
+        Returns:
+            How many projects were added.
+        """
+        added = 0
+        for p in projects:
+            path = self.root / JOBS_DIR / f"{p.name}.json"
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                queued = self._read_json(path)
+                if queued is not None and queued.get("path") != p.path:
+                    logger.warning(
+                        "Project %s is already queued with path %s, keeping it",
+                        p.name,
+                        queued.get("path"),
+                    )
+                continue
+            with os.fdopen(fd, "w") as fh:
+                json.dump(asdict(p), fh)
+            added += 1
+        return added
+
+    def jobs(self) -> List[Project]:
+        """Return every queued project, sorted by name."""
+        projects = []
+        for path in sorted((self.root / JOBS_DIR).glob("*.json")):
+            spec = self._read_json(path)
+            if spec is not None:
+                projects.append(Project(name=spec["name"], path=spec["path"]))
+        return projects
+
+    def result(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the recorded outcome of project `name`, if any."""
+        return self._read_json(self._result_path(name))
+
+    def is_finished(self, name: str) -> bool:
+        """True if `name` is done, or failed with no attempt left."""
+        rec = self.result(name)
+        if rec is None:
+            return False
+        return rec["status"] == "done" or rec.get("attempts", 1) >= self.max_attempts
+
+    def read_lease(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the lease of project `name`, or None if it is not claimed.
+
+        A lease file caught between its creation and its first write reads as
+        live until `lease_seconds` after its modification time.
+        """
+        path = self._lease_path(name)
+        try:
+            text = path.read_text()
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return {"token": None, "expires": mtime + self.lease_seconds}
+
+    def claim(self, worker: str) -> Optional[Lease]:
+        """Lease the first unfinished project nobody holds a live lease on.
+
+        Returns:
+            The new lease, or None if no project can be claimed right now.
+        """
+        for job in self.jobs():
+            if self.is_finished(job.name):
+                continue
+            lease = self._try_claim(job, worker)
+            if lease is None:
+                continue
+            # the previous holder may have finished between the check and the claim
+            if self.is_finished(job.name):
+                self.release(lease)
+                continue
+            return lease
+        return None
+
+    def _try_claim(self, job: Project, worker: str) -> Optional[Lease]:
+        path = self._lease_path(job.name)
+        attempt = (self.result(job.name) or {}).get("attempts", 0) + 1
+        current = self.read_lease(job.name)
+        if current is not None:
+            if current["expires"] > time.time():
+                return None
+            # moving the expired lease aside succeeds for one reclaimer only
+            stale = path.with_name(f".{path.name}.{uuid.uuid4().hex}.expired")
+            try:
+                os.rename(path, stale)
+            except FileNotFoundError:
+                return None
+            stale.unlink()
+            logger.warning(
+                "Reclaiming %s from worker %s (lease expired %.0fs ago)",
+                job.name,
+                current.get("worker", "unknown"),
+                time.time() - current["expires"],
+            )
+            attempt = max(attempt, current.get("attempt", 1) + 1)
+        lease = Lease(
+            job.name,
+            job.path,
+            worker,
+            uuid.uuid4().hex,
+            time.time() + self.lease_seconds,
+            attempt,
+        )
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, "w") as fh:
+            json.dump(asdict(lease), fh)
+        if attempt > self.max_attempts:
+            self.record(
+                lease,
+                {"status": "failed", "error": f"lease lost {attempt - 1} times"},
+            )
+            self.release(lease)
+            return None
+        return lease
+
+    def renew(self, lease: Lease) -> bool:
+        """Extend `lease` by `lease_seconds`.
+
+        Returns:
+            False if the lease was reclaimed by another worker meanwhile.
+        """
+        current = self.read_lease(lease.name)
+        if current is None or current.get("token") != lease.token:
+            return False
+        lease.expires = time.time() + self.lease_seconds
+        self._write_json(self._lease_path(lease.name), asdict(lease))
+        return True
+
+    def release(self, lease: Lease) -> None:
+        """Remove `lease` if it is still held."""
+        current = self.read_lease(lease.name)
+        if current is not None and current.get("token") == lease.token:
+            self._lease_path(lease.name).unlink(missing_ok=True)
+
+    def record(self, lease: Lease, outcome: Dict[str, Any]) -> None:
+        """Write the outcome of the claim `lease` to the project's result file."""
+        self._write_json(
+            self._result_path(lease.name),
+            {
+                "path": lease.path,
+                "output": str(self.output_path(lease.name)),
+                "worker": lease.worker,
+                "attempts": lease.attempt,
+                "finished": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                **outcome,
+            },
+        )
+
+    def drained(self) -> bool:
+        """True once every queued project is finished."""
+        return all(self.is_finished(job.name) for job in self.jobs())
+
+    def write_index(self) -> Dict[str, Any]:
+        """Merge the results of every project into `index.json` and return it.
+
+        Projects are `done`, `failed`, `running` (live lease) or `pending`.
+        """
+        entries = []
+        for job in self.jobs():
+            rec = self.result(job.name)
+            lease = self.read_lease(job.name)
+            if rec is not None and (self.is_finished(job.name) or lease is None):
+                entry = rec
+            elif lease is not None and lease["expires"] > time.time():
+                entry = {"status": "running", "worker": lease.get("worker")}
+            else:
+                entry = {"status": "pending"}
+            entries.append({"name": job.name, "path": job.path, **entry})
+        index: Dict[str, Any] = {"projects": entries}
+        for status in ("done", "failed", "running", "pending"):
+            index[status] = sum(1 for e in entries if e["status"] == status)
+        workers: Dict[str, int] = {}
+        for e in entries:
+            if e["status"] == "done":
+                workers[e["worker"]] = workers.get(e["worker"], 0) + 1
+        index["workers"] = workers
+        self._write_json(self.index_path, index)
+        return index
+
+
+class Worker:
+    """Claim and analyze projects from a `WorkQueue` until it is drained.
+
+    Attributes:
+        queue: The shared work queue.
+        runner_factory: Callable `(target_path, output_file) -> AgentRunner`,
+            as for `BatchRunner`.
+        worker_id: Id recorded in leases and results.
+        jobs: Projects analyzed at the same time by this worker.
+        poll_interval: Seconds between claim attempts while every unfinished
+            project is leased by another worker.
+        heartbeat_interval: Seconds between lease renewals (a third of the
+            queue's `lease_seconds` by default).
+        wait: When False, stop as soon as nothing can be claimed instead of
+            waiting for other workers' leases to finish or expire.
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        runner_factory: Callable[[str, str], Any],
+        worker_id: Optional[str] = None,
+        jobs: int = 1,
+        poll_interval: float = 5.0,
+        heartbeat_interval: Optional[float] = None,
+        wait: bool = True,
+    ):
+        self.queue = queue
+        self.runner_factory = runner_factory
+        self.worker_id = worker_id or default_worker_id()
+        self.jobs = jobs
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval or queue.lease_seconds / 3
+        self.wait = wait
+        self.completed = 0
+        self._held: Dict[str, Lease] = {}
+        self._lost: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+
+    def run(self) -> Dict[str, Any]:
+        """Work until the queue is drained, then publish and return the index."""
+        logger.info(
+            "Worker %s joined %s (%d job(s))",
+            self.worker_id,
+            self.queue.root,
+            len(self.queue.jobs()),
+        )
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, self.jobs)) as pool:
+                list(pool.map(lambda _: self._loop(), range(max(1, self.jobs))))
+        finally:
+            self._finished.set()
+            heartbeat.join()
+        index = self.queue.write_index()
+        logger.info(
+            "Worker %s finished %d project(s); queue: %d done, %d failed, %d pending",
+            self.worker_id,
+            self.completed,
+            index["done"],
+            index["failed"],
+            index["pending"] + index["running"],
+        )
+        return index
+
+    def stop(self) -> None:
+        """Stop claiming projects; running ones are finished first."""
+        self._stop.set()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            lease = self.queue.claim(self.worker_id)
+            if lease is None:
+                if not self.wait or self.queue.drained():
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+            self._run_one(lease)
+
+    def _run_one(self, lease: Lease) -> None:
+        with self._lock:
+            self._held[lease.name] = lease
+        logger.info(
+            "Worker %s claimed %s (attempt %d)",
+            self.worker_id,
+            lease.name,
+            lease.attempt,
+        )
+        started = time.perf_counter()
+        try:
+            out = self.runner_factory(
+                lease.path, str(self.queue.output_path(lease.name))
+            ).run()
+            outcome: Dict[str, Any] = {
+                "status": "done",
+                "policies": len(out.get("policy", [])),
+            }
+        except Exception as exc:
+            logger.exception("Project %s failed", lease.name)
+            outcome = {"status": "failed", "error": str(exc)}
+        outcome["seconds"] = round(time.perf_counter() - started, 3)
+        with self._lock:
+            del self._held[lease.name]
+            lost = lease.name in self._lost
+            self._lost.discard(lease.name)
+        if lost or not self.queue.renew(lease):
+            logger.warning(
+                "Worker %s lost the lease of %s, discarding its result",
+                self.worker_id,
+                lease.name,
+            )
+            return
+        self.queue.record(lease, outcome)
+        self.queue.release(lease)
+        if outcome["status"] == "done":
+            self.completed += 1
+
+    def _heartbeat(self) -> None:
+        while not self._finished.wait(self.heartbeat_interval):
+            with self._lock:
+                held = list(self._held.values())
+            for lease in held:
+                try:
+                    renewed = self.queue.renew(lease)
+                except OSError as exc:
+                    logger.warning("Heartbeat for %s failed: %s", lease.name, exc)
+                    continue
+                if not renewed:
+                    with self._lock:
+                        self._lost.add(lease.name)
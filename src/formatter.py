@@ -1,6 +1,38 @@
 import json
+import logging
 import re
-from typing import Any, Dict, List
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("policy_agent.formatter")
+
+
+def _event_key(ev: Any) -> Any:
+    """Return a hashable identity for an event value (events should be strings)."""
+    try:
+        hash(ev)
+        return ev
+    except TypeError:
+        return json.dumps(ev, sort_keys=True, default=str)
+
+
+def _is_policy_entry(entry: Any) -> bool:
+    """Return True if `entry` has the shape `_merge_policies` relies on.
+
+    The entry must be an object whose `sourceFunction` and `destinationFunction`,
+    when present, are objects with a string `name` and a list of `events`.
+    """
+    if not isinstance(entry, dict):
+        return False
+    for key in ("sourceFunction", "destinationFunction"):
+        fn = entry.get(key, {})
+        if not isinstance(fn, dict):
+            return False
+        if not isinstance(fn.get("name", ""), (str, type(None))):
+            return False
+        if not isinstance(fn.get("events", []), (list, type(None))):
+            return False
+    return True
 
 
 def _merge_policies(policies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -9,7 +41,8 @@ def _merge_policies(policies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     The canonicalization merges entries keyed by (sourceFunction.name,
     destinationFunction.name). For duplicates the `events` list on the
     `sourceFunction` is extended with any new events (duplicates removed while
-    preserving order).
+    preserving order). Membership is tracked in a set per key, so merging is
+    linear in the total number of events.
 
     Args:
         policies: A list of policy mapping dictionaries. Each entry is expected to
@@ -21,6 +54,7 @@ def _merge_policies(policies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         A deduplicated list of policy mapping dicts with merged `events` arrays.
     """
     merged: Dict[tuple, Dict[str, Any]] = {}
+    seen: Dict[tuple, set] = {}
     for entry in policies:
         try:
             src = entry.get("sourceFunction", {})
@@ -30,71 +64,251 @@ def _merge_policies(policies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             key = (None, None)
 
         if key in merged:
-            existing_events = merged[key]["sourceFunction"].get("events", [])
+            existing_events = merged[key]["sourceFunction"]["events"]
+            known = seen[key]
             new_events = entry.get("sourceFunction", {}).get("events", []) or []
-            for ev in new_events:
-                if ev not in existing_events:
-                    existing_events.append(ev)
-            merged[key]["sourceFunction"]["events"] = existing_events
         else:
-            src_events = entry.get("sourceFunction", {}).get("events") or []
+            new_events = entry.get("sourceFunction", {}).get("events") or []
             entry.setdefault("sourceFunction", {})
-            entry["sourceFunction"]["events"] = list(dict.fromkeys(src_events))
+            existing_events = entry["sourceFunction"]["events"] = []
+            known = seen[key] = set()
             merged[key] = entry
+        for ev in new_events:
+            k = _event_key(ev)
+            if k not in known:
+                known.add(k)
+                existing_events.append(ev)
 
     # After merging, filter out entries where the sourceFunction has no events.
-    result = list(merged.values())
-    filtered = []
-    for entry in result:
-        src_events = entry.get("sourceFunction", {}).get("events") or []
-        # Keep only entries that have at least one non-empty event name
-        if any(ev for ev in src_events):
-            filtered.append(entry)
+    # Keep only entries that have at least one non-empty event name
+    return [
+        entry
+        for entry in merged.values()
+        if any(ev for ev in entry["sourceFunction"]["events"])
+    ]
+
+
+# Tokens relevant to brace matching: whole string literals (so braces inside
+# them are ignored) and braces. The string pattern is the unrolled-loop form,
+# which matches in linear time without backtracking.
+_STRUCTURE_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}]')
+
+
+def _scan_object(s: str, start: int) -> int:
+    """Return the index just past the object whose `{` is at `s[start]`.
+
+    The scan is a single left-to-right pass over string literals and braces.
+
+    Returns:
+        The end index of the balanced object, or -1 if it is never closed.
+    """
+    depth = 0
+    for m in _STRUCTURE_RE.finditer(s, start):
+        tok = m.group()
+        if tok == "{":
+            depth += 1
+        elif tok == "}":
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    return -1
+
+
+def _candidate_starts(s: str) -> List[int]:
+    """Return where the JSON payload may start, most likely first.
+
+    Candidates are the first `{` inside a ```json fence, the first `{` inside any
+    fence and the first `{` in the text, without duplicates.
+    """
+    starts: List[int] = []
+    fence = s.lower().find("```json")
+    if fence >= 0:
+        starts.append(s.find("{", fence))
+    fence = s.find("```")
+    if fence >= 0:
+        starts.append(s.find("{", fence))
+    starts.append(s.find("{"))
+    return [i for i in dict.fromkeys(starts) if i >= 0]
 
-    return filtered
 
+def _extract_json_text(s: str) -> str:
+    """Locate the JSON payload in a model response.
+
+    Each of `_candidate_starts` is delimited with `_scan_object`; if none is
+    balanced, the span from the first `{` to the last `}` is returned. Every
+    step is linear in `len(s)`.
+    """
+    for start in _candidate_starts(s):
+        end = _scan_object(s, start)
+        if end > 0:
+            return s[start:end]
+
+    first, last = s.find("{"), s.rfind("}")
+    if 0 <= first < last:
+        return s[first : last + 1]
+    return s
+
+
+def _load_json_payload(s: str) -> Any:
+    """Parse the JSON payload of a model response, or return None.
+
+    The fast path decodes directly at each candidate start with
+    `JSONDecoder.raw_decode`, which stops at the end of the object and ignores
+    any trailing text. If that fails, the payload located by
+    `_extract_json_text` is parsed instead.
+    """
+    decoder = json.JSONDecoder()
+    for start in _candidate_starts(s):
+        try:
+            return decoder.raw_decode(s, start)[0]
+        except ValueError:
+            continue
+    try:
+        return json.loads(_extract_json_text(s))
+    except ValueError:
+        return None
+
+
+# Malformations repaired inside a policy entry: trailing commas and `//`
+# comments (string literals are matched first and kept as they are).
+_REPAIR_RE = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")|//[^\n]*|,(?=\s*[}\]])')
+
+
+def _load_entry(text: str) -> tuple:
+    """Parse one policy entry, repairing trailing commas and comments if needed.
+
+    Returns:
+        The entry (or None if it cannot be recovered) and whether it was repaired.
+    """
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+    try:
+        return json.loads(_REPAIR_RE.sub(lambda m: m.group(1) or "", text)), True
+    except ValueError:
+        return None, False
 
-def format_policy_json(raw_text: str) -> Dict[str, Any]:
+
+@dataclass
+class PolicyRepair:
+    """Outcome of `repair_policy_json`.
+
+    Attributes:
+        entries: Every complete policy entry recovered, in order and unmerged.
+        found: True if a `policy` array was located at all.
+        complete: True if the array was closed, i.e. the output was not cut off.
+        cut_offset: Offset in the text just past the last complete entry (the
+            opening of the array if there is none); the text length if complete.
+        cut_line: 1-based line of `cut_offset`.
+        repaired: Entries parsed only after repairing trailing commas or comments.
+        dropped: Array elements that could not be recovered.
+    """
+
+    entries: List[Dict[str, Any]] = field(default_factory=list)
+    found: bool = False
+    complete: bool = False
+    cut_offset: int = 0
+    cut_line: int = 1
+    repaired: int = 0
+    dropped: int = 0
+
+    @property
+    def truncated(self) -> bool:
+        """True if a policy array was started but never closed."""
+        return self.found and not self.complete
+
+    def describe(self) -> str:
+        """Return a one-line summary for logs."""
+        if not self.found:
+            return "no policy array found"
+        state = (
+            "complete"
+            if self.complete
+            else f"cut off at offset {self.cut_offset} (line {self.cut_line})"
+        )
+        return (
+            f"{len(self.entries)} complete entries, {state}, "
+            f"{self.repaired} repaired, {self.dropped} dropped"
+        )
+
+
+def repair_policy_json(raw_text: str) -> PolicyRepair:
+    """Recover the policy entries of a truncated or slightly malformed response.
+
+    Well-formed payloads take the `_load_json_payload` fast path. Otherwise the
+    text goes through `PolicyStreamParser`, which returns each array element as
+    soon as its braces balance, repairing trailing commas and comments inside
+    elements. Elements after the cut (or still malformed) are not invented: the
+    result reports how many entries are complete and where the output stopped.
+    Answers in the compact row format (see `CompactStreamParser`) are expanded
+    into canonical entries the same way. Elements that parse but do not have
+    the entry shape (see `_is_policy_entry`) are counted in `dropped`.
+    """
+    parsed = _load_json_payload(raw_text)
+    if isinstance(parsed, dict) and isinstance(parsed.get("policy"), list):
+        entries = [e for e in parsed["policy"] if _is_policy_entry(e)]
+        return PolicyRepair(
+            entries=entries,
+            found=True,
+            complete=True,
+            cut_offset=len(raw_text),
+            cut_line=raw_text.count("\n") + 1,
+            dropped=len(parsed["policy"]) - len(entries),
+        )
+    if _COMPACT_START_RE.search(raw_text):
+        parser: Any = CompactStreamParser()
+    else:
+        parser = PolicyStreamParser()
+    parsed_entries = parser.feed(raw_text)
+    entries = [e for e in parsed_entries if _is_policy_entry(e)]
+    cut = len(raw_text) if parser.done else parser.end
+    return PolicyRepair(
+        entries=entries,
+        found=parser.started,
+        complete=parser.done,
+        cut_offset=cut,
+        cut_line=raw_text.count("\n", 0, cut) + 1,
+        repaired=parser.repaired,
+        dropped=parser.dropped + len(parsed_entries) - len(entries),
+    )
+
+
+def format_policy_json(
+    raw_text: str, repair: Optional[PolicyRepair] = None
+) -> Dict[str, Any]:
     """Convert raw agent output to canonical policy JSON.
 
     This function attempts multiple strategies:
     1. Extract a JSON object from Markdown-style fenced code blocks (```json ... ```)
        or the first JSON-like substring, parse it and, if it contains a top-level
        `policy` key, normalize and return it.
-    2. If parsing fails, apply heuristic extraction by scanning for likely function
-       names and event identifiers in the text and synthesize a `policy` array.
+    2. If the payload is truncated or slightly malformed, recover every complete
+       entry of the `policy` array with `repair_policy_json`.
+    3. If there is no policy array at all, apply heuristic extraction by scanning
+       for likely function names and event identifiers in the text and
+       synthesize a `policy` array.
 
     The final result always follows the shape: {"policy": [ ... ]} where each
     element has `sourceFunction` and `destinationFunction` objects.
 
     Args:
         raw_text: The textual output from the LLM/agent.
+        repair: The `repair_policy_json` result of `raw_text`, if the caller
+            already has it.
 
     Returns:
         A dictionary with a single `policy` key whose value is a list of mapping
         objects. If no useful content can be extracted the returned list will be
         empty.
     """
-
-    def _extract_json_text(s: str) -> str:
-        m = re.search(r"```json\s*(\{[\s\S]*?\})\s*```", s, flags=re.IGNORECASE)
-        if m:
-            return m.group(1)
-        m = re.search(r"```[\s\S]*?(\{[\s\S]*?\})[\s\S]*?```", s)
-        if m:
-            return m.group(1)
-        m = re.search(r"(\{[\s\S]*\})", s)
-        if m:
-            return m.group(1)
-        return s
-
-    extracted = _extract_json_text(raw_text)
+    if repair is None:
+        repair = repair_policy_json(raw_text)
     try:
-        parsed = json.loads(extracted)
-        if isinstance(parsed, dict) and "policy" in parsed:
-            parsed_policy = parsed.get("policy", [])
-            merged = _merge_policies(parsed_policy)
-            return {"policy": merged}
+        if repair.found:
+            if repair.truncated or repair.repaired or repair.dropped:
+                logger.warning("Salvaged policy JSON: %s", repair.describe())
+            return {"policy": _merge_policies(repair.entries)}
     except Exception:
         pass
 
@@ -103,13 +317,13 @@ def format_policy_json(raw_text: str) -> Dict[str, Any]:
     event_pattern = re.compile(r"([A-Z][A-Za-z0-9_]*Event)")
     policies = []
     lines = raw_text.splitlines()
+    # scan every line for events once; each match then reuses the window
+    line_events = [event_pattern.findall(line) for line in lines]
     for i, line in enumerate(lines):
         fn_match = fn_pattern.search(line)
         if fn_match:
             fname = fn_match.group(1)
-            events = []
-            for j in range(i, min(i + 6, len(lines))):
-                events += event_pattern.findall(lines[j])
+            events = [ev for evs in line_events[i : i + 6] for ev in evs]
             policies.append(
                 {
                     "sourceFunction": {"name": fname, "events": events},
@@ -119,3 +333,227 @@ def format_policy_json(raw_text: str) -> Dict[str, Any]:
 
     merged = _merge_policies(policies)
     return {"policy": merged}
+
+
+class PolicyStreamParser:
+    """Incrementally extract complete entries of the `policy` array from a text stream.
+
+    Text is fed in arbitrary pieces (e.g. streaming deltas). The parser locates
+    the `"policy": [` opening and then tracks object depth, string literals and
+    escapes, so every array element is parsed and returned as soon as its closing
+    brace arrives, long before the full response is available. Only the text of
+    the element currently being read is buffered, so each character is scanned
+    once regardless of how the stream is split.
+
+    Elements with trailing commas or `//` comments are repaired; elements that
+    still do not parse are counted in `dropped` and skipped.
+
+    Attributes:
+        done: True once the closing `]` of the policy array has been seen.
+        started: True once the `"policy": [` opening has been seen.
+        end: Offset in the fed text just past the last complete element (or
+            the array opening), i.e. where a truncated stream stopped making sense.
+        count: Number of complete elements returned so far.
+        repaired: Elements that parsed only after repair.
+        dropped: Elements that could not be parsed.
+    """
+
+    _START_RE = re.compile(r'"policy"\s*:\s*\[')
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._buf = ""
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._elem_start = -1
+        self._fed = 0
+        self.done = False
+        self.started = False
+        self.end = 0
+        self.count = 0
+        self.repaired = 0
+        self.dropped = 0
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume `chunk` and return the policy entries completed by it."""
+        if not chunk:
+            return []
+        self._parts.append(chunk)
+        if self.done:
+            return []
+        buf = self._buf + chunk
+        pos = len(self._buf)
+        # offset of buf[0] in the whole fed text
+        base = self._fed - pos
+        self._fed += len(chunk)
+        if not self._in_array:
+            m = self._START_RE.search(buf)
+            if not m:
+                # keep a short tail in case the opening is split across chunks
+                self._buf = buf[-32:]
+                return []
+            self._in_array = self.started = True
+            pos = m.end()
+            self.end = base + pos
+
+        entries: List[Dict[str, Any]] = []
+        for i in range(pos, len(buf)):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._elem_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0 and ch == "]":
+                    self.done = True
+                    self._buf = ""
+                    return entries
+                self._depth -= 1
+                if self._depth == 0 and self._elem_start >= 0:
+                    entry, repaired = _load_entry(buf[self._elem_start : i + 1])
+                    if isinstance(entry, dict):
+                        entries.append(entry)
+                        self.count += 1
+                        self.repaired += repaired
+                        self.end = base + i + 1
+                    else:
+                        self.dropped += 1
+                    self._elem_start = -1
+
+        if self._elem_start >= 0:
+            self._buf = buf[self._elem_start :]
+            self._elem_start = 0
+        else:
+            self._buf = ""
+        return entries
+
+
+# Start of an answer in the compact row format
+_COMPACT_START_RE = re.compile(r"^\s*(?:```policy\b|@events\b)", re.MULTILINE)
+_COMPACT_SPLIT_RE = re.compile(r"[\s,]+")
+
+
+class CompactStreamParser:
+    """Incrementally expand answers in the compact row format.
+
+    The compact contract (`prompts/agent_prompt_compact.md`) trades the JSON
+    objects for one whitespace-separated row per entry inside a ```policy
+    fence, with event names interned once:
+
+        ```policy
+        @events	Deposited	MessageSent
+        deposit	=	$1 $2
+        relayMessage	handleMessage	$2 Paused
+        ```
+
+    An `@events` line appends names to the intern table; `$n` in a row refers
+    to its n-th name (1-based), and any other event token is a literal name.
+    A destination of `=` is the source function itself. Lines starting with `#`
+    are ignored. The closing fence (or an `@end` line) completes the answer.
+    Rows are expanded into canonical entries as soon as their line is complete,
+    with the same attributes as `PolicyStreamParser`; rows with fewer than two
+    columns or an unknown `$n` are counted in `dropped`.
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._buf = ""
+        self._fed = 0
+        self._events: List[str] = []
+        self.done = False
+        self.started = False
+        self.end = 0
+        self.count = 0
+        self.repaired = 0
+        self.dropped = 0
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume `chunk` and return the policy entries completed by it."""
+        if not chunk:
+            return []
+        self._parts.append(chunk)
+        if self.done:
+            return []
+        buf = self._buf + chunk
+        base = self._fed - len(self._buf)
+        self._fed += len(chunk)
+        entries: List[Dict[str, Any]] = []
+        start = 0
+        while not self.done:
+            newline = buf.find("\n", start)
+            if newline < 0:
+                break
+            entry = self._line(buf[start:newline].strip(), base + newline + 1)
+            if entry is not None:
+                entries.append(entry)
+            start = newline + 1
+        self._buf = "" if self.done else buf[start:]
+        # a closing fence needs no trailing newline
+        if self._buf.strip() == "```" and self.started:
+            self._line("```", self._fed)
+            self._buf = ""
+        return entries
+
+    def _line(self, line: str, end: int) -> Optional[Dict[str, Any]]:
+        """Process one complete line ending at offset `end`."""
+        if not self.started:
+            if line.lower().startswith("```policy"):
+                self.started, self.end = True, end
+                return None
+            if not line.startswith("@events"):
+                return None
+            self.started = True
+        if line.startswith("```") or line == "@end":
+            self.done = True
+            return None
+        if not line or line.startswith("#"):
+            self.end = end
+            return None
+        if line.startswith("@events"):
+            self._events.extend(n for n in _COMPACT_SPLIT_RE.split(line[7:]) if n)
+            self.end = end
+            return None
+        fields = [f for f in _COMPACT_SPLIT_RE.split(line) if f]
+        if len(fields) < 2:
+            self.dropped += 1
+            return None
+        source, destination, *tokens = fields
+        events = []
+        for token in tokens:
+            if token.startswith("$") and token[1:].isdigit():
+                n = int(token[1:])
+                if not 1 <= n <= len(self._events):
+                    self.dropped += 1
+                    return None
+                token = self._events[n - 1]
+            events.append(token)
+        self.end = end
+        self.count += 1
+        return {
+            "sourceFunction": {"name": source, "events": events},
+            "destinationFunction": {
+                "name": source if destination == "=" else destination
+            },
+        }
@@ -0,0 +1,229 @@
+"""Hedged requests across several LLM providers to cut tail latency.
+
+A `Hedger` runs the same analysis against an ordered list of clients. The
+first (primary) client starts immediately; each further client starts when
+no acceptable answer has arrived within `budget` seconds of the previous
+start, or right away when every running attempt has failed. The first answer
+accepted by the caller (e.g. one that `format_policy_json` turns into a
+non-empty policy) wins, and every other attempt is cancelled: its cancel event
+is set, which the attempt checks between streamed chunks to stop reading and
+close the provider stream.
+
+Clients are told apart by `client_identity` (class and model), so two hedges
+on one provider with different models are raced and counted separately.
+Per-client attempts, wins, failures, cancellations and latencies are kept in
+`HedgeStats` and logged so budgets can be tuned.
+"""
+import contextvars
+import logging
+import queue
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .cache import client_identity
+
+logger = logging.getLogger("policy_agent.hedging")
+
+
+class HedgeCancelled(Exception):
+    """Raised inside an attempt that lost the race."""
+
+
+@dataclass
+class ProviderStats:
+    """Outcome counters and latencies of one hedged client's attempts."""
+
+    attempts: int = 0
+    wins: int = 0
+    failures: int = 0
+    rejected: int = 0
+    cancelled: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the counters with p50/p95 latency of completed attempts."""
+        lat = sorted(self.latencies)
+        return {
+            "attempts": self.attempts,
+            "wins": self.wins,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "p50": statistics.median(lat) if lat else None,
+            "p95": lat[min(len(lat) - 1, int(0.95 * len(lat)))] if lat else None,
+        }
+
+
+class HedgeStats:
+    """Thread-safe per-client statistics shared by all hedged requests."""
+
+    def __init__(self):
+        self.providers: Dict[str, ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, outcome: str, latency: Optional[float] = None):
+        """Count an `outcome` (attempts, wins, failures, rejected, cancelled)."""
+        with self._lock:
+            stats = self.providers.setdefault(name, ProviderStats())
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+            if latency is not None:
+                stats.latencies.append(latency)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Return `ProviderStats.summary` for every client key."""
+        with self._lock:
+            return {name: s.summary() for name, s in self.providers.items()}
+
+    def log(self) -> None:
+        """Log one line per client."""
+        for name, s in self.summary().items():
+            logger.info(
+                "Hedge %s: %d attempts, %d wins, %d failed, %d rejected, %d cancelled, p50 %s p95 %s",
+                name,
+                s["attempts"],
+                s["wins"],
+                s["failures"],
+                s["rejected"],
+                s["cancelled"],
+                "-" if s["p50"] is None else f"{s['p50']:.2f}s",
+                "-" if s["p95"] is None else f"{s['p95']:.2f}s",
+            )
+
+
+class Hedger:
+    """Race an analysis across providers, starting backups after a latency budget.
+
+    Attributes:
+        clients: Ordered (name, client) pairs; the first one is the primary.
+        keys: `client_identity` of each client, in the same order; statistics
+            and results are keyed by it.
+        budget: Seconds to wait for an acceptable answer before starting the
+            next client.
+        stats: Statistics shared by every request made through this hedger.
+    """
+
+    def __init__(
+        self,
+        clients: Sequence[Tuple[str, Any]],
+        budget: float = 30.0,
+        stats: Optional[HedgeStats] = None,
+    ):
+        if not clients:
+            raise ValueError("Hedger needs at least one client")
+        self.clients = list(clients)
+        self.keys = [client_identity(client) for _, client in self.clients]
+        duplicates = sorted({k for k in self.keys if self.keys.count(k) > 1})
+        if duplicates:
+            raise ValueError(
+                f"Hedged clients must differ in provider or model: {', '.join(duplicates)}"
+            )
+        self.budget = budget
+        self.stats = stats or HedgeStats()
+
+    @property
+    def names(self) -> List[str]:
+        """Provider names in launch order."""
+        return [name for name, _ in self.clients]
+
+    def client(self, key: str) -> Any:
+        """Return the client whose `client_identity` is `key`."""
+        return self.clients[self.keys.index(key)][1]
+
+    def run(
+        self,
+        attempt: Callable[[Any, threading.Event], Any],
+        process: Callable[[Any], Any] = lambda answer: answer,
+        acceptable: Callable[[Any], bool] = bool,
+    ) -> Tuple[Any, str]:
+        """Run `attempt` against the clients and return the first accepted result.
+
+        Args:
+            attempt: Called on a worker thread with a client and a cancel event;
+                returns the raw answer. It should raise `HedgeCancelled` (or
+                return early) once the event is set.
+            process: Turns a raw answer into a result.
+            acceptable: Decides whether a result wins the race; rejected results
+                keep the race going.
+
+        Returns:
+            The winning result and the key of its client (see `client`). If no
+            result is acceptable, the one from the earliest client in launch
+            order is returned.
+
+        Raises:
+            The primary's exception if every attempt failed.
+        """
+        results: "queue.Queue[Tuple[int, bool, Any, float]]" = queue.Queue()
+        cancels: List[threading.Event] = []
+        started: List[float] = []
+
+        def launch() -> None:
+            i = len(cancels)
+            name, client = self.keys[i], self.clients[i][1]
+            cancel = threading.Event()
+            cancels.append(cancel)
+            started.append(time.perf_counter())
+            self.stats.record(name, "attempts")
+            ctx = contextvars.copy_context()
+
+            def work() -> None:
+                try:
+                    value = ctx.run(attempt, client, cancel)
+                    results.put((i, True, value, time.perf_counter() - started[i]))
+                except Exception as exc:
+                    results.put((i, False, exc, time.perf_counter() - started[i]))
+
+            threading.Thread(target=work, name=f"hedge-{name}", daemon=True).start()
+            if i:
+                logger.info("Hedging: started %s", name)
+
+        launch()
+        pending = 1
+        finished = set()
+        fallbacks: Dict[int, Any] = {}
+        errors: Dict[int, BaseException] = {}
+        while pending:
+            can_launch = len(cancels) < len(self.clients)
+            timeout = None
+            if can_launch:
+                timeout = max(0.0, started[-1] + self.budget - time.perf_counter())
+            try:
+                i, ok, value, latency = results.get(timeout=timeout)
+            except queue.Empty:
+                launch()
+                pending += 1
+                continue
+            pending -= 1
+            finished.add(i)
+            name = self.keys[i]
+            if not ok:
+                self.stats.record(name, "failures")
+                errors[i] = value
+                logger.warning("Hedged attempt %s failed: %s", name, value)
+            else:
+                result = process(value)
+                if acceptable(result):
+                    self.stats.record(name, "wins", latency)
+                    self._cancel_running(cancels, finished)
+                    return result, name
+                self.stats.record(name, "rejected", latency)
+                fallbacks[i] = result
+            if pending == 0 and len(cancels) < len(self.clients):
+                # every running attempt finished without an answer: fall back now
+                launch()
+                pending += 1
+
+        if fallbacks:
+            i = min(fallbacks)
+            return fallbacks[i], self.keys[i]
+        raise errors[min(errors)]
+
+    def _cancel_running(self, cancels: List[threading.Event], finished: set) -> None:
+        for j, cancel in enumerate(cancels):
+            if j not in finished:
+                cancel.set()
+                self.stats.record(self.keys[j], "cancelled")
+                logger.info("Hedging: cancelled %s", self.keys[j])
@@ -0,0 +1,222 @@
+"""Incremental re-analysis driven by per-file fingerprints and the import graph.
+
+After each run a manifest is written next to the output file. It records a
+content hash per source file, the files each one imports and the policy
+entries each file contributed. On the next run only files whose hash changed,
+plus every file that imports them or imported a deleted file (transitively),
+are re-analyzed; entries contributed by untouched files
+are carried over from the manifest and merged with the fresh results.
+
+`watch` re-runs this on file changes, polling the target folder and
+debouncing bursts of edits into a single run.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from .indexer import SolidityIndex
+from .ingest import walk_sol_files
+
+logger = logging.getLogger("policy_agent.incremental")
+
+MANIFEST_VERSION = 2
+
+
+def hash_sources(sources: Dict[str, str]) -> Dict[str, str]:
+    """Return the SHA-256 hex digest of every source file's contents."""
+    return {
+        rel: hashlib.sha256(content.encode("utf-8")).hexdigest()
+        for rel, content in sources.items()
+    }
+
+
+def manifest_path(output_file: str) -> Path:
+    """Return the manifest location used for `output_file`."""
+    p = Path(output_file)
+    return p.with_name(p.name + ".manifest.json")
+
+
+def load_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    """Load a run manifest, returning None if it is missing or unusable."""
+    try:
+        data = json.loads(path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if data.get("version") != MANIFEST_VERSION:
+        return None
+    return data
+
+
+def save_manifest(
+    path: Path,
+    config: str,
+    hashes: Dict[str, str],
+    contributions: Dict[str, List[Dict[str, Any]]],
+    graph: Dict[str, List[str]],
+) -> None:
+    """Atomically write a run manifest, with the resolved imports of each file."""
+    data = {
+        "version": MANIFEST_VERSION,
+        "config": config,
+        "files": hashes,
+        "imports": graph,
+        "contributions": contributions,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, indent=2))
+    os.replace(tmp, path)
+
+
+def dependents(graph: Dict[str, List[str]], changed: Iterable[str]) -> Set[str]:
+    """Return `changed` plus every file that imports one of them, transitively.
+
+    Args:
+        graph: Import graph mapping each file to the files it imports.
+        changed: Files whose contents changed.
+    """
+    reverse: Dict[str, Set[str]] = {}
+    for src, deps in graph.items():
+        for dst in deps:
+            reverse.setdefault(dst, set()).add(src)
+    affected = set(changed)
+    stack = list(affected)
+    while stack:
+        node = stack.pop()
+        for importer in reverse.get(node, ()):
+            if importer not in affected:
+                affected.add(importer)
+                stack.append(importer)
+    return affected
+
+
+def dependencies(graph: Dict[str, List[str]], roots: Iterable[str]) -> Set[str]:
+    """Return `roots` plus every file they import, transitively."""
+    seen = set(roots)
+    stack = list(seen)
+    while stack:
+        for dep in graph.get(stack.pop(), ()):
+            if dep not in seen:
+                seen.add(dep)
+                stack.append(dep)
+    return seen
+
+
+def attribute_entries(
+    policy: List[Dict[str, Any]], index: SolidityIndex, paths: Iterable[str]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Assign policy entries to the files among `paths` that produced them.
+
+    An entry belongs to the file(s) declaring a function named like its
+    `sourceFunction` (or, failing that, its `destinationFunction`). Entries that
+    match no declaration are assigned to every file in `paths`, so they are
+    dropped and re-derived whenever any of those files is re-analyzed.
+    """
+    paths = list(paths)
+    declared: Dict[str, List[str]] = {}
+    for path in paths:
+        fi = index.files.get(path)
+        if fi is None:
+            continue
+        for c in fi.contracts:
+            for fn in c.functions:
+                declared.setdefault(fn.name, [])
+                if path not in declared[fn.name]:
+                    declared[fn.name].append(path)
+
+    out: Dict[str, List[Dict[str, Any]]] = {p: [] for p in paths}
+    for entry in policy:
+        src = (entry.get("sourceFunction") or {}).get("name")
+        dst = (entry.get("destinationFunction") or {}).get("name")
+        owners = declared.get(src) or declared.get(dst) or paths
+        for owner in owners:
+            out[owner].append(copy.deepcopy(entry))
+    return out
+
+
+def plan_update(
+    previous: Optional[Dict[str, Any]], hashes: Dict[str, str], graph, config: str
+) -> Optional[Set[str]]:
+    """Decide which files need analysis given the previous manifest.
+
+    Returns:
+        The set of files to re-analyze, or None when a full run is required
+        (no usable manifest or a changed prompt/client configuration).
+    """
+    if previous is None or previous.get("config") != config:
+        return None
+    old = previous.get("files", {})
+    changed = {p for p, h in hashes.items() if old.get(p) != h}
+    removed = set(old) - set(hashes)
+    # files that imported a removed file must be re-analyzed as well; the
+    # current graph has no edge to a deleted file, so use the previous one
+    if removed:
+        importers = dependents(previous.get("imports", {}), removed) - removed
+        changed.update(p for p in importers if p in hashes)
+    return dependents(graph, changed)
+
+
+def _snapshot(folder: str, list_files: Callable[[str], List[str]]) -> Dict[str, tuple]:
+    """Return (mtime_ns, size) for every listed file, used to detect changes."""
+    snap = {}
+    for rel in list_files(folder):
+        try:
+            st = os.stat(os.path.join(folder, rel))
+        except FileNotFoundError:
+            continue
+        snap[rel] = (st.st_mtime_ns, st.st_size)
+    return snap
+
+
+def watch(
+    runner,
+    interval: float = 1.0,
+    debounce: float = 2.0,
+    max_runs: Optional[int] = None,
+    list_files: Optional[Callable[[str], List[str]]] = None,
+) -> None:
+    """Re-run `runner` incrementally whenever its sources change.
+
+    The target folder is polled every `interval` seconds. Once a change is seen,
+    the run starts only after the folder has been quiet for `debounce` seconds,
+    so a burst of saves (or a `git checkout`) triggers a single analysis.
+
+    Args:
+        runner: An `AgentRunner` with `incremental=True`.
+        interval: Polling period in seconds.
+        debounce: Quiet period required before re-running, in seconds.
+        max_runs: Stop after this many runs (None = run until interrupted).
+        list_files: Function listing source files (defaults to `walk_sol_files`
+            paths).
+    """
+    list_files = list_files or (lambda f: [rel for rel, _ in walk_sol_files(f)])
+    runs = 0
+    runner.run()
+    runs += 1
+    last = _snapshot(runner.target_path, list_files)
+    logger.info("Watching %s for changes", runner.target_path)
+    while max_runs is None or runs < max_runs:
+        time.sleep(interval)
+        current = _snapshot(runner.target_path, list_files)
+        if current == last:
+            continue
+        # wait for the tree to settle
+        settled_at = time.monotonic()
+        while time.monotonic() - settled_at < debounce:
+            time.sleep(min(interval, debounce))
+            nxt = _snapshot(runner.target_path, list_files)
+            if nxt != current:
+                current = nxt
+                settled_at = time.monotonic()
+        logger.info("Change detected in %s, re-analyzing", runner.target_path)
+        try:
+            runner.run()
+        except Exception:
+            logger.exception("Incremental run failed; waiting for the next change")
+        runs += 1
+        last = current
@@ -0,0 +1,686 @@
+"""Lightweight Solidity lexer and indexer.
+
+This module does not try to be a full Solidity parser. It tokenizes source
+files (dropping comments and keeping string literals intact) and walks the
+token stream with a brace-depth tracker to extract the structural facts the
+agent actually needs:
+
+- `import` paths,
+- contracts, interfaces and libraries with their base contracts,
+- functions (including constructor/fallback/receive/modifier bodies) with their
+  visibility, `emit` sites, external-call sites and plain call sites,
+- `event` declarations.
+
+The resulting `SolidityIndex` is used to prune the prompt down to the
+functions and events that can plausibly take part in a cross-chain flow, while
+a compact manifest keeps the model aware of everything that was left out. In
+retrieval mode the prompt holds the manifest only (`render_manifest`), and the
+agent's tools look up function bodies, events and call sites in the index.
+"""
+import posixpath
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |(?P<lcomment>//[^\n]*)
+    |(?P<bcomment>/\*[\s\S]*?\*/)
+    |(?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    |(?P<ident>[A-Za-z_$][A-Za-z0-9_$]*)
+    |(?P<number>0[xX][0-9a-fA-F_]+|\d[\d_]*(?:\.\d+)?(?:[eE]-?\d+)?)
+    |(?P<punct>[\s\S])
+    """,
+    re.VERBOSE,
+)
+
+# Receivers that look like `x.f(` but are language builtins, not external calls.
+_BUILTIN_RECEIVERS = {
+    "this",
+    "super",
+    "abi",
+    "msg",
+    "block",
+    "tx",
+    "type",
+    "bytes",
+    "string",
+    "Math",
+    "SafeMath",
+}
+_LOW_LEVEL_CALLS = {"call", "delegatecall", "staticcall", "send", "transfer"}
+_VISIBILITY = {"external", "public", "internal", "private"}
+_FUNCTION_KEYWORDS = {"function", "constructor", "fallback", "receive", "modifier"}
+_CONTRACT_KEYWORDS = {"contract", "interface", "library"}
+_NON_CALL_IDENTS = {
+    "if",
+    "for",
+    "while",
+    "return",
+    "returns",
+    "require",
+    "assert",
+    "revert",
+    "emit",
+    "new",
+    "function",
+    "mapping",
+    "payable",
+    "address",
+    "keccak256",
+    "sha256",
+    "uint256",
+    "bytes32",
+}
+
+# Directory names of dependency code that cannot hold a project's bridge entry
+# point. They are compared with whole path segments, so `src/mylib/` or
+# `contracts/openzeppelin_fork/` stay project code.
+VENDORED_SEGMENTS = frozenset(
+    {
+        "node_modules",
+        "lib",
+        "@openzeppelin",
+        "openzeppelin",
+        "openzeppelin-contracts",
+        "openzeppelin-contracts-upgradeable",
+        "forge-std",
+    }
+)
+
+# Directory names whose contents rarely change: vendored code plus interface
+# and library folders. Their files are rendered first so that prompts share a
+# stable prefix.
+STABLE_SEGMENTS = VENDORED_SEGMENTS | {"interfaces", "interface", "libraries"}
+
+_FILE_LABEL_RE = re.compile(r"^FILE: (.+)$", re.M)
+
+
+def _dir_segments(path: str) -> List[str]:
+    """Return the directory names of a relative path (the file name excluded)."""
+    return path.replace("\\", "/").split("/")[:-1]
+
+
+def is_vendored_path(path: str) -> bool:
+    """Return True if a directory of `path` is one of `VENDORED_SEGMENTS`."""
+    return any(seg in VENDORED_SEGMENTS for seg in _dir_segments(path))
+
+
+def is_stable_path(path: str) -> bool:
+    """Return True if a directory of `path` is one of `STABLE_SEGMENTS`."""
+    return any(seg in STABLE_SEGMENTS for seg in _dir_segments(path))
+
+
+def stable_order(sources: Dict[str, str]) -> Dict[str, str]:
+    """Return `sources` with stable paths first, each group sorted by path."""
+    return {
+        rel: sources[rel]
+        for rel in sorted(sources, key=lambda p: (not is_stable_path(p), p))
+    }
+
+
+def split_stable_prefix(prompt: str) -> Tuple[str, str]:
+    """Split a rendered prompt before its first `FILE:` section of a volatile file.
+
+    Returns:
+        The stable prefix (the whole prompt if every file is stable) and the rest.
+    """
+    for m in _FILE_LABEL_RE.finditer(prompt):
+        if not is_stable_path(m.group(1)):
+            return prompt[: m.start()], prompt[m.start() :]
+    return prompt, ""
+
+
+# Function names that suggest cross-chain messaging, asset movement or proofs.
+CROSSCHAIN_NAME_RE = re.compile(
+    r"bridge|send|receive|relay|message|deposit|withdraw|lock|unlock|mint|burn|"
+    r"claim|verify|execute|proof|transfer|cross|chain|dispatch|handle|inbound|"
+    r"outbound|lz|ccip|wormhole|portal|genesis|header|sync|finalize",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class Token:
+    """A single lexical token with its character offset and 1-based line."""
+
+    kind: str
+    value: str
+    start: int
+    end: int
+    line: int
+
+
+@dataclass
+class EventInfo:
+    """An `event` declaration."""
+
+    name: str
+    line: int
+    text: str
+
+
+@dataclass
+class FunctionInfo:
+    """A function-like member (function, constructor, fallback, receive, modifier).
+
+    Attributes:
+        name: Function name (`constructor`, `fallback`, `receive` for the specials).
+        kind: The declaring keyword.
+        signature: Header text up to (not including) the body, whitespace-collapsed.
+        visibility: One of external/public/internal/private, or "" if unspecified.
+        start, end: Character offsets of the whole declaration in the source file.
+        line, end_line: 1-based line span of the declaration.
+        has_body: False for interface/abstract declarations ending in `;`.
+        emits: Event names emitted in the body, in order of first appearance.
+        external_calls: `receiver.member` call sites (including low-level calls).
+        calls: Names of plain (unqualified) functions called from the body.
+    """
+
+    name: str
+    kind: str
+    signature: str
+    visibility: str
+    start: int
+    end: int
+    line: int
+    end_line: int
+    has_body: bool
+    emits: List[str] = field(default_factory=list)
+    external_calls: List[str] = field(default_factory=list)
+    calls: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ContractInfo:
+    """A contract, interface or library and its members."""
+
+    name: str
+    kind: str
+    bases: List[str]
+    start: int
+    end: int
+    line: int
+    functions: List[FunctionInfo] = field(default_factory=list)
+    events: List[EventInfo] = field(default_factory=list)
+
+
+@dataclass
+class FileIndex:
+    """Everything extracted from one Solidity file."""
+
+    path: str
+    source: str
+    imports: List[str] = field(default_factory=list)
+    contracts: List[ContractInfo] = field(default_factory=list)
+
+    @property
+    def is_vendored(self) -> bool:
+        return is_vendored_path(self.path)
+
+
+def tokenize(source: str) -> List[Token]:
+    """Split Solidity source into tokens, dropping whitespace and comments."""
+    tokens: List[Token] = []
+    line = 1
+    for m in _TOKEN_RE.finditer(source):
+        kind = m.lastgroup
+        value = m.group()
+        if kind in ("ws", "lcomment", "bcomment"):
+            line += value.count("\n")
+            continue
+        tokens.append(Token(kind, value, m.start(), m.end(), line))
+        if kind == "string":
+            line += value.count("\n")
+    return tokens
+
+
+def minify_source(source: str) -> str:
+    """Strip comments, `pragma` directives and redundant whitespace from Solidity.
+
+    Every line of the result corresponds to the same line of `source` (lines
+    that held only comments, pragmas or whitespace become empty), so line
+    numbers reported against the minified text still point at the original.
+    String literals are kept intact. Only the tokens from `pragma` through its
+    `;` are dropped, so code sharing a line with a pragma is kept.
+    """
+    out: List[str] = []
+    in_pragma = False
+    for m in _TOKEN_RE.finditer(source):
+        kind = m.lastgroup
+        value = m.group()
+        if kind in ("ws", "lcomment", "bcomment"):
+            newlines = value.count("\n")
+            if newlines:
+                out.append("\n" * newlines)
+            elif kind != "lcomment" and out and not out[-1].endswith((" ", "\n")):
+                out.append(" ")
+        elif in_pragma or (kind == "ident" and value == "pragma"):
+            in_pragma = value != ";"
+        else:
+            out.append(value)
+    lines = [line.strip() for line in "".join(out).split("\n")]
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def _match(tokens: List[Token], i: int, open_: str, close: str) -> int:
+    """Return the index of the token closing the bracket opened at `tokens[i]`."""
+    depth = 0
+    for j in range(i, len(tokens)):
+        v = tokens[j].value
+        if v == open_:
+            depth += 1
+        elif v == close:
+            depth -= 1
+            if depth == 0:
+                return j
+    return len(tokens) - 1
+
+
+def _skip_statement(tokens: List[Token], i: int) -> int:
+    """Return the index just past the `;` or balanced `{...}` ending a member."""
+    n = len(tokens)
+    while i < n:
+        v = tokens[i].value
+        if v == ";":
+            return i + 1
+        if v == "{":
+            return _match(tokens, i, "{", "}") + 1
+        if v == "(":
+            i = _match(tokens, i, "(", ")")
+        i += 1
+    return n
+
+
+def _scan_body(tokens: List[Token], lo: int, hi: int, fn: FunctionInfo) -> None:
+    """Collect emit sites, external calls and plain calls in `tokens[lo:hi]`."""
+    emits: Dict[str, None] = {}
+    ext: Dict[str, None] = {}
+    calls: Dict[str, None] = {}
+    for k in range(lo, hi):
+        t = tokens[k]
+        if t.kind != "ident":
+            continue
+        nxt = tokens[k + 1].value if k + 1 < hi else ""
+        prev = tokens[k - 1].value if k > lo else ""
+        if t.value == "emit":
+            # `emit E(...)` or `emit I.E(...)`: the event is the last identifier
+            j = k + 1
+            name = None
+            while j < hi and tokens[j].value != "(":
+                if tokens[j].kind == "ident":
+                    name = tokens[j].value
+                j += 1
+            if name:
+                emits.setdefault(name)
+        elif prev == "." and nxt in ("(", "{"):
+            recv_tok = tokens[k - 2] if k - 2 >= lo else None
+            recv = recv_tok.value if recv_tok is not None else ""
+            if recv == ")":
+                # `IFoo(addr).bar(` — use the cast type as receiver
+                j = _rmatch(tokens, k - 2, lo)
+                recv = tokens[j - 1].value if j - 1 >= lo else recv
+            if t.value in _LOW_LEVEL_CALLS or recv not in _BUILTIN_RECEIVERS:
+                ext.setdefault(f"{recv}.{t.value}")
+        elif nxt == "(" and prev not in (".", "emit", "new", "function"):
+            if t.value not in _NON_CALL_IDENTS:
+                calls.setdefault(t.value)
+    fn.emits = list(emits)
+    fn.external_calls = list(ext)
+    fn.calls = list(calls)
+
+
+def _rmatch(tokens: List[Token], i: int, lo: int) -> int:
+    """Return the index of the `(` matching the `)` at `tokens[i]`."""
+    depth = 0
+    for j in range(i, lo - 1, -1):
+        v = tokens[j].value
+        if v == ")":
+            depth += 1
+        elif v == "(":
+            depth -= 1
+            if depth == 0:
+                return j
+    return lo
+
+
+def _parse_function(
+    source: str, tokens: List[Token], i: int
+) -> Tuple[FunctionInfo, int]:
+    """Parse a function-like member starting at `tokens[i]`.
+
+    Returns:
+        The parsed `FunctionInfo` and the index of the first token after it.
+    """
+    kw = tokens[i]
+    j = i + 1
+    if (
+        kw.value in ("function", "modifier")
+        and j < len(tokens)
+        and tokens[j].kind == "ident"
+    ):
+        name = tokens[j].value
+        j += 1
+    else:
+        name = kw.value
+    visibility = ""
+    n = len(tokens)
+    while j < n and tokens[j].value not in ("{", ";"):
+        if tokens[j].value == "(":
+            j = _match(tokens, j, "(", ")")
+        elif tokens[j].value in _VISIBILITY and not visibility:
+            visibility = tokens[j].value
+        j += 1
+    if j >= n:
+        j = n - 1
+    header = " ".join(source[kw.start : tokens[j].start].split())
+    fn = FunctionInfo(
+        name=name,
+        kind=kw.value,
+        signature=header,
+        visibility=visibility,
+        start=kw.start,
+        end=tokens[j].end,
+        line=kw.line,
+        end_line=tokens[j].line,
+        has_body=tokens[j].value == "{",
+    )
+    if fn.has_body:
+        close = _match(tokens, j, "{", "}")
+        _scan_body(tokens, j + 1, close, fn)
+        fn.end = tokens[close].end
+        fn.end_line = tokens[close].line
+        return fn, close + 1
+    return fn, j + 1
+
+
+def _parse_contract_body(
+    source: str, tokens: List[Token], lo: int, hi: int, contract: ContractInfo
+) -> None:
+    """Parse members between the braces of a contract at `tokens[lo:hi]`."""
+    i = lo
+    while i < hi:
+        t = tokens[i]
+        if t.value in _FUNCTION_KEYWORDS:
+            fn, i = _parse_function(source, tokens, i)
+            contract.functions.append(fn)
+        elif t.value == "event" and i + 1 < hi and tokens[i + 1].kind == "ident":
+            end = _skip_statement(tokens, i)
+            text = " ".join(source[t.start : tokens[end - 1].end].split())
+            contract.events.append(EventInfo(tokens[i + 1].value, t.line, text))
+            i = end
+        else:
+            i = _skip_statement(tokens, i)
+
+
+def parse_source(path: str, source: str) -> FileIndex:
+    """Index a single Solidity source file.
+
+    Args:
+        path: Path of the file (used as the index key and for vendored checks).
+        source: Full file contents.
+
+    Returns:
+        A `FileIndex` with the imports and contracts declared in the file.
+    """
+    tokens = tokenize(source)
+    fi = FileIndex(path=path, source=source)
+    i, n = 0, len(tokens)
+    while i < n:
+        t = tokens[i]
+        if t.value == "import":
+            j = i
+            while j < n and tokens[j].value != ";":
+                if tokens[j].kind == "string":
+                    fi.imports.append(tokens[j].value[1:-1])
+                j += 1
+            i = j + 1
+        elif (
+            t.value in _CONTRACT_KEYWORDS
+            and i + 1 < n
+            and tokens[i + 1].kind == "ident"
+        ):
+            kind = t.value
+            if i > 0 and tokens[i - 1].value == "abstract":
+                kind = "abstract"
+            name = tokens[i + 1].value
+            j = i + 2
+            bases: List[str] = []
+            while j < n and tokens[j].value != "{":
+                if tokens[j].value == "(":
+                    j = _match(tokens, j, "(", ")")
+                elif tokens[j].kind == "ident" and tokens[j].value != "is":
+                    if tokens[j - 1].value in ("is", ","):
+                        bases.append(tokens[j].value)
+                j += 1
+            close = _match(tokens, j, "{", "}") if j < n else n - 1
+            contract = ContractInfo(
+                name=name,
+                kind=kind,
+                bases=bases,
+                start=(tokens[i - 1] if kind == "abstract" else t).start,
+                end=tokens[close].end,
+                line=t.line,
+            )
+            _parse_contract_body(source, tokens, j + 1, close, contract)
+            fi.contracts.append(contract)
+            i = close + 1
+        else:
+            i += 1
+    return fi
+
+
+def resolve_import(importer: str, target: str, known: Iterable[str]) -> Optional[str]:
+    """Resolve an `import` path to one of the `known` relative file paths.
+
+    Relative imports (`./`, `../`) are resolved against the importing file's
+    directory. Remapped imports (e.g. `@openzeppelin/...`) are matched against
+    known paths ending with the import path on a segment boundary, preferring
+    an exact match and then the shortest path, falling back to a unique
+    file-name match.
+
+    Returns:
+        The matching known path, or None if the import cannot be resolved.
+    """
+    known = list(known)
+    target = target.replace("\\", "/")
+    if target.startswith("."):
+        base = posixpath.dirname(importer.replace("\\", "/"))
+        candidate = posixpath.normpath(posixpath.join(base, target))
+        if candidate in known:
+            return candidate
+    suffix = target.lstrip("./@")
+    matches = [k for k in known if ("/" + k.replace("\\", "/")).endswith("/" + suffix)]
+    if matches:
+        return min(matches, key=lambda k: (len(k), k))
+    name = posixpath.basename(target)
+    by_name = [k for k in known if posixpath.basename(k) == name]
+    return by_name[0] if len(by_name) == 1 else None
+
+
+class SolidityIndex:
+    """An index over a set of Solidity files.
+
+    Attributes:
+        files: Mapping of relative file path to its `FileIndex`, in insertion order.
+    """
+
+    def __init__(self, files: Optional[Dict[str, FileIndex]] = None):
+        self.files: Dict[str, FileIndex] = files or {}
+        self._libraries: Optional[set] = None
+
+    @classmethod
+    def from_sources(cls, sources: Dict[str, str]) -> "SolidityIndex":
+        """Build an index from a mapping of relative path to file contents."""
+        return cls({path: parse_source(path, src) for path, src in sources.items()})
+
+    def contracts(self) -> Iterable[Tuple[FileIndex, ContractInfo]]:
+        """Iterate over every (file, contract) pair in the index."""
+        for fi in self.files.values():
+            for c in fi.contracts:
+                yield fi, c
+
+    def import_graph(self) -> Dict[str, List[str]]:
+        """Return the resolved import graph of the indexed files.
+
+        Returns:
+            A mapping of each file path to the indexed files it imports directly.
+            Unresolvable imports (files outside the index) are dropped.
+        """
+        known = list(self.files)
+        graph: Dict[str, List[str]] = {}
+        for path, fi in self.files.items():
+            deps = (resolve_import(path, imp, known) for imp in fi.imports)
+            graph[path] = list(dict.fromkeys(d for d in deps if d and d != path))
+        return graph
+
+    def subset(self, paths: Iterable[str]) -> "SolidityIndex":
+        """Return a new index restricted to `paths`.
+
+        The subset keeps the library names of the full index so relevance
+        decisions do not change when a library lives outside the subset.
+        """
+        sub = SolidityIndex({p: self.files[p] for p in paths if p in self.files})
+        sub._libraries = self.library_names()
+        return sub
+
+    def library_names(self) -> set:
+        """Return the names of all libraries declared in the index."""
+        if self._libraries is None:
+            self._libraries = {
+                c.name for _, c in self.contracts() if c.kind == "library"
+            }
+        return self._libraries
+
+    def events_by_name(self) -> Dict[str, EventInfo]:
+        """Return the first declaration seen for every event name."""
+        events: Dict[str, EventInfo] = {}
+        for _, c in self.contracts():
+            for ev in c.events:
+                events.setdefault(ev.name, ev)
+        return events
+
+    def is_relevant(
+        self, fi: FileIndex, contract: ContractInfo, fn: FunctionInfo
+    ) -> bool:
+        """Decide whether a function may be a cross-chain entry/interaction point.
+
+        A function is relevant when it has a body in a project (non-vendored)
+        contract, is reachable from outside or emits an event, and either emits
+        an event, performs an external call to a non-library receiver, or has a
+        name suggesting messaging, asset movement or proof verification.
+        """
+        if not fn.has_body or fi.is_vendored:
+            return False
+        if contract.kind in ("interface", "library") or fn.kind == "modifier":
+            return False
+        if fn.visibility in ("internal", "private") and not fn.emits:
+            return False
+        libs = self.library_names()
+        external = [c for c in fn.external_calls if c.split(".", 1)[0] not in libs]
+        return bool(fn.emits or external or CROSSCHAIN_NAME_RE.search(fn.name))
+
+    def render_pruned(self) -> str:
+        """Render the relevant functions plus a manifest of everything else.
+
+        Returns:
+            Prompt text with one labeled section per file containing relevant
+            functions (with the emitted event declarations), followed by the
+            declarations of events emitted there but declared elsewhere and a
+            manifest listing the remaining contracts and function signatures.
+        """
+        parts: List[str] = []
+        manifest: List[str] = []
+        emitted: Dict[str, None] = {}
+        rendered_events: set = set()
+        for fi in self.files.values():
+            sections: List[str] = []
+            for c in fi.contracts:
+                keep = [f for f in c.functions if self.is_relevant(fi, c, f)]
+                skipped = [f for f in c.functions if f not in keep]
+                if keep:
+                    for f in keep:
+                        emitted.update(dict.fromkeys(f.emits))
+                    kind = "abstract contract" if c.kind == "abstract" else c.kind
+                    header = f"{kind} {c.name}"
+                    if c.bases:
+                        header += " is " + ", ".join(c.bases)
+                    body = [f"    {ev.text}" for ev in c.events]
+                    rendered_events.update(ev.name for ev in c.events)
+                    body += ["    " + fi.source[f.start : f.end] for f in keep]
+                    sections.append(header + " {\n" + "\n\n".join(body) + "\n}")
+                if skipped or not keep:
+                    sigs = ", ".join(f.signature for f in skipped) or "-"
+                    evs = ", ".join(ev.name for ev in c.events)
+                    line = f"{fi.path}: {c.kind} {c.name}: {sigs}"
+                    if evs and not keep:
+                        line += f"; events: {evs}"
+                    manifest.append(line)
+            if sections:
+                parts.append(f"FILE: {fi.path}\n" + "\n\n".join(sections) + "\n\n")
+
+        declared = self.events_by_name()
+        extra = [
+            declared[name].text
+            for name in emitted
+            if name in declared and name not in rendered_events
+        ]
+        if extra:
+            parts.append("EVENT DECLARATIONS:\n" + "\n".join(extra) + "\n\n")
+        if manifest:
+            parts.append(
+                "MANIFEST (code omitted as not cross-chain relevant):\n"
+                + "\n".join(manifest)
+                + "\n\n"
+            )
+        return "".join(parts)
+
+    def find_contracts(self, name: str) -> List[Tuple[FileIndex, ContractInfo]]:
+        """Return every (file, contract) pair declaring a contract called `name`."""
+        return [(fi, c) for fi, c in self.contracts() if c.name == name]
+
+    def contract_family(self, name: str) -> List[Tuple[FileIndex, ContractInfo]]:
+        """Return contract `name` followed by its base contracts, breadth first."""
+        family: List[Tuple[FileIndex, ContractInfo]] = []
+        pending, seen = [name], set()
+        while pending:
+            current = pending.pop(0)
+            if current in seen:
+                continue
+            seen.add(current)
+            for fi, c in self.find_contracts(current):
+                family.append((fi, c))
+                pending.extend(c.bases)
+        return family
+
+    def render_manifest(self) -> str:
+        """Render every contract with its events and function signatures, no bodies.
+
+        Project files list each function with its line; vendored files are
+        reduced to their contract names.
+
+        Returns:
+            Prompt text with one `FILE:` section per project file and a single
+            `VENDORED:` section.
+        """
+        parts: List[str] = []
+        vendored: List[str] = []
+        for fi in self.files.values():
+            if fi.is_vendored:
+                names = ", ".join(f"{c.kind} {c.name}" for c in fi.contracts)
+                vendored.append(f"{fi.path}: {names or '-'}")
+                continue
+            lines = [f"FILE: {fi.path}"]
+            for c in fi.contracts:
+                header = f"{c.kind} {c.name}"
+                if c.bases:
+                    header += " is " + ", ".join(c.bases)
+                lines.append(f"{header} (line {c.line})")
+                if c.events:
+                    lines.append("  events: " + ", ".join(ev.name for ev in c.events))
+                lines.extend(f"  L{f.line}: {f.signature}" for f in c.functions)
+            parts.append("\n".join(lines) + "\n\n")
+        if vendored:
+            parts.append("VENDORED:\n" + "\n".join(vendored) + "\n\n")
+        return "".join(parts)
@@ -0,0 +1,350 @@
+"""Memory-bounded discovery and ingestion of Solidity sources.
+
+The ingestion engine replaces a plain `rglob` + serial reads with:
+
+- a pruned `os.scandir` walker that never descends into ignored directories
+  (dependency folders and VCS metadata anywhere, foundry/hardhat build output
+  and `lib` at the root of a project layout),
+- parallel file reads on a small thread pool,
+- content-hash de-duplication of identical files (typically vendored copies),
+- per-file and total byte budgets so huge monorepos cannot build an unbounded
+  prompt,
+- a per-run in-memory `FileCache`, registered for the target folder so that the
+  prompt builder and the agent's `@tool` functions share one copy of each file.
+
+`IngestStats` reports what was read, skipped and de-duplicated, together with
+the process peak memory.
+"""
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .indexer import SolidityIndex
+
+logger = logging.getLogger("policy_agent.ingest")
+
+# Directories that never contain a project's own contracts, at any depth.
+DEFAULT_IGNORE_DIRS: FrozenSet[str] = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        "node_modules",
+        "typechain",
+        "typechain-types",
+        ".deps",
+        "__pycache__",
+    }
+)
+
+# Foundry/hardhat dependency and build folders. These names are common for a
+# project's own folders too (`contracts/lib/`), so they are only skipped at a
+# layout root: the target folder, or a folder holding a layout marker file.
+DEFAULT_LAYOUT_DIRS: FrozenSet[str] = frozenset(
+    {"lib", "out", "cache", "artifacts", "build", "broadcast", "coverage"}
+)
+LAYOUT_MARKERS: Tuple[str, ...] = (
+    "foundry.toml",
+    "hardhat.config.js",
+    "hardhat.config.ts",
+    "hardhat.config.cjs",
+    "hardhat.config.mjs",
+    "truffle-config.js",
+)
+
+
+def peak_memory_bytes() -> int:
+    """Return the peak resident set size of this process in bytes (0 if unknown)."""
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - not available on Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class IngestConfig:
+    """Ingestion settings.
+
+    Attributes:
+        ignore_dirs: Directory names skipped anywhere in the tree.
+        layout_dirs: Directory names skipped only at a layout root (the target
+            folder or a folder containing one of `LAYOUT_MARKERS`).
+        ignore_globs: Glob patterns matched against relative paths to skip.
+        max_file_bytes: Files larger than this are skipped (0 = unlimited).
+        max_total_bytes: Stop ingesting once this many bytes are held (0 = unlimited).
+        workers: Number of threads used for parallel reads.
+        dedupe: Drop files whose contents duplicate an earlier file.
+    """
+
+    ignore_dirs: FrozenSet[str] = DEFAULT_IGNORE_DIRS
+    layout_dirs: FrozenSet[str] = DEFAULT_LAYOUT_DIRS
+    ignore_globs: Tuple[str, ...] = ()
+    max_file_bytes: int = 2 * 1024 * 1024
+    max_total_bytes: int = 64 * 1024 * 1024
+    workers: int = 8
+    dedupe: bool = True
+
+    @classmethod
+    def from_env(cls) -> "IngestConfig":
+        """Build a config from `INGEST_*` environment variables.
+
+        `INGEST_IGNORE_DIRS` and `INGEST_LAYOUT_DIRS` replace the default
+        lists (comma separated, empty string to ignore nothing) and
+        `INGEST_IGNORE_GLOBS` adds globs.
+        """
+
+        def names(var: str, default: FrozenSet[str]) -> FrozenSet[str]:
+            value = os.getenv(var)
+            if value is None:
+                return default
+            return frozenset(d.strip() for d in value.split(",") if d.strip())
+
+        globs = os.getenv("INGEST_IGNORE_GLOBS", "")
+        return cls(
+            ignore_dirs=names("INGEST_IGNORE_DIRS", DEFAULT_IGNORE_DIRS),
+            layout_dirs=names("INGEST_LAYOUT_DIRS", DEFAULT_LAYOUT_DIRS),
+            ignore_globs=tuple(g.strip() for g in globs.split(",") if g.strip()),
+            max_file_bytes=int(os.getenv("INGEST_MAX_FILE_BYTES", str(2 * 1024**2))),
+            max_total_bytes=int(
+                os.getenv("INGEST_MAX_TOTAL_BYTES", str(64 * 1024**2))
+            ),
+            workers=int(os.getenv("INGEST_WORKERS", "8")),
+        )
+
+
+@dataclass
+class IngestStats:
+    """Counters describing one ingestion."""
+
+    files: int = 0
+    bytes: int = 0
+    duplicates: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    peak_memory: int = 0
+
+
+@dataclass
+class IngestResult:
+    """Outcome of ingesting a folder.
+
+    Attributes:
+        sources: Unique files (relative path -> contents), sorted by path.
+        duplicates: Duplicate path -> path of the identical file kept in `sources`.
+        skipped: Relative path -> reason, for files over a byte budget.
+        stats: Summary counters.
+    """
+
+    sources: Dict[str, str] = field(default_factory=dict)
+    duplicates: Dict[str, str] = field(default_factory=dict)
+    skipped: Dict[str, str] = field(default_factory=dict)
+    stats: IngestStats = field(default_factory=IngestStats)
+
+
+def walk_sol_files(
+    root: str, config: Optional[IngestConfig] = None
+) -> List[Tuple[str, int]]:
+    """List `.sol` files under `root` with a pruned directory walk.
+
+    Ignored directories are never entered, and directory/file checks use the
+    entry type reported by `scandir`. Only matching `.sol` files are `stat`-ed,
+    to learn their size for the byte budgets. `layout_dirs` are skipped at the
+    root and next to a foundry/hardhat config only; every skipped directory
+    is logged.
+
+    Returns:
+        Sorted (relative posix path, size in bytes) pairs.
+    """
+    config = config or IngestConfig()
+    if not os.path.isdir(root):
+        return []
+    found: List[Tuple[str, int]] = []
+    skipped: List[str] = []
+    stack = [("", root)]
+    while stack:
+        rel_dir, abs_dir = stack.pop()
+        try:
+            with os.scandir(abs_dir) as it:
+                entries = list(it)
+        except OSError as exc:
+            logger.warning("Cannot scan %s: %s", abs_dir, exc)
+            continue
+        layout_root = not rel_dir or any(e.name in LAYOUT_MARKERS for e in entries)
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if config.ignore_globs and any(
+                fnmatch(rel, g) for g in config.ignore_globs
+            ):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in config.ignore_dirs or (
+                        layout_root and entry.name in config.layout_dirs
+                    ):
+                        skipped.append(rel)
+                    else:
+                        stack.append((rel, entry.path))
+                elif entry.name.endswith(".sol") and entry.is_file():
+                    found.append((rel, entry.stat().st_size))
+            except OSError:
+                continue
+    if skipped:
+        logger.info(
+            "Skipped %d dependency/build directories under %s: %s",
+            len(skipped),
+            root,
+            ", ".join(sorted(skipped)),
+        )
+    found.sort()
+    return found
+
+
+def _read(path: str) -> str:
+    with open(path, "rb") as fh:
+        return fh.read().decode("utf-8", errors="replace")
+
+
+def ingest(
+    root: str,
+    config: Optional[IngestConfig] = None,
+    files: Optional[List[Tuple[str, int]]] = None,
+) -> IngestResult:
+    """Discover and read every `.sol` file under `root` within the byte budgets.
+
+    Args:
+        root: Folder to ingest.
+        config: Ingestion settings (defaults to `IngestConfig()`).
+        files: Optional listing already produced by `walk_sol_files`, so that
+            callers can time discovery and reads separately.
+
+    Returns:
+        An `IngestResult` with unique sources, duplicates, skipped files and stats.
+    """
+    config = config or IngestConfig()
+    started = time.perf_counter()
+    result = IngestResult()
+
+    selected: List[str] = []
+    total = 0
+    if files is None:
+        files = walk_sol_files(root, config)
+    for rel, size in files:
+        if config.max_file_bytes and size > config.max_file_bytes:
+            result.skipped[rel] = f"file larger than {config.max_file_bytes} bytes"
+            continue
+        if config.max_total_bytes and total + size > config.max_total_bytes:
+            result.skipped[
+                rel
+            ] = f"total budget of {config.max_total_bytes} bytes reached"
+            continue
+        selected.append(rel)
+        total += size
+
+    with ThreadPoolExecutor(max_workers=max(1, config.workers)) as pool:
+        contents = list(pool.map(lambda r: _read(os.path.join(root, r)), selected))
+
+    seen: Dict[str, str] = {}
+    for rel, content in zip(selected, contents):
+        if config.dedupe:
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            if digest in seen:
+                result.duplicates[rel] = seen[digest]
+                continue
+            seen[digest] = rel
+        result.sources[rel] = content
+
+    stats = result.stats
+    stats.files = len(result.sources)
+    stats.bytes = sum(len(c) for c in result.sources.values())
+    stats.duplicates = len(result.duplicates)
+    stats.skipped = len(result.skipped)
+    stats.seconds = time.perf_counter() - started
+    stats.peak_memory = peak_memory_bytes()
+    logger.info(
+        "Ingested %d files (%d bytes) from %s in %.3fs: %d duplicates, %d skipped, peak memory %.1f MiB",
+        stats.files,
+        stats.bytes,
+        root,
+        stats.seconds,
+        stats.duplicates,
+        stats.skipped,
+        stats.peak_memory / 2**20,
+    )
+    return result
+
+
+class FileCache:
+    """In-memory view of one ingested folder shared by prompt building and tools.
+
+    Attributes:
+        root: The ingested folder.
+        result: The `IngestResult` the cache serves from.
+    """
+
+    def __init__(self, root: str, result: IngestResult):
+        self.root = root
+        self.result = result
+        self._index = None
+        self._index_lock = threading.Lock()
+
+    @property
+    def index(self) -> SolidityIndex:
+        """The `SolidityIndex` of the cached sources, built on first use."""
+        with self._index_lock:
+            if self._index is None:
+                self._index = SolidityIndex.from_sources(self.result.sources)
+            return self._index
+
+    @property
+    def paths(self) -> List[str]:
+        """Every discovered path, including duplicates of cached files."""
+        return sorted([*self.result.sources, *self.result.duplicates])
+
+    def get(self, relative_path: str) -> Optional[str]:
+        """Return cached contents for `relative_path`, or None if not cached."""
+        rel = relative_path.replace("\\", "/")
+        while rel.startswith("./"):
+            rel = rel[2:]
+        rel = self.result.duplicates.get(rel, rel)
+        return self.result.sources.get(rel)
+
+
+_ACTIVE: Dict[str, FileCache] = {}
+_ACTIVE_LOCK = threading.Lock()
+
+
+def _key(folder: str) -> str:
+    return str(Path(folder).resolve())
+
+
+def register_file_cache(cache: FileCache) -> None:
+    """Make `cache` the active cache for its folder (used by the `@tool` functions)."""
+    with _ACTIVE_LOCK:
+        _ACTIVE[_key(cache.root)] = cache
+
+
+def unregister_file_cache(cache: FileCache) -> None:
+    """Deactivate `cache` if it is still the active cache for its folder."""
+    with _ACTIVE_LOCK:
+        key = _key(cache.root)
+        if _ACTIVE.get(key) is cache:
+            del _ACTIVE[key]
+
+
+def get_file_cache(folder: str) -> Optional[FileCache]:
+    """Return the active cache for `folder`, if a run registered one."""
+    if not _ACTIVE:
+        return None
+    with _ACTIVE_LOCK:
+        return _ACTIVE.get(_key(folder))
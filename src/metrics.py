@@ -0,0 +1,315 @@
+"""Per-stage timing, token accounting and metrics export for agent runs.
+
+`RunMetrics` collects, for one `AgentRunner.run`:
+
+- the duration, call count and bytes of each pipeline stage (discovery, file
+  reads, prompt assembly, agent calls, formatting, output write), each stage
+  also being an OpenTelemetry span named `policy_agent.<stage>` nested under
+  the run's trace,
+- estimated input/output tokens (from prompt and response sizes),
+- the tokens reported by the provider and the duration of every LLM call and
+  tool invocation, read from the `generation` and `tool` spans that datapizza
+  records in the same trace,
+- the share of reported input tokens the provider served from its prompt
+  cache (`cached_input_ratio`),
+- simple counters (prompts, cache hits) and the process peak memory.
+
+The result can be written as JSON or as a Prometheus textfile (for the node
+exporter's textfile collector); `export` picks the format from the suffix.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+from .ingest import peak_memory_bytes
+
+logger = logging.getLogger("policy_agent.metrics")
+
+_tracer = None
+
+SPAN_PREFIX = "policy_agent."
+
+
+def _get_tracer() -> Any:
+    """Return the OpenTelemetry tracer, importing the API on first use."""
+    global _tracer
+    if _tracer is None:
+        from opentelemetry import trace
+
+        _tracer = trace.get_tracer("policy_agent")
+    return _tracer
+
+
+@dataclass
+class StageMetrics:
+    """Accumulated measurements of one stage, tool or LLM call type."""
+
+    calls: int = 0
+    seconds: float = 0.0
+    bytes: int = 0
+
+
+class StageHandle:
+    """Handle yielded by `RunMetrics.stage` to annotate the running stage."""
+
+    def __init__(self, span: Any):
+        self.span = span
+        self.bytes = 0
+
+    def add_bytes(self, n: int) -> None:
+        """Account `n` bytes processed by the stage."""
+        self.bytes += n
+
+    def set(self, key: str, value: Any) -> None:
+        """Set an attribute on the stage's span."""
+        self.span.set_attribute(key, value)
+
+
+class RunMetrics:
+    """Thread-safe collector of the measurements of one run.
+
+    Attributes:
+        stages: Stage name -> accumulated `StageMetrics`.
+        tools: Tool name -> accumulated `StageMetrics` of its invocations.
+        llm: Model name -> accumulated `StageMetrics` of its calls.
+        tokens: Estimated and reported token totals (`estimated_input`,
+            `estimated_output`, `reported_input`, `reported_output`,
+            `reported_cached`).
+        reported_by_model: Model name -> reported token totals.
+        counters: Named event counts (e.g. `prompts`, `cache_hits`).
+        seconds: Wall-clock duration of the run, set by `finish`.
+        peak_memory: Process peak memory in bytes, set by `finish`.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageMetrics] = {}
+        self.tools: Dict[str, StageMetrics] = {}
+        self.llm: Dict[str, StageMetrics] = {}
+        self.tokens: Dict[str, int] = {
+            "estimated_input": 0,
+            "estimated_output": 0,
+            "reported_input": 0,
+            "reported_output": 0,
+            "reported_cached": 0,
+        }
+        self.reported_by_model: Dict[str, Dict[str, int]] = {}
+        self.counters: Dict[str, int] = {}
+        self.seconds = 0.0
+        self.peak_memory = 0
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, **attributes: Any) -> Iterator[StageHandle]:
+        """Time a stage and trace it as the span `policy_agent.<name>`.
+
+        Stages may be entered several times (e.g. once per chunk) and from
+        several threads; their measurements accumulate.
+        """
+        with _get_tracer().start_as_current_span(SPAN_PREFIX + name) as span:
+            span.set_attribute("type", "stage")
+            for key, value in attributes.items():
+                span.set_attribute(key, value)
+            handle = StageHandle(span)
+            started = time.perf_counter()
+            try:
+                yield handle
+            finally:
+                elapsed = time.perf_counter() - started
+                span.set_attribute("bytes", handle.bytes)
+                with self._lock:
+                    m = self.stages.setdefault(name, StageMetrics())
+                    m.calls += 1
+                    m.seconds += elapsed
+                    m.bytes += handle.bytes
+
+    def add_tokens(self, estimated_input: int = 0, estimated_output: int = 0) -> None:
+        """Account estimated prompt and response tokens."""
+        with self._lock:
+            self.tokens["estimated_input"] += estimated_input
+            self.tokens["estimated_output"] += estimated_output
+
+    def add_reported(
+        self, model: str, input: int = 0, output: int = 0, cached: int = 0
+    ) -> None:
+        """Account provider-reported tokens of a call made outside datapizza spans."""
+        with self._lock:
+            self._add_reported(model, input=input, output=output, cached=cached)
+
+    def _add_reported(self, model: str, **usage: int) -> None:
+        totals = self.reported_by_model.setdefault(
+            model, {"input": 0, "output": 0, "cached": 0}
+        )
+        for key, value in usage.items():
+            totals[key] += value
+            self.tokens[f"reported_{key}"] += value
+
+    def cached_input_ratio(self) -> float:
+        """Return the share of reported input tokens served from the provider cache."""
+        reported = self.tokens["reported_input"]
+        return self.tokens["reported_cached"] / reported if reported else 0.0
+
+    def increment(self, name: str, n: int = 1) -> None:
+        """Increase the counter `name` by `n`."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def collect_spans(self, spans: Iterable[Any]) -> None:
+        """Aggregate the datapizza `generation` and `tool` spans of the run.
+
+        Generation spans carry the token usage reported by the provider; tool
+        spans are named `Tool <name>`.
+        """
+        with self._lock:
+            for span in spans:
+                attrs = span.attributes or {}
+                kind = attrs.get("type")
+                if kind not in ("generation", "tool"):
+                    continue
+                seconds = (span.end_time - span.start_time) / 1e9
+                if kind == "tool":
+                    name = span.name[len("Tool ") :] if span.name else "unknown"
+                    m = self.tools.setdefault(name, StageMetrics())
+                else:
+                    model = str(attrs.get("model_name", "unknown"))
+                    m = self.llm.setdefault(model, StageMetrics())
+                    self._add_reported(
+                        model,
+                        input=int(attrs.get("prompt_tokens_used") or 0),
+                        output=int(attrs.get("completion_tokens_used") or 0),
+                        cached=int(attrs.get("cached_tokens_used") or 0),
+                    )
+                m.calls += 1
+                m.seconds += seconds
+
+    def finish(self) -> None:
+        """Record the run's wall-clock duration and the peak memory."""
+        self.seconds = time.perf_counter() - self._started
+        self.peak_memory = peak_memory_bytes()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return every measurement as JSON-serializable data."""
+        with self._lock:
+            return {
+                "seconds": self.seconds,
+                "peak_memory": self.peak_memory,
+                "stages": {k: asdict(v) for k, v in self.stages.items()},
+                "llm": {k: asdict(v) for k, v in self.llm.items()},
+                "tools": {k: asdict(v) for k, v in self.tools.items()},
+                "tokens": dict(self.tokens),
+                "reported_by_model": {
+                    k: dict(v) for k, v in self.reported_by_model.items()
+                },
+                "cached_input_ratio": self.cached_input_ratio(),
+                "counters": dict(self.counters),
+            }
+
+    def summary(self) -> str:
+        """Return a one-line human readable summary."""
+        stages = ", ".join(f"{k} {v.seconds:.3f}s" for k, v in self.stages.items())
+        return (
+            f"{self.seconds:.3f}s total ({stages}); tokens in/out "
+            f"{self.tokens['estimated_input']}/{self.tokens['estimated_output']} "
+            f"estimated, {self.tokens['reported_input']}/"
+            f"{self.tokens['reported_output']} reported "
+            f"({self.cached_input_ratio():.0%} of input cached); peak memory "
+            f"{self.peak_memory / 2**20:.1f} MiB"
+        )
+
+    def to_prometheus(self) -> str:
+        """Render the measurements in the Prometheus text exposition format."""
+        data = self.to_dict()
+        lines: List[str] = []
+
+        def metric(name: str, help_text: str, samples) -> None:
+            lines.append(f"# HELP policy_agent_{name} {help_text}")
+            lines.append(f"# TYPE policy_agent_{name} gauge")
+            for labels, value in samples:
+                label_text = ",".join(
+                    f'{k}="{_escape_label(str(v))}"' for k, v in labels.items()
+                )
+                suffix = "{" + label_text + "}" if label_text else ""
+                lines.append(f"policy_agent_{name}{suffix} {value}")
+
+        metric("run_seconds", "Duration of the last run.", [({}, data["seconds"])])
+        metric(
+            "peak_memory_bytes",
+            "Peak resident memory of the process.",
+            [({}, data["peak_memory"])],
+        )
+        for group, prefix, label in (
+            ("stages", "stage", "stage"),
+            ("llm", "llm", "model"),
+            ("tools", "tool", "tool"),
+        ):
+            items = data[group].items()
+            metric(
+                f"{prefix}_seconds",
+                f"Time spent per {label}.",
+                [({label: k}, v["seconds"]) for k, v in items],
+            )
+            metric(
+                f"{prefix}_calls",
+                f"Number of calls per {label}.",
+                [({label: k}, v["calls"]) for k, v in items],
+            )
+        metric(
+            "stage_bytes",
+            "Bytes processed per stage.",
+            [({"stage": k}, v["bytes"]) for k, v in data["stages"].items()],
+        )
+        metric(
+            "tokens",
+            "Token totals by source (estimated or reported) and direction.",
+            [
+                ({"source": key.split("_")[0], "direction": key.split("_")[1]}, v)
+                for key, v in data["tokens"].items()
+            ],
+        )
+        metric(
+            "reported_tokens",
+            "Tokens reported by the provider per model and direction.",
+            [
+                ({"model": model, "direction": d}, v)
+                for model, usage in data["reported_by_model"].items()
+                for d, v in usage.items()
+            ],
+        )
+        metric(
+            "cached_input_ratio",
+            "Share of reported input tokens served from the provider's prompt cache.",
+            [({}, data["cached_input_ratio"])],
+        )
+        metric(
+            "events",
+            "Event counters of the last run.",
+            [({"event": k}, v) for k, v in data["counters"].items()],
+        )
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        """Write the metrics to `path` atomically.
+
+        Files ending in `.prom` receive the Prometheus textfile format, any
+        other path receives JSON.
+        """
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.suffix == ".prom":
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.to_dict(), indent=2)
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_text(text)
+        os.replace(tmp, target)
+        logger.info("Wrote metrics to %s", target)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
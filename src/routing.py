@@ -0,0 +1,241 @@
+"""Token-aware model routing.
+
+A `Router` picks the provider and model for each prompt from its estimated
+input tokens, so a three-file repository can go to a fast local model while a
+monorepo goes to a long-context one. Routes are listed in a routing table,
+usually loaded from JSON with `Router.from_file`:
+
+    {
+      "output_reserve": 8192,
+      "routes": [
+        {"name": "small", "provider": "ollama", "model": "llama3.1:8b",
+         "max_tokens": 8000, "context_limit": 32768, "latency_target": 30},
+        {"name": "medium", "provider": "openai", "model": "gpt-4o-mini",
+         "max_tokens": 100000, "context_limit": 128000},
+        {"name": "large", "provider": "google", "model": "gemini-1.5-pro",
+         "context_limit": 2000000}
+      ]
+    }
+
+A route is eligible for a prompt when the prompt is within its `max_tokens`
+threshold and the prompt plus `output_reserve` fits its `context_limit`.
+Among eligible routes, the first (in table order) whose predicted latency
+meets its `latency_target` wins. Latency is predicted from the seconds per
+token observed on earlier requests of the route (see `Router.observe`);
+routes without a target or without observations always meet it. Clients come
+from `get_client`, so routed clients share the registry's instances, rate
+limits and retries. Every decision is logged.
+"""
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .cache import make_key
+from .clients import get_client
+
+logger = logging.getLogger("policy_agent.routing")
+
+# Weight of the newest observation in a route's seconds-per-token average
+LATENCY_SMOOTHING = 0.3
+
+
+@dataclass
+class Route:
+    """One entry of the routing table.
+
+    Attributes:
+        name: Label used in logs and metrics.
+        provider: Provider key of the `get_client` registry.
+        model: Model name; the provider's `<PROVIDER>_MODEL` default if None.
+        max_tokens: Largest estimated prompt the route takes, or None for no
+            threshold.
+        context_limit: The model's context window in tokens, or None if unknown.
+        latency_target: Seconds a request should take at most, or None.
+        config: Extra `get_client` configuration (base_url, rpm, ...).
+    """
+
+    name: str
+    provider: str
+    model: Optional[str] = None
+    max_tokens: Optional[int] = None
+    context_limit: Optional[int] = None
+    latency_target: Optional[float] = None
+    config: Dict[str, Any] = field(default_factory=dict)
+
+    def fits(self, tokens: int, reserve: int = 0) -> bool:
+        """Return True if a prompt of `tokens` is within the threshold and context."""
+        if self.max_tokens is not None and tokens > self.max_tokens:
+            return False
+        return self.context_limit is None or tokens + reserve <= self.context_limit
+
+    def client_config(self) -> Dict[str, Any]:
+        """Return the `get_client` configuration of the route."""
+        cfg = dict(self.config)
+        if self.model:
+            cfg["model"] = self.model
+        return cfg
+
+
+@dataclass
+class RouteDecision:
+    """The route chosen for one prompt.
+
+    Attributes:
+        route: The selected `Route`.
+        tokens: Estimated input tokens of the prompt.
+        reason: Why the route was chosen, for the log.
+        predicted_latency: Predicted seconds, or None without observations.
+    """
+
+    route: Route
+    tokens: int
+    reason: str
+    predicted_latency: Optional[float] = None
+
+
+class Router:
+    """Select a client per prompt from its estimated size.
+
+    Attributes:
+        routes: The routing table, in order of preference.
+        output_reserve: Tokens kept free in the context window for the answer.
+    """
+
+    _FIELDS = {
+        "name",
+        "provider",
+        "model",
+        "max_tokens",
+        "context_limit",
+        "latency_target",
+        "config",
+    }
+
+    def __init__(
+        self,
+        routes: List[Route],
+        output_reserve: int = 4096,
+        client_factory: Callable[[str, Dict[str, Any]], Any] = get_client,
+    ):
+        if not routes:
+            raise ValueError("A routing table needs at least one route")
+        names = [r.name for r in routes]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate route names in {names}")
+        self.routes = list(routes)
+        self.output_reserve = output_reserve
+        self._client_factory = client_factory
+        self._rates: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, table: Dict[str, Any], **kwargs: Any) -> "Router":
+        """Build a router from a routing table document.
+
+        Raises:
+            ValueError: if a route is malformed or has unknown keys.
+        """
+        routes = []
+        for i, spec in enumerate(table.get("routes") or []):
+            unknown = set(spec) - cls._FIELDS
+            if unknown or "provider" not in spec:
+                raise ValueError(
+                    f"Invalid route #{i}: needs 'provider', unknown keys {sorted(unknown)}"
+                )
+            spec = {"name": spec.get("name") or f"{spec['provider']}-{i}", **spec}
+            routes.append(Route(**spec))
+        return cls(
+            routes, output_reserve=int(table.get("output_reserve", 4096)), **kwargs
+        )
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs: Any) -> "Router":
+        """Load a routing table from a JSON file (see the module docstring)."""
+        return cls.from_dict(json.loads(Path(path).read_text()), **kwargs)
+
+    def identity(self) -> str:
+        """Return a stable identity of the table, for cache keys and manifests."""
+        return "router:" + make_key(
+            json.dumps(
+                [[r.provider, r.client_config(), r.max_tokens] for r in self.routes],
+                sort_keys=True,
+                default=str,
+            )
+        )
+
+    def predicted_latency(self, route: Route, tokens: int) -> Optional[float]:
+        """Return the predicted seconds for `tokens` on `route`, or None if unknown."""
+        with self._lock:
+            rate = self._rates.get(route.name)
+        return None if rate is None else rate * tokens
+
+    def observe(self, route: Route, tokens: int, seconds: float) -> None:
+        """Record the duration of a request of `tokens` answered by `route`."""
+        rate = seconds / max(1, tokens)
+        with self._lock:
+            previous = self._rates.get(route.name)
+            self._rates[route.name] = (
+                rate
+                if previous is None
+                else previous + LATENCY_SMOOTHING * (rate - previous)
+            )
+
+    def select(self, tokens: int) -> RouteDecision:
+        """Choose the route for a prompt of about `tokens` input tokens.
+
+        Falls back to the eligible route with the lowest predicted latency when
+        none meets its target, and to the route with the largest context when
+        the prompt fits none (the request may then be truncated or rejected by
+        the provider; `--chunk-tokens` avoids this).
+        """
+        eligible = [r for r in self.routes if r.fits(tokens, self.output_reserve)]
+        if not eligible:
+            route = max(self.routes, key=lambda r: r.context_limit or float("inf"))
+            decision = RouteDecision(route, tokens, "exceeds every context limit")
+            logger.warning(
+                "Prompt of ~%d tokens fits no route, using '%s' (consider --chunk-tokens)",
+                tokens,
+                route.name,
+            )
+            return decision
+        predictions = [(r, self.predicted_latency(r, tokens)) for r in eligible]
+        for route, predicted in predictions:
+            if (
+                route.latency_target is None
+                or predicted is None
+                or predicted <= route.latency_target
+            ):
+                reason = (
+                    "within threshold"
+                    if route is eligible[0]
+                    else "earlier routes over latency target"
+                )
+                decision = RouteDecision(route, tokens, reason, predicted)
+                break
+        else:
+            route, predicted = min(predictions, key=lambda p: p[1])
+            decision = RouteDecision(
+                route, tokens, "every route over latency target", predicted
+            )
+        logger.info(
+            "Routing ~%d tokens to '%s' (%s/%s): %s%s",
+            tokens,
+            decision.route.name,
+            decision.route.provider,
+            decision.route.model or "default model",
+            decision.reason,
+            ""
+            if decision.predicted_latency is None
+            else f", predicted {decision.predicted_latency:.1f}s",
+        )
+        return decision
+
+    def client(self, route: Route) -> Any:
+        """Return the (registry-cached) client of `route`."""
+        try:
+            return self._client_factory(route.provider, route.client_config())
+        except KeyError as ke:
+            raise RuntimeError(f"Route '{route.name}': {ke}") from ke
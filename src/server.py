@@ -0,0 +1,459 @@
+"""Long-running analysis server with a warm client and a priority job queue.
+
+`app.py serve` creates the client, prompt and response cache once and keeps
+them warm. Analysis jobs are accepted over HTTP (TCP or a Unix socket) and run
+on a bounded pool of worker threads in priority order:
+
+- `POST /jobs` with a JSON body `{"target_path": ..., "priority": 0,
+  "name": ...}` analyzes a folder visible to the server.
+- `POST /jobs?priority=N&name=...` with a tar archive body
+  (`Content-Type: application/x-tar` or `application/gzip`) uploads the
+  sources; the archive is extracted safely into the data directory and
+  removed once the job finishes.
+- `GET /jobs` lists jobs, `GET /jobs/<id>` returns one job's status and
+  `GET /jobs/<id>/result` its policy JSON.
+- `DELETE /jobs/<id>` cancels a job that has not started.
+- `GET /health` reports queue depth and worker count.
+
+Higher `priority` values run first; jobs of equal priority run in submission
+order. Submissions beyond the queue capacity are refused with 503; cancelled
+jobs leave the queue at once. Job state is kept in memory; results are written
+under `<data-dir>/results/`. Only the most recent finished jobs are kept, older
+ones are forgotten together with their result files.
+"""
+import heapq
+import io
+import json
+import logging
+import os
+import shutil
+import tarfile
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger("policy_agent.server")
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = (
+    "queued",
+    "running",
+    "done",
+    "failed",
+    "cancelled",
+)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+@dataclass
+class Job:
+    """One analysis request and its state.
+
+    Attributes:
+        id: Job identifier.
+        target_path: Folder analyzed (the extraction folder for uploads).
+        priority: Scheduling priority; higher runs first.
+        name: Optional caller-supplied label.
+        status: One of queued, running, done, failed or cancelled.
+        submitted: Submission time (epoch seconds).
+        started: Start time, once running.
+        finished: End time, once done, failed or cancelled.
+        output_file: Where the policy JSON is written.
+        entries: Number of policy entries, once done.
+        error: Failure message, if failed.
+        uploaded: True when the sources came from an uploaded archive.
+    """
+
+    id: str
+    target_path: str
+    priority: int = 0
+    name: Optional[str] = None
+    status: str = QUEUED
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    output_file: str = ""
+    entries: Optional[int] = None
+    error: Optional[str] = None
+    uploaded: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the job as JSON-serializable data."""
+        return asdict(self)
+
+
+def safe_extract(
+    archive: tarfile.TarFile, dest: Path, max_bytes: Optional[int] = None
+) -> None:
+    """Extract regular files and directories of `archive` under `dest`.
+
+    Absolute paths, `..` components, links and device files are rejected, so
+    an archive can never write outside `dest`. With `max_bytes`, archives whose
+    members add up to more than that are rejected before anything is written,
+    so a small compressed upload cannot fill the disk.
+
+    Raises:
+        ValueError: if the archive contains an unsafe member or is too large.
+    """
+    root = dest.resolve()
+    members = []
+    total = 0
+    for member in archive.getmembers():
+        total += member.size
+        if max_bytes is not None and total > max_bytes:
+            raise ValueError(f"Archive expands to more than {max_bytes} bytes")
+        target = (root / member.name).resolve()
+        if not (member.isfile() or member.isdir()):
+            raise ValueError(f"Unsupported archive member: {member.name}")
+        if os.path.isabs(member.name) or not target.is_relative_to(root):
+            raise ValueError(f"Archive member escapes the upload folder: {member.name}")
+        members.append(member)
+    if hasattr(tarfile, "data_filter"):
+        archive.extractall(root, members=members, filter="data")
+    else:  # pragma: no cover - Python without extraction filters
+        archive.extractall(root, members=members)
+
+
+class JobManager:
+    """Schedule analysis jobs on a bounded worker pool in priority order.
+
+    Attributes:
+        runner_factory: Callable (target_path, output_file) -> object with a
+            `run()` method, typically building an `AgentRunner` around the
+            shared client.
+        data_dir: Folder receiving results and extracted uploads.
+        workers: Number of jobs analyzed concurrently.
+        queue_size: Maximum number of queued jobs.
+        allowed_roots: If set, `target_path` jobs must lie under one of these.
+        max_upload_bytes: Largest accepted archive.
+        max_extracted_bytes: Largest total size of an archive's extracted files.
+        keep_finished: Finished (done, failed or cancelled) jobs kept for
+            status and result queries; older ones are evicted with their
+            result files.
+    """
+
+    def __init__(
+        self,
+        runner_factory: Callable[[str, str], Any],
+        data_dir: str,
+        workers: int = 4,
+        queue_size: int = 1000,
+        allowed_roots: Optional[Sequence[str]] = None,
+        max_upload_bytes: int = 64 * 1024 * 1024,
+        keep_finished: int = 1000,
+        max_extracted_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.runner_factory = runner_factory
+        self.data_dir = Path(data_dir)
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.allowed_roots = [Path(r).resolve() for r in allowed_roots or []]
+        self.max_upload_bytes = max_upload_bytes
+        self.max_extracted_bytes = max_extracted_bytes
+        self.keep_finished = keep_finished
+        # (-priority, seq, job id) of queued jobs only, as a heap
+        self._queue: List[Tuple[int, int, str]] = []
+        self._jobs: Dict[str, Job] = {}
+        self._finished: "deque[str]" = deque()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._seq = 0
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        (self.data_dir / "results").mkdir(parents=True, exist_ok=True)
+        (self.data_dir / "uploads").mkdir(parents=True, exist_ok=True)
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers after their current job; queued jobs are not run."""
+        self._stop.set()
+        with self._ready:
+            self._ready.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _allowed(self, path: Path) -> bool:
+        return not self.allowed_roots or any(
+            path.is_relative_to(root) for root in self.allowed_roots
+        )
+
+    def submit(
+        self, target_path: str, priority: int = 0, name: Optional[str] = None
+    ) -> Job:
+        """Queue an analysis of `target_path`.
+
+        Raises:
+            ValueError: if the folder does not exist or is outside `allowed_roots`.
+            QueueFullError: if the queue is at capacity.
+        """
+        path = Path(target_path).resolve()
+        if not path.is_dir():
+            raise ValueError(f"Not a directory: {target_path}")
+        if not self._allowed(path):
+            raise ValueError(f"Target path is outside the allowed roots: {target_path}")
+        return self._enqueue(Job(uuid.uuid4().hex, str(path), priority, name))
+
+    def submit_archive(
+        self, data: bytes, priority: int = 0, name: Optional[str] = None
+    ) -> Job:
+        """Extract an uploaded tar archive (optionally compressed) and queue it.
+
+        Raises:
+            ValueError: if the archive is too large, unreadable or unsafe.
+            QueueFullError: if the queue is at capacity.
+        """
+        if len(data) > self.max_upload_bytes:
+            raise ValueError(f"Archive larger than {self.max_upload_bytes} bytes")
+        job_id = uuid.uuid4().hex
+        dest = self.data_dir / "uploads" / job_id
+        dest.mkdir(parents=True)
+        try:
+            with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as archive:
+                safe_extract(archive, dest, self.max_extracted_bytes)
+            job = Job(job_id, str(dest), priority, name, uploaded=True)
+            return self._enqueue(job)
+        except (tarfile.TarError, ValueError, QueueFullError) as exc:
+            shutil.rmtree(dest, ignore_errors=True)
+            if isinstance(exc, tarfile.TarError):
+                raise ValueError(f"Invalid archive: {exc}") from exc
+            raise
+
+    def _enqueue(self, job: Job) -> Job:
+        job.output_file = str(self.data_dir / "results" / f"{job.id}.json")
+        with self._ready:
+            if len(self._queue) >= self.queue_size:
+                raise QueueFullError(f"Job queue is full ({self.queue_size} jobs)")
+            self._seq += 1
+            heapq.heappush(self._queue, (-job.priority, self._seq, job.id))
+            self._jobs[job.id] = job
+            self._ready.notify()
+        logger.info(
+            "Queued job %s (%s, priority %d)", job.id, job.target_path, job.priority
+        )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job with `job_id`, or None."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """Return every known job in submission order."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job; returns False if it is unknown or already started."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return False
+            job.status = CANCELLED
+            job.finished = time.time()
+            self._queue = [entry for entry in self._queue if entry[2] != job_id]
+            heapq.heapify(self._queue)
+            self._retire(job)
+        if job.uploaded:
+            shutil.rmtree(job.target_path, ignore_errors=True)
+        return True
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the policy JSON of a finished job, or None."""
+        job = self.get(job_id)
+        if job is None or job.status != DONE:
+            return None
+        return json.loads(Path(job.output_file).read_text())
+
+    def health(self) -> Dict[str, Any]:
+        """Return queue and worker counters."""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "jobs": counts,
+        }
+
+    def _retire(self, job: Job) -> None:
+        """Record `job` as finished and evict the oldest beyond `keep_finished`.
+
+        Must be called with the lock held.
+        """
+        self._finished.append(job.id)
+        while len(self._finished) > self.keep_finished:
+            old = self._jobs.pop(self._finished.popleft())
+            Path(old.output_file).unlink(missing_ok=True)
+            logger.debug("Evicted job %s", old.id)
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            with self._ready:
+                if not self._ready.wait_for(
+                    lambda: self._queue or self._stop.is_set(), timeout=0.2
+                ):
+                    continue
+                if self._stop.is_set():
+                    return
+                _, _, job_id = heapq.heappop(self._queue)
+                job = self._jobs[job_id]
+                job.status = RUNNING
+                job.started = time.time()
+            self._run(job)
+
+    def _run(self, job: Job) -> None:
+        logger.info("Running job %s", job.id)
+        try:
+            out = self.runner_factory(job.target_path, job.output_file).run()
+            status, entries, error = DONE, len(out.get("policy", [])), None
+        except Exception as exc:
+            logger.exception("Job %s failed", job.id)
+            status, entries, error = FAILED, None, f"{type(exc).__name__}: {exc}"
+        finally:
+            if job.uploaded:
+                shutil.rmtree(job.target_path, ignore_errors=True)
+        with self._lock:
+            job.status, job.entries, job.error = status, entries, error
+            job.finished = time.time()
+            self._retire(job)
+        logger.info("Job %s %s in %.1fs", job.id, status, job.finished - job.started)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """JSON API over a `JobManager` available as `self.server.manager`."""
+
+    server_version = "PolicyAgent"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def address_string(self) -> str:
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def _send(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        return parts, {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+    def do_GET(self) -> None:
+        manager: JobManager = self.server.manager
+        parts, _ = self._route()
+        if parts == ["health"]:
+            return self._send(200, manager.health())
+        if parts == ["jobs"]:
+            return self._send(200, {"jobs": [j.to_dict() for j in manager.jobs()]})
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = manager.get(parts[1])
+            if job is None:
+                return self._send(404, {"error": "unknown job"})
+            if len(parts) == 2:
+                return self._send(200, job.to_dict())
+            if parts[2] == "result":
+                if job.status != DONE:
+                    return self._send(409, {"error": f"job is {job.status}"})
+                return self._send(200, manager.result(job.id))
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        manager: JobManager = self.server.manager
+        parts, query = self._route()
+        if parts != ["jobs"]:
+            return self._send(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return self._send(400, {"error": "invalid Content-Length"})
+        if length > manager.max_upload_bytes:
+            return self._send(413, {"error": "request body too large"})
+        body = self.rfile.read(length)
+        ctype = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+        try:
+            if ctype == "application/json":
+                spec = json.loads(body or b"{}")
+                if not isinstance(spec, dict) or not spec.get("target_path"):
+                    raise ValueError("JSON body needs a target_path")
+                job = manager.submit(
+                    spec["target_path"],
+                    priority=int(spec.get("priority", 0)),
+                    name=spec.get("name"),
+                )
+            else:
+                job = manager.submit_archive(
+                    body, priority=int(query.get("priority", 0)), name=query.get("name")
+                )
+        except QueueFullError as exc:
+            return self._send(503, {"error": str(exc)})
+        except (TypeError, ValueError) as exc:
+            return self._send(400, {"error": str(exc)})
+        self._send(202, job.to_dict())
+
+    def do_DELETE(self) -> None:
+        manager: JobManager = self.server.manager
+        parts, _ = self._route()
+        if len(parts) == 2 and parts[0] == "jobs":
+            job = manager.get(parts[1])
+            if job is None:
+                return self._send(404, {"error": "unknown job"})
+            # the cancelled job may already be evicted, answer with this one
+            if manager.cancel(parts[1]):
+                return self._send(200, job.to_dict())
+            return self._send(409, {"error": "job already started"})
+        self._send(404, {"error": "not found"})
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """Threaded HTTP server listening on a Unix domain socket."""
+
+    daemon_threads = True
+
+
+def make_server(
+    manager: JobManager,
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    socket_path: Optional[str] = None,
+):
+    """Create the HTTP server for `manager` on TCP or on a Unix socket.
+
+    An existing socket file at `socket_path` is replaced.
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = UnixHTTPServer(socket_path, _Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+    server.manager = manager
+    return server
@@ -0,0 +1,348 @@
+"""Pluggable destinations for finished runs.
+
+Besides the JSON file written to `output_file`, an `AgentRunner` hands every
+finished run to its sinks as a `RunRecord`. Sinks are opened from a spec
+string with `open_sink`:
+
+- `json:<path>`: one pretty-printed policy document per run (the classic
+  output). `{project}` in the path is replaced by the project name.
+- `jsonl:<path>`: one compact line per run with the policy and run metadata,
+  appended to a single file.
+- `sqlite:<path>`: an indexed SQLite store of projects, runs, policy entries
+  and events. See `SqliteSink` for the schema and the lookups behind
+  `app.py query`.
+
+Sinks are thread-safe, so one instance can be shared by a whole batch or
+server, and must be closed when the process is done with them.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("policy_agent.sinks")
+
+
+@dataclass
+class RunRecord:
+    """A finished run as handed to the sinks.
+
+    Attributes:
+        project: Project name (the target folder name unless set by the caller).
+        target_path: Folder that was analyzed.
+        policy: The policy entries written for the run.
+        started: Start time (epoch seconds).
+        finished: End time (epoch seconds).
+        mode: Analysis mode (llm, static or hybrid).
+        client: Identity of the answering model(s), empty for static runs.
+    """
+
+    project: str
+    target_path: str
+    policy: List[Dict[str, Any]]
+    started: float = field(default_factory=time.time)
+    finished: float = field(default_factory=time.time)
+    mode: str = "llm"
+    client: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the record as JSON-serializable data."""
+        return asdict(self)
+
+
+class PolicySink:
+    """Base class of run destinations."""
+
+    def write(self, record: RunRecord) -> None:
+        """Store one finished run."""
+        self.write_many([record])
+
+    def write_many(self, records: Iterable[RunRecord]) -> int:
+        """Store several runs at once; returns how many were written."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release files and connections."""
+
+
+def _event_name(ev: Any) -> str:
+    return ev if isinstance(ev, str) else json.dumps(ev, sort_keys=True, default=str)
+
+
+class JsonFileSink(PolicySink):
+    """Write each run's `{"policy": [...]}` document to its own JSON file.
+
+    Attributes:
+        path: Destination; `{project}` is replaced by the project name.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write_many(self, records: Iterable[RunRecord]) -> int:
+        n = 0
+        for record in records:
+            out = Path(self.path.replace("{project}", record.project))
+            out.parent.mkdir(parents=True, exist_ok=True)
+            tmp = out.with_name(out.name + ".tmp")
+            tmp.write_text(json.dumps({"policy": record.policy}, indent=2))
+            os.replace(tmp, out)
+            n += 1
+        return n
+
+
+class JsonlSink(PolicySink):
+    """Append one compact JSON line per run to a single file.
+
+    Attributes:
+        path: The JSONL file, created if missing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write_many(self, records: Iterable[RunRecord]) -> int:
+        lines = [
+            json.dumps(r.to_dict(), separators=(",", ":"), default=str) + "\n"
+            for r in records
+        ]
+        with self._lock:
+            self._fh.writelines(lines)
+            self._fh.flush()
+        return len(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    path TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects(id),
+    started REAL,
+    finished REAL,
+    mode TEXT,
+    client TEXT,
+    entries INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    source_function TEXT,
+    destination_function TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    entry_id INTEGER NOT NULL REFERENCES entries(id),
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_project ON runs(project_id, id);
+CREATE INDEX IF NOT EXISTS idx_entries_run ON entries(run_id);
+CREATE INDEX IF NOT EXISTS idx_entries_source ON entries(source_function);
+CREATE INDEX IF NOT EXISTS idx_entries_destination ON entries(destination_function);
+CREATE INDEX IF NOT EXISTS idx_events_name ON events(name);
+CREATE INDEX IF NOT EXISTS idx_events_entry ON events(entry_id);
+CREATE VIEW IF NOT EXISTS latest_runs AS
+    SELECT * FROM runs WHERE id IN (SELECT MAX(id) FROM runs GROUP BY project_id);
+"""
+
+
+def _pattern(name: str) -> tuple:
+    """Return a SQL operator and operand; `*` in `name` acts as a wildcard."""
+    if "*" in name:
+        escaped = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return "LIKE ? ESCAPE '\\'", escaped.replace("*", "%")
+    return "= ?", name
+
+
+class SqliteSink(PolicySink):
+    """Indexed SQLite store of projects, runs, policy entries and events.
+
+    Each `write_many` call is a single transaction, so bulk loads (batches,
+    `app.py query import`) insert thousands of entries per commit. Entries
+    and events are indexed by function and event name, and the `latest_runs`
+    view restricts lookups to each project's most recent run.
+
+    Attributes:
+        path: The database file, created with its schema if missing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def write_many(self, records: Iterable[RunRecord]) -> int:
+        records = list(records)
+        with self._lock, self._conn:
+            cur = self._conn.cursor()
+            for r in records:
+                cur.execute(
+                    "INSERT INTO projects (name, path) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET "
+                    "path = COALESCE(NULLIF(excluded.path, ''), projects.path)",
+                    (r.project, r.target_path),
+                )
+                (project_id,) = cur.execute(
+                    "SELECT id FROM projects WHERE name = ?", (r.project,)
+                ).fetchone()
+                cur.execute(
+                    "INSERT INTO runs (project_id, started, finished, mode, client, entries) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        project_id,
+                        r.started,
+                        r.finished,
+                        r.mode,
+                        r.client,
+                        len(r.policy),
+                    ),
+                )
+                run_id = cur.lastrowid
+                events = []
+                for entry in r.policy:
+                    src = entry.get("sourceFunction") or {}
+                    dst = entry.get("destinationFunction") or {}
+                    cur.execute(
+                        "INSERT INTO entries (run_id, source_function, destination_function) "
+                        "VALUES (?, ?, ?)",
+                        (run_id, src.get("name"), dst.get("name")),
+                    )
+                    entry_id = cur.lastrowid
+                    events.extend(
+                        (entry_id, i, _event_name(ev))
+                        for i, ev in enumerate(src.get("events") or [])
+                    )
+                cur.executemany(
+                    "INSERT INTO events (entry_id, position, name) VALUES (?, ?, ?)",
+                    events,
+                )
+        logger.debug("Stored %d run(s) in %s", len(records), self.path)
+        return len(records)
+
+    def _query(self, sql: str, args: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            cur = self._conn.execute(sql, args)
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def _runs(self, all_runs: bool) -> str:
+        return "runs" if all_runs else "latest_runs"
+
+    def find_event(self, name: str, all_runs: bool = False) -> List[Dict[str, Any]]:
+        """Return the project functions emitting event `name` (`*` wildcards)."""
+        op, arg = _pattern(name)
+        return self._query(
+            "SELECT DISTINCT p.name AS project, r.id AS run, e.source_function AS function, "
+            "e.destination_function AS destination, ev.name AS event "
+            f"FROM events ev JOIN entries e ON e.id = ev.entry_id "
+            f"JOIN {self._runs(all_runs)} r ON r.id = e.run_id "
+            f"JOIN projects p ON p.id = r.project_id WHERE ev.name {op} "
+            "ORDER BY p.name, r.id, e.id",
+            (arg,),
+        )
+
+    def find_function(self, name: str, all_runs: bool = False) -> List[Dict[str, Any]]:
+        """Return entries whose source or destination function is `name`."""
+        op, arg = _pattern(name)
+        return self._query(
+            "SELECT p.name AS project, r.id AS run, e.source_function AS function, "
+            "e.destination_function AS destination, "
+            "(SELECT group_concat(name, ',') FROM "
+            "(SELECT name FROM events WHERE entry_id = e.id ORDER BY position)) AS events "
+            f"FROM entries e JOIN {self._runs(all_runs)} r ON r.id = e.run_id "
+            "JOIN projects p ON p.id = r.project_id "
+            f"WHERE e.source_function {op} OR e.destination_function {op} "
+            "ORDER BY p.name, r.id, e.id",
+            (arg, arg),
+        )
+
+    def projects(self) -> List[Dict[str, Any]]:
+        """Return every project with its run count and latest run."""
+        return self._query(
+            "SELECT p.name AS project, p.path, COUNT(r.id) AS runs, MAX(r.finished) "
+            "AS last_finished, (SELECT entries FROM latest_runs l WHERE "
+            "l.project_id = p.id) AS entries FROM projects p "
+            "LEFT JOIN runs r ON r.project_id = p.id GROUP BY p.id ORDER BY p.name"
+        )
+
+    def policy(self, project: str, run: Optional[int] = None) -> Dict[str, Any]:
+        """Rebuild the `{"policy": [...]}` document of a project's run (latest by default)."""
+        if run is None:
+            rows = self._query(
+                "SELECT l.id FROM latest_runs l JOIN projects p ON p.id = l.project_id "
+                "WHERE p.name = ?",
+                (project,),
+            )
+            if not rows:
+                raise KeyError(f"Unknown project: {project}")
+            run = rows[0]["id"]
+        entries = self._query(
+            "SELECT id, source_function, destination_function FROM entries "
+            "WHERE run_id = ? ORDER BY id",
+            (run,),
+        )
+        events: Dict[int, List[str]] = {}
+        for row in self._query(
+            "SELECT ev.entry_id, ev.name FROM events ev JOIN entries e ON "
+            "e.id = ev.entry_id WHERE e.run_id = ? ORDER BY ev.entry_id, ev.position",
+            (run,),
+        ):
+            events.setdefault(row["entry_id"], []).append(row["name"])
+        return {
+            "policy": [
+                {
+                    "sourceFunction": {
+                        "name": e["source_function"],
+                        "events": events.get(e["id"], []),
+                    },
+                    "destinationFunction": {"name": e["destination_function"]},
+                }
+                for e in entries
+            ]
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Registry mapping spec scheme -> sink factory taking the path
+_SINKS: Dict[str, Callable[[str], PolicySink]] = {
+    "json": JsonFileSink,
+    "jsonl": JsonlSink,
+    "sqlite": SqliteSink,
+}
+
+
+def open_sink(spec: str) -> PolicySink:
+    """Open a sink from a `<scheme>:<path>` spec (json, jsonl or sqlite).
+
+    Raises:
+        ValueError: if the scheme is unknown or the path is missing.
+    """
+    scheme, _, path = spec.partition(":")
+    if scheme not in _SINKS or not path:
+        raise ValueError(
+            f"Invalid sink '{spec}': expected <scheme>:<path> with scheme in {sorted(_SINKS)}"
+        )
+    return _SINKS[scheme](path)
@@ -0,0 +1,216 @@
+"""Deterministic, model-free policy extraction.
+
+`static_policy` derives the `{"policy": [...]}` document from a
+`SolidityIndex` alone, in milliseconds per repository, for CI gating. Every
+externally reachable function of a project (non-vendored) contract that emits
+events becomes a policy entry. Its events include those emitted by the
+internal functions it calls, and its destination is the function itself, as
+the agent prompt prescribes when no explicit destination exists. Each entry
+gets a confidence from the cross-chain signals found along the same call
+closure:
+
+- `bridge-call`: a call to a known messaging/bridge interface (LayerZero,
+  CCIP, Wormhole, Axelar, Hyperlane, rollup messengers and portals, ...),
+- `verification`: signature recovery or proof verification,
+- `crosschain-name`: a name suggesting messaging or asset movement.
+
+The repository-level `confidence` drives hybrid mode, where the model is only
+consulted when it falls below a threshold.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Set, Tuple
+
+from .formatter import _merge_policies
+from .indexer import CROSSCHAIN_NAME_RE, ContractInfo, FunctionInfo, SolidityIndex
+
+# Members of well-known messaging interfaces, also matched on plain calls
+# such as an inherited `_lzSend(...)`.
+BRIDGE_MEMBER_RE = re.compile(
+    r"^_?(?:ccip(?:Send|Receive)|lz(?:Send|Receive)|nonblockingLzReceive|"
+    r"send(?:Message|CrossDomainMessage|Payload|ToL1|TxToL1)|relayMessage|"
+    r"receiveMessage|publishMessage|parseAndVerifyVM|callContract(?:WithToken)?|"
+    r"createRetryableTicket|depositTransaction|xcall|xReceive|dispatch)$"
+)
+
+# Receivers (variables or interface types) of messaging contracts.
+BRIDGE_RECEIVER_RE = re.compile(
+    r"endpoint|router|messenger|mailbox|gateway|wormhole|portal|bridge|inbox|"
+    r"outbox|relayer|connext|teleporter|hyperlane|axelar|layerzero|ccip",
+    re.IGNORECASE,
+)
+
+# Signature recovery and proof verification, on members or plain calls.
+VERIFY_RE = re.compile(
+    r"^_?(?:ecrecover|recover|tryRecover|isValidSignature(?:Now)?|verify\w*|"
+    r"checkSignatures?|\w*[Pp]roof\w*)$"
+)
+
+# Confidence of an entry by its strongest signal.
+ENTRY_CONFIDENCE = {"bridge-call": 1.0, "verification": 1.0, "crosschain-name": 0.75}
+WEAK_CONFIDENCE = 0.5
+
+_ENTRY_KINDS = ("function", "receive", "fallback")
+
+
+@dataclass
+class StaticFinding:
+    """One function turned into a policy entry.
+
+    Attributes:
+        file: Relative path of the declaring file.
+        contract: Declaring contract.
+        function: Function name.
+        line: 1-based line of the declaration.
+        events: Events emitted by the function or the internal functions it calls.
+        signals: Cross-chain signals found along the same call closure.
+        confidence: `ENTRY_CONFIDENCE` of the strongest signal.
+    """
+
+    file: str
+    contract: str
+    function: str
+    line: int
+    events: List[str]
+    signals: List[str]
+    confidence: float
+
+
+@dataclass
+class StaticReport:
+    """Result of `static_policy`.
+
+    Attributes:
+        policy: Policy entries in the canonical schema, merged with `_merge_policies`.
+        findings: The per-function findings behind `policy`.
+        confidence: Repository-level confidence in [0, 1].
+        signals: Number of project functions with a bridge-call or verification
+            signal, whether or not they emit events.
+    """
+
+    policy: List[Dict[str, Any]] = field(default_factory=list)
+    findings: List[StaticFinding] = field(default_factory=list)
+    confidence: float = 0.0
+    signals: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the policy document in the canonical `{"policy": [...]}` schema."""
+        return {"policy": self.policy}
+
+
+def function_signals(fn: FunctionInfo) -> Set[str]:
+    """Return the cross-chain signals of one function body (not its callees)."""
+    signals: Set[str] = set()
+    for call in fn.external_calls:
+        receiver, _, member = call.rpartition(".")
+        if BRIDGE_MEMBER_RE.match(member) or BRIDGE_RECEIVER_RE.search(receiver):
+            signals.add("bridge-call")
+        if VERIFY_RE.match(member):
+            signals.add("verification")
+    for name in fn.calls:
+        if BRIDGE_MEMBER_RE.match(name):
+            signals.add("bridge-call")
+        elif VERIFY_RE.match(name):
+            signals.add("verification")
+    if CROSSCHAIN_NAME_RE.search(fn.name):
+        signals.add("crosschain-name")
+    return signals
+
+
+def _family(
+    by_name: Dict[str, ContractInfo], contract: ContractInfo
+) -> Dict[str, List[FunctionInfo]]:
+    """Map function names to their bodies in `contract` and its base contracts."""
+    functions: Dict[str, List[FunctionInfo]] = {}
+    pending, seen = [contract], set()
+    while pending:
+        c = pending.pop(0)
+        if c.name in seen:
+            continue
+        seen.add(c.name)
+        for fn in c.functions:
+            if fn.has_body:
+                functions.setdefault(fn.name, []).append(fn)
+        pending.extend(by_name[b] for b in c.bases if b in by_name)
+    return functions
+
+
+def _closure(
+    fn: FunctionInfo, family: Dict[str, List[FunctionInfo]]
+) -> Tuple[List[str], Set[str]]:
+    """Collect events and signals of `fn` and the internal functions it reaches."""
+    events: Dict[str, None] = {}
+    signals: Set[str] = set()
+    pending, seen = [fn], set()
+    while pending:
+        current = pending.pop(0)
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        events.update(dict.fromkeys(current.emits))
+        signals |= function_signals(current) - {"crosschain-name"}
+        for name in current.calls:
+            pending.extend(family.get(name, []))
+    if CROSSCHAIN_NAME_RE.search(fn.name):
+        signals.add("crosschain-name")
+    return list(events), signals
+
+
+def static_policy(index: SolidityIndex) -> StaticReport:
+    """Extract a policy from `index` without calling a model.
+
+    Repository confidence is the mean entry confidence, capped at
+    `WEAK_CONFIDENCE` when no project function calls a bridge interface or
+    verifies a signature or proof. A repository without entries is fully
+    confident (1.0) only when it shows no cross-chain signal at all.
+    """
+    by_name: Dict[str, ContractInfo] = {}
+    for _, c in index.contracts():
+        by_name.setdefault(c.name, c)
+
+    report = StaticReport()
+    entries: List[Dict[str, Any]] = []
+    any_name_signal = False
+    for fi, contract in index.contracts():
+        if fi.is_vendored or contract.kind in ("interface", "library"):
+            continue
+        family = _family(by_name, contract)
+        for fn in contract.functions:
+            if not fn.has_body or fn.kind not in _ENTRY_KINDS:
+                continue
+            if fn.visibility in ("internal", "private"):
+                continue
+            events, signals = _closure(fn, family)
+            strong = signals & {"bridge-call", "verification"}
+            report.signals += bool(strong)
+            any_name_signal |= "crosschain-name" in signals
+            if not events:
+                continue
+            confidence = max(
+                (ENTRY_CONFIDENCE[s] for s in signals), default=WEAK_CONFIDENCE
+            )
+            report.findings.append(
+                StaticFinding(
+                    fi.path,
+                    contract.name,
+                    fn.name,
+                    fn.line,
+                    events,
+                    sorted(signals),
+                    confidence,
+                )
+            )
+            entries.append(
+                {
+                    "sourceFunction": {"name": fn.name, "events": list(events)},
+                    "destinationFunction": {"name": fn.name},
+                }
+            )
+
+    report.policy = _merge_policies(entries)
+    if report.findings:
+        mean = sum(f.confidence for f in report.findings) / len(report.findings)
+        report.confidence = mean if report.signals else min(mean, WEAK_CONFIDENCE)
+    else:
+        report.confidence = 0.0 if report.signals or any_name_signal else 1.0
+    return report
@@ -0,0 +1,105 @@
+"""Incremental emission of policy entries while the model is still generating.
+
+`StreamEmitter` receives entries as `PolicyStreamParser` completes them, merges
+them by (sourceFunction, destinationFunction) like `_merge_policies`, and
+forwards every new or changed entry to a callback and a JSONL sink. Consumers
+should treat JSONL lines as upserts keyed by the function pair: a later line
+for the same pair carries the union of the events seen so far.
+"""
+import json
+import logging
+import sys
+import threading
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+
+from .formatter import _event_key, _is_policy_entry
+
+logger = logging.getLogger("policy_agent.streaming")
+
+
+class StreamEmitter:
+    """Merge streamed policy entries and publish each update immediately.
+
+    The emitter is thread-safe so concurrent chunk analyses can share it.
+
+    Attributes:
+        callback: Optional callable invoked with each new or updated entry.
+        sink_path: Optional JSONL file receiving one line per update; "-" means
+            standard output.
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        sink_path: Optional[str] = None,
+    ):
+        self.callback = callback
+        self.sink_path = sink_path
+        self._sink: Optional[IO[str]] = None
+        self._merged: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+        self._events: Dict[Tuple[Any, Any], set] = {}
+        self._lock = threading.Lock()
+        self.emitted = 0
+
+    def __enter__(self) -> "StreamEmitter":
+        if self.sink_path == "-":
+            self._sink = sys.stdout
+        elif self.sink_path:
+            self._sink = open(self.sink_path, "w")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._sink is not None and self._sink is not sys.stdout:
+            self._sink.close()
+        self._sink = None
+
+    def add(self, entry: Dict[str, Any]) -> bool:
+        """Merge `entry` and publish it if it added a pair or new events.
+
+        Entries without any event are held back, mirroring `_merge_policies`,
+        until a later duplicate contributes one. Entries without the policy
+        shape are ignored, and events are deduplicated by `_event_key`, so
+        unhashable events are handled like the final merge does.
+
+        Returns:
+            True if an update was published.
+        """
+        if not _is_policy_entry(entry):
+            return False
+        src = entry.get("sourceFunction") or {}
+        dst = entry.get("destinationFunction") or {}
+        key = (src.get("name"), dst.get("name"))
+        new_events = [ev for ev in (src.get("events") or []) if ev]
+        with self._lock:
+            seen = self._events.setdefault(key, set())
+            added, keys = [], set()
+            for ev in new_events:
+                k = _event_key(ev)
+                if k not in seen and k not in keys:
+                    keys.add(k)
+                    added.append(ev)
+            if key not in self._merged:
+                self._merged[key] = {
+                    "sourceFunction": {**src, "events": []},
+                    "destinationFunction": dict(dst),
+                }
+            if not added:
+                return False
+            seen.update(keys)
+            current = self._merged[key]
+            current["sourceFunction"]["events"].extend(added)
+            snapshot = json.loads(json.dumps(current))
+            self.emitted += 1
+            if self._sink is not None:
+                self._sink.write(json.dumps(snapshot) + "\n")
+                self._sink.flush()
+        if self.callback is not None:
+            try:
+                self.callback(snapshot)
+            except Exception:
+                logger.exception("Stream callback failed")
+        return True
+
+    def add_all(self, entries: List[Dict[str, Any]]) -> int:
+        """Add several entries, returning how many updates were published."""
+        return sum(1 for e in entries if self.add(e))
@@ -1,9 +1,15 @@
-import os
+import re
 from pathlib import Path
 from typing import List
 
 from datapizza.tools import tool
 
+from .indexer import SolidityIndex
+from .ingest import get_file_cache, ingest, walk_sol_files
+
+# Most matches returned by `search_code` before the rest is summarized
+MAX_SEARCH_RESULTS = 100
+
 
 @tool
 def list_sol_files(folder: str) -> List[str]:
@@ -11,7 +17,9 @@ def list_sol_files(folder: str) -> List[str]:
 
     This function is registered as a Datapizza tool via the `@tool` decorator and is
     intended for use by the agent during planning. It returns relative paths to all
-    files ending in `.sol` beneath the provided directory.
+    files ending in `.sol` beneath the provided directory, skipping dependency and
+    build folders (see `ingest.walk_sol_files`). While a run is in progress the
+    listing is served from that run's in-memory `FileCache`.
 
     Args:
         folder: Path to the directory to scan for `.sol` files. May be absolute or
@@ -21,11 +29,10 @@ def list_sol_files(folder: str) -> List[str]:
         A list of relative string paths to `.sol` files. Returns an empty list if the
         folder does not exist or no `.sol` files are found.
     """
-    base = Path(folder)
-    if not base.exists():
-        return []
-    files = [str(p.relative_to(base)) for p in base.rglob("*.sol") if p.is_file()]
-    return files
+    cache = get_file_cache(folder)
+    if cache is not None:
+        return cache.paths
+    return [rel for rel, _ in walk_sol_files(folder)]
 
 
 @tool
@@ -42,12 +49,134 @@ def read_sol_file(folder: str, relative_path: str) -> str:
         relative_path: Relative path (returned by `list_sol_files`) to the file to
             read.
 
+    Files already ingested by the current run are served from its in-memory
+    `FileCache` instead of being read from disk again.
+
     Returns:
         The file contents as a string. If the file cannot be read an error string
         describing the failure is returned instead (the agent will see this text).
     """
+    cache = get_file_cache(folder)
+    if cache is not None:
+        content = cache.get(relative_path)
+        if content is not None:
+            return content
     p = Path(folder) / relative_path
     try:
         return p.read_text()
     except Exception as e:
         return f"<error reading {relative_path}: {e}>"
+
+
+def _index(folder: str) -> SolidityIndex:
+    """Return the index of `folder`, from the run's `FileCache` when active."""
+    cache = get_file_cache(folder)
+    if cache is not None:
+        return cache.index
+    return SolidityIndex.from_sources(ingest(folder).sources)
+
+
+@tool
+def read_function(folder: str, contract: str, function: str) -> str:
+    """Return the source of one function of a contract.
+
+    The function is looked up in `contract` and then in its base contracts;
+    every overload is returned, each preceded by a `// path:line` comment.
+    Served from the run's in-memory index (see `FileCache.index`).
+
+    Args:
+        folder: Base directory of the sources (as in `list_sol_files`).
+        contract: Contract, library or interface name; empty to search all.
+        function: Function name (`constructor`, `fallback`, `receive` and
+            modifiers included).
+
+    Returns:
+        The function declaration(s) with their bodies, or a `<...>` message if
+        nothing matches.
+    """
+    index = _index(folder)
+    if contract:
+        pairs = index.contract_family(contract)
+    else:
+        pairs = list(index.contracts())
+    found = [
+        f"// {fi.path}:{fn.line} {c.name}\n{fi.source[fn.start:fn.end]}"
+        for fi, c in pairs
+        for fn in c.functions
+        if fn.name == function
+    ]
+    if not found:
+        where = f"contract {contract} or its bases" if contract else "any contract"
+        return f"<function {function} not found in {where}>"
+    return "\n\n".join(found)
+
+
+@tool
+def search_code(folder: str, pattern: str, include_vendored: bool = False) -> str:
+    """Find the functions that emit events or call functions matching `pattern`.
+
+    `pattern` is a regular expression matched (with `re.search`) against the
+    emitted event names, the `receiver.member` external call sites and the
+    plain internal call names of every function body.
+
+    Args:
+        folder: Base directory of the sources (as in `list_sol_files`).
+        pattern: Regular expression, e.g. `Sent|Received` or `endpoint\\.send`.
+        include_vendored: Also search dependency code (lib/, node_modules/, ...).
+
+    Returns:
+        One `path:line Contract.function emits|calls name` line per match, at
+        most `MAX_SEARCH_RESULTS`, or a `<...>` message.
+    """
+    try:
+        regex = re.compile(pattern)
+    except re.error as e:
+        return f"<invalid pattern {pattern!r}: {e}>"
+    matches: List[str] = []
+    for fi, c in _index(folder).contracts():
+        if fi.is_vendored and not include_vendored:
+            continue
+        for fn in c.functions:
+            where = f"{fi.path}:{fn.line} {c.name}.{fn.name}"
+            matches.extend(f"{where} emits {e}" for e in fn.emits if regex.search(e))
+            matches.extend(
+                f"{where} calls {call}"
+                for call in [*fn.external_calls, *fn.calls]
+                if regex.search(call)
+            )
+    if not matches:
+        return f"<no emit or call site matches {pattern!r}>"
+    extra = len(matches) - MAX_SEARCH_RESULTS
+    shown = matches[:MAX_SEARCH_RESULTS]
+    if extra > 0:
+        shown.append(f"<... {extra} more matches, narrow the pattern>")
+    return "\n".join(shown)
+
+
+@tool
+def list_contract_events(folder: str, contract: str) -> str:
+    """List the events declared by a contract and its base contracts.
+
+    Args:
+        folder: Base directory of the sources (as in `list_sol_files`).
+        contract: Contract name.
+
+    Returns:
+        One line per event with its declaration, location and the functions of
+        the contract family emitting it, or a `<...>` message.
+    """
+    family = _index(folder).contract_family(contract)
+    if not family:
+        return f"<contract {contract} not found>"
+    emitters = {}
+    for _, c in family:
+        for fn in c.functions:
+            for name in fn.emits:
+                emitters.setdefault(name, []).append(f"{c.name}.{fn.name}")
+    lines = [
+        f"{ev.text} // {fi.path}:{ev.line}; emitted by: "
+        + (", ".join(dict.fromkeys(emitters.get(ev.name, []))) or "-")
+        for fi, c in family
+        for ev in c.events
+    ]
+    return "\n".join(lines) or f"<contract {contract} declares no events>"
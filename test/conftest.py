@@ -1,6 +1,60 @@
+import json
+import re
 import sys
 from pathlib import Path
 
+import pytest
+
 # Ensure the repository root is on sys.path so tests can import `src`.
 REPO_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(REPO_ROOT))
+
+
+def policy_for_prompt(prompt):
+    """Return one policy entry per `function <name>` emitting `E<name>` in `prompt`."""
+    return [
+        {
+            "sourceFunction": {"name": name, "events": [f"E{name}"]},
+            "destinationFunction": {"name": name},
+        }
+        for name in re.findall(r"function (\w+)\(", prompt)
+    ]
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    """Replace the datapizza `Agent` used by `AgentRunner` with a local fake.
+
+    The fake answers every prompt with `policy_for_prompt(prompt)` as fenced JSON
+    and records the prompts it received in the returned list.
+    """
+    from datapizza.agents.agent import StepResult
+    from datapizza.core.clients import ClientResponse
+    from datapizza.type import TextBlock
+
+    import src.agent_runner as agent_runner
+
+    prompts = []
+
+    class FakeAgent:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+        def _text(self, prompt):
+            prompts.append(prompt)
+            policy = {"policy": policy_for_prompt(prompt)}
+            return "```json\n" + json.dumps(policy) + "\n```"
+
+        def run(self, prompt):
+            return StepResult(index=1, content=[TextBlock(content=self._text(prompt))])
+
+        def stream_invoke(self, prompt):
+            text = self._text(prompt)
+            for i in range(0, len(text), 7):
+                yield ClientResponse(
+                    content=[TextBlock(content=text[: i + 7])], delta=text[i : i + 7]
+                )
+            yield StepResult(index=1, content=[TextBlock(content=text)])
+
+    monkeypatch.setattr(agent_runner, "Agent", FakeAgent)
+    return prompts
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from src.batch import BatchRunner, Project, discover_projects, load_manifest
+
+
+def _make_projects(base, names):
+    for name in names:
+        (base / name).mkdir(parents=True)
+        (base / name / "C.sol").write_text(f"contract {name} {{}}")
+
+
+class FakeRunner:
+    calls = []
+    fail = set()
+
+    def __init__(self, target, output):
+        self.target = target
+        self.output = output
+
+    def run(self):
+        FakeRunner.calls.append(self.target)
+        if any(self.target.endswith(name) for name in FakeRunner.fail):
+            raise RuntimeError("provider error")
+        out = {"policy": [{"sourceFunction": {"name": "f", "events": ["E"]}}]}
+        with open(self.output, "w") as fh:
+            json.dump(out, fh)
+        return out
+
+
+def test_discover_projects_skips_dirs_without_sources(tmp_path):
+    _make_projects(tmp_path, ["b", "a"])
+    (tmp_path / "empty").mkdir()
+    assert [p.name for p in discover_projects(str(tmp_path))] == ["a", "b"]
+
+
+def test_load_manifest_text_and_json(tmp_path):
+    (tmp_path / "list.txt").write_text("# bridges\nx/one\n\ny/one\n")
+    projects = load_manifest(str(tmp_path / "list.txt"))
+    assert [p.name for p in projects] == ["one", "one-2"]
+    assert projects[0].path == str(tmp_path / "x" / "one")
+
+    (tmp_path / "list.json").write_text(json.dumps([{"name": "n", "path": "/abs"}]))
+    assert load_manifest(str(tmp_path / "list.json")) == [Project("n", "/abs")]
+
+    (tmp_path / "odd.txt").write_text("my bridge\n..\n")
+    assert [p.name for p in load_manifest(str(tmp_path / "odd.txt"))] == [
+        "my-bridge",
+        "project",
+    ]
+
+    # generated names never collide with each other or the batch's own files
+    (tmp_path / "clash.txt").write_text("a/foo\nb/foo\nc/foo-2\nindex\nbatch_state\n")
+    assert [p.name for p in load_manifest(str(tmp_path / "clash.txt"))] == [
+        "foo",
+        "foo-2",
+        "foo-2-2",
+        "index-2",
+        "batch_state-2",
+    ]
+
+    # explicit names in a mixed manifest are kept and not reused
+    items = [{"path": "x/n"}, {"name": "n", "path": "y"}, "z/n"]
+    (tmp_path / "mixed.json").write_text(json.dumps(items))
+    assert [p.name for p in load_manifest(str(tmp_path / "mixed.json"))] == [
+        "n-2",
+        "n",
+        "n-3",
+    ]
+
+
+def test_load_manifest_rejects_duplicate_and_unsafe_names(tmp_path):
+    for names, error in (
+        (["n", "n"], "Duplicate"),
+        (["../escape"], "Unsafe"),
+        (["a/b"], "Unsafe"),
+        ([".hidden"], "Unsafe"),
+        (["index"], "Reserved"),
+    ):
+        items = [{"name": n, "path": f"/p{i}"} for i, n in enumerate(names)]
+        (tmp_path / "list.json").write_text(json.dumps(items))
+        with pytest.raises(ValueError, match=error):
+            load_manifest(str(tmp_path / "list.json"))
+
+
+def test_batch_resumes_without_redoing_finished_projects(tmp_path):
+    _make_projects(tmp_path / "src", ["a", "b", "c"])
+    projects = discover_projects(str(tmp_path / "src"))
+    out_dir = tmp_path / "out"
+    FakeRunner.calls = []
+    FakeRunner.fail = {"b"}
+
+    summary = BatchRunner(projects, str(out_dir), FakeRunner, jobs=2).run()
+    assert (summary["done"], summary["failed"]) == (2, 1)
+    assert (out_dir / "a.json").exists() and (out_dir / "index.json").exists()
+
+    FakeRunner.calls = []
+    FakeRunner.fail = set()
+    summary = BatchRunner(projects, str(out_dir), FakeRunner, jobs=2).run()
+    assert [c.rsplit("/", 1)[-1] for c in FakeRunner.calls] == ["b"]
+    assert (summary["done"], summary["failed"]) == (3, 0)
+    index = json.loads((out_dir / "index.json").read_text())
+    assert [p["status"] for p in index["projects"]] == ["done"] * 3
+
+    # a name now pointing at another folder is not considered done
+    _make_projects(tmp_path / "other", ["a"])
+    FakeRunner.calls = []
+    moved = [Project("a", str(tmp_path / "other" / "a"))] + projects[1:]
+    BatchRunner(moved, str(out_dir), FakeRunner, jobs=2).run()
+    assert FakeRunner.calls == [str(tmp_path / "other" / "a")]
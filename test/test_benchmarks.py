@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from benchmarks import run
+from benchmarks.stand_in import RecordReplayClient, StandInClient
+from benchmarks.synth import generate_repo
+from src.agent_runner import AgentRunner
+from src.clients import get_client
+from src.ingest import walk_sol_files
+
+
+@pytest.fixture(autouse=True)
+def quiet_agent(monkeypatch):
+    monkeypatch.setenv("DATAPIZZA_AGENT_LOG_LEVEL", "WARNING")
+
+
+def test_generate_repo_is_deterministic(tmp_path):
+    a = generate_repo(str(tmp_path / "a"), files=6, functions=4, vendored=2, seed=3)
+    b = generate_repo(str(tmp_path / "b"), files=6, functions=4, vendored=2, seed=3)
+    assert a == b and a.vendored == 2
+    for rel, _ in walk_sol_files(str(tmp_path / "a")):
+        assert (tmp_path / "a" / rel).read_text() == (tmp_path / "b" / rel).read_text()
+    # vendored libraries are pruned by discovery
+    assert len(walk_sol_files(str(tmp_path / "a"))) == a.files - a.vendored
+
+
+def test_stand_in_client_runs_the_real_agent(tmp_path):
+    generate_repo(str(tmp_path / "repo"), files=3, functions=2, vendored=0)
+    client = get_client("stand-in", {"entries": 5})
+    assert isinstance(client.wrapped, StandInClient)
+    out = AgentRunner(
+        "p", str(tmp_path / "repo"), str(tmp_path / "out.json"), client=client
+    ).run()
+    assert len(out["policy"]) == 5
+    assert out["policy"][0]["sourceFunction"]["events"] == ["sendMessage0_0Event"]
+
+
+def test_record_then_replay(tmp_path):
+    generate_repo(str(tmp_path / "repo"), files=2, functions=2, vendored=0)
+    rec = tmp_path / "rec.json"
+
+    def analyze(client):
+        return AgentRunner(
+            "p", str(tmp_path / "repo"), str(tmp_path / "out.json"), client=client
+        ).run()
+
+    recorded = analyze(get_client("record", {"path": str(rec), "provider": "stand-in"}))
+    assert json.loads(rec.read_text())["model"] == "stand-in"
+    replayed = analyze(RecordReplayClient(str(rec)))
+    assert replayed == recorded
+
+    (tmp_path / "repo" / "src" / "Contract0.sol").write_text("contract X {}")
+    with pytest.raises(KeyError):
+        analyze(RecordReplayClient(str(rec)))
+
+
+def test_suite_writes_results_and_detects_regressions(tmp_path):
+    out = tmp_path / "bench.json"
+    assert run.main(["--files", "4", "--repeat", "1", "--output", str(out)]) == 0
+    result = json.loads(out.read_text())
+    assert set(result["stages"]) == set(run.STAGES)
+    assert result["corpus"]["policy_entries"] > 0
+
+    baseline = json.loads(out.read_text())
+    for stage in baseline["stages"].values():
+        stage["median"] /= 100
+    assert run.compare(result, baseline, 0.2)
+    assert not run.compare(result, result, 0.2)
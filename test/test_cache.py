@@ -0,0 +1,82 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import src.agent_runner as agent_runner
+from src.agent_runner import AgentRunner
+from src.cache import ResponseCache, make_key
+
+
+def test_put_get_roundtrip(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"))
+    key = make_key("prompt", "source", "client")
+    assert cache.get(key) is None
+
+    cache.put(key, "raw", {"policy": []})
+    entry = cache.get(key)
+    assert entry["raw_text"] == "raw"
+    assert entry["policy"] == {"policy": []}
+
+
+def test_concurrent_puts_of_one_key_stay_whole(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"))
+    raw = {i: str(i) * 50_000 for i in range(8)}
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(
+            pool.map(
+                lambda i: cache.put("k", raw[i], {"policy": []}), list(range(8)) * 4
+            )
+        )
+    assert cache.get("k")["raw_text"] in raw.values()
+    assert not list((tmp_path / "cache").glob("*.tmp"))
+
+
+def test_key_is_length_prefixed():
+    assert make_key("ab", "c") != make_key("a", "bc")
+
+
+def test_lru_eviction_by_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_entries=2)
+    for i, key in enumerate(["k1", "k2"]):
+        cache.put(key, "raw", {"policy": []})
+        os.utime(
+            tmp_path / f"{key}.json", (time.time() - 100 + i, time.time() - 100 + i)
+        )
+    # touch k1 so k2 becomes the least recently used
+    assert cache.get("k1") is not None
+    cache.put("k3", "raw", {"policy": []})
+
+    assert cache.get("k2") is None
+    assert cache.get("k1") is not None
+    assert cache.get("k3") is not None
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_age=10)
+    cache.put("old", "raw", {"policy": []})
+    os.utime(tmp_path / "old.json", (time.time() - 60, time.time() - 60))
+    assert cache.get("old") is None
+    assert not (tmp_path / "old.json").exists()
+
+
+def test_runner_cache_hit_skips_agent(tmp_path, monkeypatch):
+    src = tmp_path / "sol"
+    src.mkdir()
+    (src / "A.sol").write_text("contract A {}")
+    cache = ResponseCache(str(tmp_path / "cache"))
+    runner = AgentRunner(
+        prompt_text="p",
+        target_path=str(src),
+        output_file=str(tmp_path / "out.json"),
+        client=object(),
+        cache=cache,
+    )
+    policy = {"policy": [{"sourceFunction": {"name": "f", "events": ["E"]}}]}
+    cache.put(runner.cache_key(runner.build_combined_prompt()), "raw", policy)
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("agent must not run on a cache hit")
+
+    monkeypatch.setattr(agent_runner, "Agent", _fail)
+    assert runner.run() == policy
+    assert (tmp_path / "out.json").exists()
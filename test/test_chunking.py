@@ -0,0 +1,94 @@
+import json
+import threading
+
+import src.agent_runner as agent_runner
+from src.agent_runner import AgentRunner
+from src.chunking import estimate_tokens, plan_chunks
+from src.indexer import resolve_import
+
+
+def _contract(name, imports=(), size=400):
+    head = "".join(f'import "./{i}.sol";\n' for i in imports)
+    return head + f"contract {name} {{\n" + "// pad\n" * (size // 7) + "}\n"
+
+
+def test_resolve_import_relative_and_remapped():
+    known = ["src/Bridge.sol", "src/IBridge.sol", "lib/oz/access/Ownable.sol"]
+    assert resolve_import("src/Bridge.sol", "./IBridge.sol", known) == "src/IBridge.sol"
+    assert (
+        resolve_import("src/Bridge.sol", "@oz/access/Ownable.sol", known)
+        == "lib/oz/access/Ownable.sol"
+    )
+    assert resolve_import("src/Bridge.sol", "./Missing.sol", known) is None
+
+    # suffixes match whole path segments; the shortest candidate wins
+    known = ["src/MyToken.sol", "src/Token.sol", "lib/x/src/Token.sol"]
+    assert resolve_import("src/Main.sol", "Token.sol", known) == "src/Token.sol"
+    assert resolve_import("a/Main.sol", "src/Token.sol", known) == "src/Token.sol"
+    assert resolve_import("src/Main.sol", "yToken.sol", known) is None
+
+
+def test_plan_chunks_respects_budget_and_keeps_imports_together():
+    sources = {
+        "A.sol": _contract("A", ["B"]),
+        "B.sol": _contract("B"),
+        "C.sol": _contract("C", ["D"]),
+        "D.sol": _contract("D"),
+    }
+    budget = estimate_tokens(sources["A.sol"]) + estimate_tokens(sources["B.sol"])
+    chunks = plan_chunks(sources, budget)
+
+    assert sorted(sorted(c) for c in chunks) == [["A.sol", "B.sol"], ["C.sol", "D.sol"]]
+    # dependencies first inside a chunk
+    ab = next(c for c in chunks if "A.sol" in c)
+    assert ab.index("B.sol") < ab.index("A.sol")
+
+
+def test_plan_chunks_splits_oversized_component():
+    sources = {"A.sol": _contract("A", ["B"]), "B.sol": _contract("B")}
+    chunks = plan_chunks(sources, estimate_tokens(sources["A.sol"]))
+    assert chunks == [["A.sol"], ["B.sol"]] or chunks == [["B.sol"], ["A.sol"]]
+
+
+def test_runner_chunked_mode_merges_partials(tmp_path, monkeypatch):
+    for name in "ABCD":
+        (tmp_path / f"{name}.sol").write_text(_contract(name))
+    seen_threads = set()
+
+    class FakeAgent:
+        def __init__(self, **kwargs):
+            pass
+
+        def run(self, prompt):
+            seen_threads.add(threading.get_ident())
+            names = [n for n in "ABCD" if f"contract {n} " in prompt]
+            policy = [
+                {
+                    "sourceFunction": {"name": "send", "events": [f"E{n}"]},
+                    "destinationFunction": {"name": "recv"},
+                }
+                for n in names
+            ]
+            return type("Res", (), {"text": json.dumps({"policy": policy})})()
+
+    monkeypatch.setattr(agent_runner, "Agent", FakeAgent)
+    out_file = tmp_path / "out.json"
+    runner = AgentRunner(
+        "p",
+        str(tmp_path),
+        str(out_file),
+        client=object(),
+        chunk_tokens=estimate_tokens(_contract("A")),
+        max_workers=4,
+    )
+    out = runner.run()
+
+    assert len(runner.build_prompts()) == 4
+    assert len(out["policy"]) == 1
+    assert sorted(out["policy"][0]["sourceFunction"]["events"]) == [
+        "EA",
+        "EB",
+        "EC",
+        "ED",
+    ]
+    assert json.loads(out_file.read_text()) == out
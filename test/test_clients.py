@@ -0,0 +1,214 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src import clients
+from src.cache import client_identity
+from src.clients import (
+    ContextCacheAdapter,
+    ManagedClient,
+    ProviderLimiter,
+    RetryPolicy,
+    TokenBucket,
+    get_client,
+    register,
+    retry_after,
+)
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FlakyClient:
+    """Raise the queued errors first, then answer."""
+
+    model_name = "flaky-1"
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke(self, input, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(
+            text="ok", prompt_tokens_used=3, completion_tokens_used=2
+        )
+
+    def stream_invoke(self, input, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        yield "a"
+        raise HTTPError(503)
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    clients.clear_client_cache()
+    yield
+    clients.clear_client_cache()
+
+
+def _managed(*errors):
+    return ManagedClient(
+        FlakyClient(errors), "flaky", retry=RetryPolicy(max_retries=3, base=0.001)
+    )
+
+
+def test_get_client_caches_instances_per_config():
+    built = []
+    register("counting", lambda cfg: built.append(cfg) or FlakyClient())
+    a = get_client("counting", {"model": "m", "rpm": 10})
+    assert get_client("counting", {"rpm": 10, "model": "m"}) is a
+    assert get_client("counting", {"model": "other"}) is not a
+    assert get_client("counting", {"model": "m", "rpm": 10, "reuse": False}) is not a
+    # managed keys are not passed to the provider factory
+    assert built[0] == {"model": "m"}
+    assert a.limiter.requests.per_minute == 10
+    assert client_identity(a) == "FlakyClient:flaky-1"
+
+
+def test_transient_errors_are_retried():
+    client = _managed(HTTPError(429, {"Retry-After": "0"}), HTTPError(503))
+    assert client.invoke("x").text == "ok"
+    assert client.wrapped.calls == 3
+
+
+def test_permanent_errors_and_exhausted_retries_raise():
+    client = _managed(HTTPError(400))
+    with pytest.raises(HTTPError):
+        client.invoke("x")
+    assert client.wrapped.calls == 1
+
+    client = _managed(*[HTTPError(500)] * 4)
+    with pytest.raises(HTTPError):
+        client.invoke("x")
+    assert client.wrapped.calls == 4
+
+
+def test_stream_retries_only_before_the_first_chunk():
+    client = _managed(ConnectionError("reset"))
+    stream = client.stream_invoke("x")
+    assert next(stream) == "a"
+    with pytest.raises(HTTPError):
+        next(stream)
+    assert client.wrapped.calls == 2
+
+
+def test_backoff_releases_the_concurrency_slot(monkeypatch):
+    free_while_sleeping = []
+    client = ManagedClient(
+        FlakyClient([HTTPError(429, {"Retry-After": "30"})]),
+        "flaky",
+        limiter=ProviderLimiter(max_concurrency=1),
+        retry=RetryPolicy(max_retries=1),
+    )
+
+    def sleep(seconds):
+        slot_free = client.limiter.slots.acquire(blocking=False)
+        if slot_free:
+            client.limiter.slots.release()
+        free_while_sleeping.append(slot_free)
+
+    monkeypatch.setattr(clients.time, "sleep", sleep)
+    assert client.invoke("x").text == "ok"
+    assert free_while_sleeping == [True]
+
+    client.wrapped.errors = [HTTPError(503, {"Retry-After": "30"})]
+    stream = client.stream_invoke("x")
+    assert next(stream) == "a"
+    assert free_while_sleeping == [True, True]
+
+
+def test_retry_after_sources():
+    assert retry_after(HTTPError(429, {"retry-after": "7"})) == 7.0
+    date = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert retry_after(HTTPError(429, {"Retry-After": date})) == 0.0
+    assert retry_after(Exception("429 RESOURCE_EXHAUSTED {'retryDelay': '12s'}")) == 12
+    # a malformed header falls through to the body hint or to the backoff
+    assert retry_after(HTTPError(429, {"Retry-After": "soon"})) is None
+    client = _managed(HTTPError(429, {"Retry-After": "soon"}))
+    assert client.invoke("x").text == "ok" and client.wrapped.calls == 2
+    assert RetryPolicy(base=0.001).delay(HTTPError(429, {"retry-after": "5"}), 0) == 5
+
+
+def test_token_bucket_allows_a_minute_of_burst_then_paces():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    # returning tokens (usage lower than estimated) shortens later waits
+    bucket.reserve(-1)
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+
+
+class RecordingCache(ContextCacheAdapter):
+    min_tokens = 50
+
+    def __init__(self, delay=0.0):
+        self.created, self.sent, self.deleted = [], [], []
+        self.delay = delay
+
+    def create(self, client, system_prompt, prefix, ttl):
+        time.sleep(self.delay)
+        self.created.append((system_prompt, prefix, ttl))
+        return f"cachedContents/{len(self.created)}"
+
+    def delete(self, client, name):
+        self.deleted.append(name)
+
+    def generate(self, client, name, input, **kwargs):
+        self.sent.append((name, input))
+        return SimpleNamespace(text="ok", prompt_tokens_used=90, cached_tokens_used=80)
+
+
+def test_context_cache_handles_are_reused_until_expiry(monkeypatch):
+    adapter = RecordingCache()
+    monkeypatch.setitem(clients._CONTEXT_CACHES, "flaky", adapter)
+    client = _managed()
+    prefix = "FILE: lib/A.sol\n" + "x" * 400
+
+    assert _managed().context_cache("p", "short") is None
+    handle = client.context_cache("p", prefix, ttl=600)
+    assert handle.name == "cachedContents/1" and handle.uses == 1
+    assert client.context_cache("p", prefix, ttl=600) is handle and handle.uses == 2
+    assert client.context_cache("q", prefix).name == "cachedContents/2"
+    assert client.invoke_cached(handle, "rest").text == "ok"
+    assert adapter.sent == [("cachedContents/1", "rest")]
+
+    handle.expires = 0
+    assert client.context_cache("p", prefix, ttl=600).name == "cachedContents/3"
+    assert not ManagedClient(FlakyClient(), "other").supports_context_cache
+
+
+def test_context_cache_is_created_once_and_deleted_when_released(monkeypatch):
+    adapter = RecordingCache(delay=0.05)
+    monkeypatch.setitem(clients._CONTEXT_CACHES, "flaky", adapter)
+    client = _managed()
+    prefix = "FILE: lib/A.sol\n" + "x" * 400
+    handles = []
+
+    def take():
+        handles.append(client.context_cache("p", prefix))
+
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(adapter.created) == 1 and len({id(h) for h in handles}) == 1
+    assert handles[0].holders == 8
+
+    for handle in handles[1:]:
+        client.release_context_cache(handle)
+    assert adapter.deleted == []
+    client.release_context_cache(handles[0])
+    assert adapter.deleted == ["cachedContents/1"]
+    assert client.context_cache("p", prefix).name == "cachedContents/2"
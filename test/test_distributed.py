@@ -0,0 +1,101 @@
+import json
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from src.batch import Project
+from src.distributed import Worker, WorkQueue
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+class FakeRunner:
+    def __init__(self, target, output):
+        self.target = target
+        self.output = output
+
+    def run(self):
+        if self.target.endswith("broken"):
+            raise RuntimeError("provider error")
+        out = {"policy": [{"sourceFunction": {"name": "f", "events": ["E"]}}]}
+        Path(self.output).write_text(json.dumps(out))
+        return out
+
+
+def _queue(tmp_path, names, **kwargs):
+    queue = WorkQueue(str(tmp_path / "work"), **kwargs)
+    queue.enqueue([Project(n, str(tmp_path / n)) for n in names])
+    return queue
+
+
+def test_expired_leases_are_reclaimed_and_failures_retried(tmp_path):
+    queue = _queue(tmp_path, ["a", "b", "broken"], lease_seconds=60, max_attempts=2)
+    assert queue.enqueue([Project("a", str(tmp_path / "a"))]) == 0
+
+    # a crashed worker still holds "a"; a live worker holds "b"
+    crashed = queue.claim("crashed")
+    live = queue.claim("live")
+    assert (crashed.name, live.name) == ("a", "b")
+    other = queue.claim("other")
+    assert other.name == "broken" and queue.claim("other") is None
+    queue.release(other)
+    crashed.expires = time.time() - 1
+    (queue.root / "leases" / "a.lease").write_text(json.dumps(asdict(crashed)))
+
+    index = Worker(queue, FakeRunner, worker_id="w1", wait=False).run()
+    assert index["workers"] == {"w1": 1} and index["running"] == 1
+    assert queue.result("a")["attempts"] == 2
+    assert queue.result("broken")["status"] == "failed"
+    # the crashed worker's late heartbeat finds its lease taken over
+    assert not queue.renew(crashed) and queue.renew(live)
+
+    queue.record(live, {"status": "done", "policies": 1})
+    queue.release(live)
+    index = json.loads(queue.index_path.read_text())
+    assert index["running"] == 1  # published before "b" finished
+    index = queue.write_index()
+    assert (index["done"], index["failed"], index["pending"]) == (2, 1, 0)
+    assert queue.drained()
+
+
+def test_workers_in_separate_processes_share_the_queue(tmp_path):
+    projects = tmp_path / "projects"
+    for i in range(6):
+        (projects / f"p{i}").mkdir(parents=True)
+        (projects / f"p{i}" / "Bridge.sol").write_text(
+            "contract Bridge%d {\n  event Sent(uint256 a);\n"
+            "  function send%d(uint256 a) external { emit Sent(a); }\n}\n" % (i, i)
+        )
+    work = tmp_path / "work"
+    cmd = [
+        sys.executable,
+        str(REPO_ROOT / "src" / "app.py"),
+        "worker",
+        "--work-dir",
+        str(work),
+        "--projects-dir",
+        str(projects),
+        "--mode",
+        "static",
+        "--no-cache",
+        "--poll-interval",
+        "0.1",
+    ]
+    procs = [
+        subprocess.Popen(
+            cmd + ["--worker-id", f"w{i}"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for i in range(3)
+    ]
+    assert [p.wait(timeout=60) for p in procs] == [0, 0, 0]
+
+    index = json.loads((work / "index.json").read_text())
+    assert index["done"] == 6 and index["pending"] == index["running"] == 0
+    assert sum(index["workers"].values()) == 6
+    assert not list((work / "leases").iterdir())
+    policy = json.loads((work / "outputs" / "p3.json").read_text())["policy"]
+    assert policy[0]["sourceFunction"]["name"] == "send3"
@@ -1,6 +1,7 @@
 import json
 
-from src.formatter import format_policy_json
+from src import formatter
+from src.formatter import _merge_policies, format_policy_json, repair_policy_json
 
 
 def test_extract_from_fenced_json():
@@ -30,3 +31,247 @@ def test_merge_duplicates():
     assert len(out["policy"]) == 1
     events = out["policy"][0]["sourceFunction"]["events"]
     assert "A" in events and "B" in events
+
+
+def test_braces_inside_strings_and_trailing_text():
+    raw = (
+        'Here you go: {"policy": [{"sourceFunction": {"name": "a}{", "events": ["E"]},'
+        ' "destinationFunction": {"name": "b"}}]} and a stray } brace'
+    )
+    out = format_policy_json(raw)
+    assert out["policy"][0]["sourceFunction"]["name"] == "a}{"
+
+
+def test_merge_preserves_first_seen_event_order():
+    raw = json.dumps(
+        {
+            "policy": [
+                {
+                    "sourceFunction": {"name": "x", "events": ["B", "A", "B"]},
+                    "destinationFunction": {"name": "y"},
+                },
+                {
+                    "sourceFunction": {"name": "x", "events": ["C", "A"]},
+                    "destinationFunction": {"name": "y"},
+                },
+            ]
+        }
+    )
+    assert format_policy_json(raw)["policy"][0]["sourceFunction"]["events"] == [
+        "B",
+        "A",
+        "C",
+    ]
+
+
+class CountingEvent(str):
+    """An event name counting the equality checks made against it."""
+
+    comparisons = 0
+
+    def __eq__(self, other):
+        CountingEvent.comparisons += 1
+        return str.__eq__(self, other)
+
+    __hash__ = str.__hash__
+
+
+def _policy(n, functions=10, event=str):
+    return {
+        "policy": [
+            {
+                "sourceFunction": {
+                    "name": f"f{i % functions}",
+                    "events": [event(f"E{i}")],
+                },
+                "destinationFunction": {"name": "d"},
+            }
+            for i in range(n)
+        ]
+    }
+
+
+def test_merge_is_linear_in_events_on_100k_entries():
+    # 10 function pairs accumulating 10k events each: a list scan per event
+    # would compare each new event with every event already merged
+    CountingEvent.comparisons = 0
+    merged = _merge_policies(_policy(100_000, event=CountingEvent)["policy"])
+    assert len(merged) == 10 and len(merged[0]["sourceFunction"]["events"]) == 10_000
+    assert CountingEvent.comparisons < 1_000
+
+    CountingEvent.comparisons = 0
+    twice = _policy(1_000, event=CountingEvent)["policy"] * 2
+    assert len(_merge_policies(twice)[0]["sourceFunction"]["events"]) == 100
+    assert CountingEvent.comparisons <= 1_000
+
+
+def _count_scans(monkeypatch):
+    """Count candidate lookups and the structural tokens `_scan_object` reads."""
+    counts = {"candidates": 0, "tokens": 0}
+    candidate_starts = formatter._candidate_starts
+
+    def counting_candidates(s):
+        counts["candidates"] += 1
+        return candidate_starts(s)
+
+    class CountingPattern:
+        def finditer(self, s, pos=0):
+            for m in formatter_re.finditer(s, pos):
+                counts["tokens"] += 1
+                yield m
+
+    formatter_re = formatter._STRUCTURE_RE
+    monkeypatch.setattr(formatter, "_candidate_starts", counting_candidates)
+    monkeypatch.setattr(formatter, "_STRUCTURE_RE", CountingPattern())
+    return counts, formatter_re
+
+
+def test_format_scans_multi_megabyte_responses_once(monkeypatch):
+    counts, structure_re = _count_scans(monkeypatch)
+    large = "```json\n" + json.dumps(_policy(40_000, 4000)) + "\n```\ntrailing"
+    assert len(large) > 3_000_000
+    assert len(format_policy_json(large)["policy"]) == 4000
+    # the fenced payload decodes at the first candidate, without a brace scan
+    assert counts == {"candidates": 1, "tokens": 0}
+
+    # a balanced but invalid payload (trailing comma) falls back to one scan
+    broken = large.replace("]}\n```", ",]}\n```", 1)
+    counts.update(candidates=0, tokens=0)
+    format_policy_json(broken)
+    assert 0 < counts["tokens"] and counts["candidates"] <= 3
+    assert counts["tokens"] <= len(structure_re.findall(broken))
+
+
+def test_repair_recovers_complete_entries_and_reports_the_cut():
+    raw = (
+        'Sure:\n```json\n{"policy": [\n'
+        ' {"sourceFunction": {"name": "a", "events": ["A",],}, // trailing comma\n'
+        '  "destinationFunction": {"name": "a"}},\n'
+        ' {"sourceFunction": {"name": "b//x", "events": ["B"]},'
+        ' "destinationFunction": {"name": "b"}},\n'
+        ' {"sourceFunction": {"name": "c", "eve'
+    )
+    repair = repair_policy_json(raw)
+    assert [e["sourceFunction"]["name"] for e in repair.entries] == ["a", "b//x"]
+    assert repair.truncated and repair.repaired == 1 and repair.dropped == 0
+    assert raw[: repair.cut_offset].endswith('{"name": "b"}}')
+    assert repair.cut_line == 6
+    # no invented `name(` entries from the heuristic fallback
+    assert [e["sourceFunction"]["name"] for e in format_policy_json(raw)["policy"]] == [
+        "a",
+        "b//x",
+    ]
+
+    cut_early = repair_policy_json('```json\n{"policy": [')
+    assert (
+        cut_early.truncated and cut_early.entries == [] and cut_early.cut_offset == 20
+    )
+    complete = repair_policy_json('{"policy": [{"a": 1},]}')
+    assert complete.complete and complete.entries == [{"a": 1}]
+    assert not repair_policy_json("no json here").found
+
+
+def test_repair_drops_entries_without_the_policy_shape():
+    good = (
+        '{"sourceFunction": {"name": "a", "events": ["A"]},'
+        ' "destinationFunction": {"name": "a"}}'
+    )
+    raw = (
+        '{"policy": [{"sourceFunction": "send", "destinationFunction": "recv"}, '
+        '"stray", ' + good + ', {"sourceFunction": {"name": ["x"]}}, {"sourceFu'
+    )
+    repair = repair_policy_json(raw)
+    assert repair.truncated and repair.dropped == 2
+    assert _merge_policies(repair.entries) == [json.loads(good)]
+
+    complete = repair_policy_json(
+        '{"policy": [{"sourceFunction": "send"}, ' + good + "]}"
+    )
+    assert complete.complete and complete.dropped == 1
+    assert format_policy_json(raw)["policy"] == [json.loads(good)]
+
+
+def test_runner_continues_a_truncated_response(tmp_path, monkeypatch):
+    from datapizza.agents.agent import StepResult
+    from datapizza.type import TextBlock
+
+    import src.agent_runner as agent_runner
+
+    def entry(name):
+        return json.dumps(
+            {
+                "sourceFunction": {"name": name, "events": [f"E{name}"]},
+                "destinationFunction": {"name": name},
+            }
+        )
+
+    requests = []
+
+    class TruncatingAgent:
+        def __init__(self, **kwargs):
+            self.tools = [t.name for t in kwargs["tools"]]
+
+        def run(self, prompt):
+            requests.append((prompt, self.tools))
+            if len(requests) == 1:
+                text = '```json\n{"policy": [' + entry("a") + ", " + entry("b")[:20]
+            else:
+                text = '```json\n{"policy": [' + entry("b") + "]}\n```"
+            return StepResult(index=1, content=[TextBlock(content=text)])
+
+    monkeypatch.setattr(agent_runner, "Agent", TruncatingAgent)
+    (tmp_path / "A.sol").write_text(
+        "contract A { event Ea(); function a() external { emit Ea(); } }"
+    )
+    runner = agent_runner.AgentRunner(
+        "p", str(tmp_path), str(tmp_path / "o.json"), client=object()
+    )
+    out = runner.run()
+
+    assert [e["sourceFunction"]["name"] for e in out["policy"]] == ["a", "b"]
+    assert runner.metrics.counters["continuations"] == 1
+    prompt, tools = requests[1]
+    assert "cut off after 1 complete policy entries" in prompt
+    assert "1. a -> a" in prompt and "emit Ea" not in prompt
+    assert "contract A (line 1)" in prompt and "read_function" in tools
+
+    requests.clear()
+    runner.max_continuations = 0
+    runner.run()
+    assert len(requests) == 1
+
+
+def test_compact_rows_expand_to_the_canonical_schema():
+    raw = (
+        "```policy\n@events\tDeposited\tMessageSent\n"
+        "deposit\t=\t$1 $2\nrelay\thandle\t$2 Paused\n# note\nbad\nx = $9\n```"
+    )
+    out = format_policy_json(raw)
+    assert out["policy"] == [
+        {
+            "sourceFunction": {
+                "name": "deposit",
+                "events": ["Deposited", "MessageSent"],
+            },
+            "destinationFunction": {"name": "deposit"},
+        },
+        {
+            "sourceFunction": {"name": "relay", "events": ["MessageSent", "Paused"]},
+            "destinationFunction": {"name": "handle"},
+        },
+    ]
+    repair = repair_policy_json(raw)
+    assert repair.complete and repair.dropped == 2
+
+    cut = repair_policy_json(raw[:60])
+    assert cut.truncated and len(cut.entries) == 1
+    assert raw[: cut.cut_offset].endswith("$1 $2\n")
+
+    # the same policy takes a fraction of the characters of the JSON form
+    policy = _policy(400, 100)["policy"]
+    rows = "\n".join(
+        f"{e['sourceFunction']['name']}\t=\t$1" for e in _merge_policies(policy)
+    )
+    assert len("```policy\n@events\tE0\n" + rows + "\n```") * 5 < len(
+        json.dumps({"policy": _merge_policies(_policy(400, 100)["policy"])})
+    )
@@ -0,0 +1,95 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.stand_in import StandInClient
+from src.agent_runner import AgentRunner
+from src.hedging import HedgeCancelled, Hedger
+
+
+@pytest.fixture(autouse=True)
+def quiet_agent(monkeypatch):
+    monkeypatch.setenv("DATAPIZZA_AGENT_LOG_LEVEL", "WARNING")
+
+
+def _clients(*specs):
+    """(model, delay, answer) specs -> hedger clients keyed `SimpleNamespace:<model>`."""
+    return [
+        ("p", SimpleNamespace(model_name=model, delay=delay, answer=answer))
+        for model, delay, answer in specs
+    ]
+
+
+def _attempt(client, cancel):
+    """Sleep `client.delay` in small steps, honoring `cancel`, then answer."""
+    delay, answer = client.delay, client.answer
+    deadline = time.perf_counter() + delay
+    while time.perf_counter() < deadline:
+        if cancel.is_set():
+            raise HedgeCancelled()
+        time.sleep(0.005)
+    if isinstance(answer, Exception):
+        raise answer
+    return answer
+
+
+A, B = "SimpleNamespace:a", "SimpleNamespace:b"
+
+
+def test_fast_primary_never_starts_backup():
+    hedger = Hedger(_clients(("a", 0.0, "A"), ("b", 0.0, "B")), budget=0.5)
+    assert hedger.run(_attempt) == ("A", A)
+    assert B not in hedger.stats.providers
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    hedger = Hedger(_clients(("a", 1.0, "A"), ("b", 0.0, "B")), budget=0.05)
+    started = time.perf_counter()
+    assert hedger.run(_attempt) == ("B", B)
+    assert time.perf_counter() - started < 0.5
+    stats = hedger.stats.summary()
+    assert stats[A]["cancelled"] == 1 and stats[B]["wins"] == 1
+    # both clients share the provider name "p" but stay apart
+    assert hedger.client(B).answer == "B"
+
+
+def test_failed_or_rejected_primary_falls_back_immediately():
+    hedger = Hedger(
+        _clients(("a", 0.0, RuntimeError("down")), ("b", 0.0, "B")), budget=5
+    )
+    started = time.perf_counter()
+    assert hedger.run(_attempt) == ("B", B)
+    assert time.perf_counter() - started < 1
+
+    hedger = Hedger(_clients(("a", 0.0, ""), ("b", 0.0, "")), budget=5)
+    # nothing acceptable: the primary's result is returned
+    assert hedger.run(_attempt) == ("", A)
+    assert hedger.stats.summary()[B]["rejected"] == 1
+
+    hedger = Hedger(_clients(("a", 0.0, RuntimeError("a")), ("b", 0.0, KeyError())))
+    with pytest.raises(RuntimeError):
+        hedger.run(_attempt)
+
+    with pytest.raises(ValueError, match="SimpleNamespace:a"):
+        Hedger(_clients(("a", 0.0, "A"), ("a", 0.0, "B")))
+
+
+def test_runner_uses_the_first_non_empty_policy(tmp_path):
+    (tmp_path / "A.sol").write_text(
+        "contract A { function send() external {} function relay() external {} }"
+    )
+    hedger = Hedger(
+        [
+            ("stand-in", StandInClient(latency=1.0, model="slow")),
+            ("stand-in", StandInClient(entries=1, model="fast")),
+        ],
+        budget=0.05,
+    )
+    runner = AgentRunner("p", str(tmp_path), str(tmp_path / "o.json"), hedger=hedger)
+    out = runner.run()
+
+    assert [e["sourceFunction"]["name"] for e in out["policy"]] == ["send"]
+    assert runner.metrics.counters["hedge_wins.StandInClient:fast"] == 1
+    assert hedger.stats.summary()["StandInClient:slow"]["cancelled"] == 1
+    assert runner.client_id() == "StandInClient:slow|StandInClient:fast"
@@ -0,0 +1,99 @@
+import json
+import threading
+
+from src.agent_runner import AgentRunner
+from src.incremental import dependents, manifest_path, watch
+
+
+def _write(base, name, body, imports=()):
+    head = "".join(f'import "./{i}.sol";\n' for i in imports)
+    (base / f"{name}.sol").write_text(f"{head}contract {name} {{\n{body}\n}}\n")
+
+
+def _runner(base, out):
+    return AgentRunner("p", str(base), str(out), client=object(), incremental=True)
+
+
+def test_dependents_follows_importers_transitively():
+    graph = {"A.sol": ["B.sol"], "B.sol": ["C.sol"], "C.sol": [], "D.sol": []}
+    assert dependents(graph, {"C.sol"}) == {"A.sol", "B.sol", "C.sol"}
+
+
+def test_incremental_run_reanalyzes_changed_files_and_dependents(tmp_path, fake_agent):
+    src = tmp_path / "src"
+    src.mkdir()
+    _write(src, "Base", "function base() external {}")
+    _write(src, "Bridge", "function bridge() external {}", imports=["Base"])
+    _write(src, "Other", "function other() external {}")
+    out = tmp_path / "out.json"
+
+    first = _runner(src, out).run()
+    assert {e["sourceFunction"]["name"] for e in first["policy"]} == {
+        "base",
+        "bridge",
+        "other",
+    }
+    assert manifest_path(str(out)).exists()
+
+    # nothing changed: no model call at all
+    fake_agent.clear()
+    assert _runner(src, out).run() == first
+    assert fake_agent == []
+
+    # a change in Base re-analyzes Base and its importer Bridge, not Other
+    _write(src, "Base", "function base2() external {}")
+    second = _runner(src, out).run()
+    assert len(fake_agent) == 1
+    assert "contract Other" not in fake_agent[0]
+    assert "contract Bridge" in fake_agent[0]
+    assert {e["sourceFunction"]["name"] for e in second["policy"]} == {
+        "base2",
+        "bridge",
+        "other",
+    }
+    assert json.loads(out.read_text()) == second
+
+    # any setting shaping the output invalidates the manifest
+    for option, value in (("minify", True), ("compact_output", True)):
+        fake_agent.clear()
+        runner = _runner(src, out)
+        setattr(runner, option, value)
+        runner.run()
+        assert len(fake_agent) == 1 and "contract Other" in fake_agent[0], option
+
+
+def test_deleting_an_imported_file_reanalyzes_its_importers(tmp_path, fake_agent):
+    src = tmp_path / "src"
+    src.mkdir()
+    _write(src, "Base", "function base() external {}")
+    _write(src, "Bridge", "function bridge() external {}", imports=["Base"])
+    _write(src, "Other", "function other() external {}")
+    out = tmp_path / "out.json"
+    _runner(src, out).run()
+
+    fake_agent.clear()
+    (src / "Base.sol").unlink()
+    third = _runner(src, out).run()
+    assert len(fake_agent) == 1
+    assert "contract Bridge" in fake_agent[0] and "contract Other" not in fake_agent[0]
+    assert {e["sourceFunction"]["name"] for e in third["policy"]} == {
+        "bridge",
+        "other",
+    }
+
+
+def test_watch_reruns_after_change(tmp_path, fake_agent):
+    src = tmp_path / "src"
+    src.mkdir()
+    _write(src, "A", "function a() external {}")
+    out = tmp_path / "out.json"
+
+    timer = threading.Timer(
+        0.1, lambda: _write(src, "A", "function changed() external {}")
+    )
+    timer.start()
+    watch(_runner(src, out), interval=0.02, debounce=0.05, max_runs=2)
+    timer.join()
+
+    names = [e["sourceFunction"]["name"] for e in json.loads(out.read_text())["policy"]]
+    assert names == ["changed"]
@@ -0,0 +1,201 @@
+import pytest
+
+from src.agent_runner import AgentRunner, TokenBudgetExceeded
+from src.indexer import (
+    SolidityIndex,
+    is_stable_path,
+    is_vendored_path,
+    minify_source,
+    parse_source,
+    split_stable_prefix,
+    tokenize,
+)
+
+BRIDGE = """
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+import "./IMessenger.sol";
+
+/* contract Commented { function ghost() external {} } */
+contract Bridge is Ownable {
+    event Deposited(address indexed from, uint256 amount);
+    string constant S = "{ not a brace";
+
+    function deposit(uint256 amount) external payable {
+        IERC20(token).transferFrom(msg.sender, address(this), amount);
+        messenger.sendMessage{value: msg.value}(abi.encode(amount));
+        emit Deposited(msg.sender, amount);
+    }
+
+    function getTotal() external view returns (uint256) {
+        return total;
+    }
+}
+"""
+
+MATH = """
+library MathLib {
+    function add(uint a, uint b) internal pure returns (uint) { return a + b; }
+}
+interface IMessenger {
+    event MessageSent(bytes data);
+    function sendMessage(bytes calldata data) external payable;
+}
+"""
+
+
+def test_tokenize_drops_comments_and_keeps_strings():
+    values = [t.value for t in tokenize('// a\n/* b */ x = "c // d";')]
+    assert values == ["x", "=", '"c // d"', ";"]
+
+
+def test_parse_source_extracts_structure():
+    fi = parse_source("Bridge.sol", BRIDGE)
+    assert fi.imports == ["./IMessenger.sol"]
+    assert [c.name for c in fi.contracts] == ["Bridge"]
+    bridge = fi.contracts[0]
+    assert bridge.bases == ["Ownable"]
+    assert [e.name for e in bridge.events] == ["Deposited"]
+
+    deposit = bridge.functions[0]
+    assert deposit.name == "deposit"
+    assert deposit.visibility == "external"
+    assert deposit.emits == ["Deposited"]
+    assert "IERC20.transferFrom" in deposit.external_calls
+    assert "messenger.sendMessage" in deposit.external_calls
+
+
+def test_render_pruned_keeps_relevant_code_and_manifest():
+    index = SolidityIndex.from_sources({"Bridge.sol": BRIDGE, "lib/Math.sol": MATH})
+    text = index.render_pruned()
+
+    assert "emit Deposited(msg.sender, amount);" in text
+    assert "return total;" not in text
+    assert "getTotal" in text  # still listed in the manifest
+    assert "library MathLib" in text and "function add" in text
+    assert "return a + b" not in text
+
+
+def test_vendored_paths_match_whole_directory_names():
+    for path in (
+        "lib/forge-std/src/Test.sol",
+        "node_modules/@openzeppelin/contracts/token/ERC20.sol",
+        "contracts\\openzeppelin\\Ownable.sol",
+    ):
+        assert is_vendored_path(path), path
+    for path in (
+        "src/mylib/Bridge.sol",
+        "contracts/calib/Bridge.sol",
+        "contracts/openzeppelin_fork_bridge/B.sol",
+        "contracts/lib.sol",
+        "Bridge.sol",
+    ):
+        assert not is_vendored_path(path), path
+        assert not is_stable_path(path), path
+    assert is_stable_path("src/interfaces/IBridge.sol")
+    assert not is_stable_path("src/myinterfaces/IBridge.sol")
+    assert not is_stable_path("src/contractlib/Bridge.sol")
+
+
+def test_runner_prune_shrinks_prompt(tmp_path):
+    (tmp_path / "Bridge.sol").write_text(BRIDGE)
+    (tmp_path / "Math.sol").write_text(MATH)
+    full = AgentRunner("p", str(tmp_path), "out.json", client=object())
+    pruned = AgentRunner("p", str(tmp_path), "out.json", client=object(), prune=True)
+
+    assert len(pruned.build_combined_prompt()) < len(full.build_combined_prompt())
+    assert "emit Deposited" in pruned.build_combined_prompt()
+
+
+def test_minify_keeps_line_mapping_and_strings():
+    minified = minify_source(BRIDGE)
+    assert len(minified) < len(BRIDGE)
+    assert "SPDX" not in minified and "pragma" not in minified
+    assert "ghost" not in minified
+    assert '"{ not a brace"' in minified
+    original = BRIDGE.splitlines()
+    for no, line in enumerate(minified.splitlines()):
+        if line:
+            assert " ".join(original[no].split()) == line
+    # the index sees the same functions at the same lines
+    before, after = parse_source("B.sol", BRIDGE), parse_source("B.sol", minified)
+    assert [(f.name, f.line) for f in after.contracts[0].functions] == [
+        (f.name, f.line) for f in before.contracts[0].functions
+    ]
+    # a one-line (flattened) file keeps its code after the pragma
+    flat = "pragma solidity ^0.8.0; contract A { function f() public {} }"
+    assert minify_source(flat) == "contract A { function f() public {} }\n"
+    assert minify_source("pragma abicoder\n  v2;\nstring s;") == "\n\nstring s;\n"
+
+
+def test_prompt_assembly_sends_instructions_once_and_checks_budget(
+    tmp_path, fake_agent
+):
+    (tmp_path / "Bridge.sol").write_text(BRIDGE)
+    instructions = "Extract the cross-chain policy. " * 20
+    runner = AgentRunner(
+        instructions,
+        str(tmp_path),
+        str(tmp_path / "o.json"),
+        client=object(),
+        minify=True,
+    )
+    runner.run()
+    assert instructions not in fake_agent[0] and "SPDX" not in fake_agent[0]
+    assert runner.metrics.tokens["estimated_input"] < len(instructions + BRIDGE) // 4
+
+    runner.token_budget, runner.enforce_budget = 10, True
+    with pytest.raises(TokenBudgetExceeded):
+        runner.run()
+    assert len(fake_agent) == 1
+
+
+def test_retrieval_prompt_is_a_manifest(tmp_path, fake_agent):
+    (tmp_path / "Bridge.sol").write_text(BRIDGE)
+    (tmp_path / "openzeppelin").mkdir()
+    (tmp_path / "openzeppelin" / "Math.sol").write_text(MATH)
+    runner = AgentRunner(
+        "p", str(tmp_path), str(tmp_path / "o.json"), client=object(), retrieval=True
+    )
+    out = runner.run()
+
+    prompt = fake_agent[0]
+    assert "read_function(folder, contract, function)" in prompt
+    assert "contract Bridge is Ownable (line 7)\n  events: Deposited\n" in prompt
+    assert "  L11: function deposit(uint256 amount) external payable\n" in prompt
+    assert "emit Deposited" not in prompt and "return total" not in prompt
+    assert (
+        "VENDORED:\nopenzeppelin/Math.sol: library MathLib, interface IMessenger"
+        in prompt
+    )
+    assert [e["sourceFunction"]["name"] for e in out["policy"]] == [
+        "deposit",
+        "getTotal",
+    ]
+
+    # bodies are not in the manifest, yet changing one changes the prompt
+    (tmp_path / "Bridge.sol").write_text(BRIDGE.replace("return total;", "return 0;"))
+    assert runner.build_combined_prompt() != prompt
+
+
+def test_stable_files_lead_the_prompt(tmp_path):
+    (tmp_path / "Bridge.sol").write_text(BRIDGE)
+    (tmp_path / "interfaces").mkdir()
+    (tmp_path / "interfaces" / "IMessenger.sol").write_text(MATH)
+    (tmp_path / "openzeppelin").mkdir()
+    (tmp_path / "openzeppelin" / "Ownable.sol").write_text("contract Ownable {}\n")
+    runner = AgentRunner("p", str(tmp_path), str(tmp_path / "o.json"))
+
+    prompt = runner.build_combined_prompt()
+    labels = [line for line in prompt.splitlines() if line.startswith("FILE: ")]
+    assert labels == [
+        "FILE: interfaces/IMessenger.sol",
+        "FILE: openzeppelin/Ownable.sol",
+        "FILE: Bridge.sol",
+    ]
+    prefix, rest = split_stable_prefix(prompt)
+    assert rest.startswith("FILE: Bridge.sol\n") and "MathLib" in prefix
+
+    # editing a project file leaves the stable prefix untouched
+    (tmp_path / "Bridge.sol").write_text(BRIDGE.replace("total", "sum"))
+    assert split_stable_prefix(runner.build_combined_prompt())[0] == prefix
@@ -0,0 +1,94 @@
+from src.ingest import (
+    FileCache,
+    IngestConfig,
+    ingest,
+    register_file_cache,
+    unregister_file_cache,
+    walk_sol_files,
+)
+from src.tools import list_sol_files, read_sol_file
+
+
+def _tree(base):
+    files = {
+        "src/Bridge.sol": "contract Bridge {}",
+        "src/copy/Ownable.sol": "contract Ownable {}",
+        "src/Ownable.sol": "contract Ownable {}",
+        "node_modules/x/Dep.sol": "contract Dep {}",
+        "lib/forge-std/Test.sol": "contract Test {}",
+        ".git/objects/A.sol": "junk",
+        "src/Big.sol": "contract Big {" + " " * 200 + "}",
+    }
+    for rel, content in files.items():
+        path = base / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def test_walker_prunes_ignored_directories(tmp_path):
+    _tree(tmp_path)
+    rels = [rel for rel, _ in walk_sol_files(str(tmp_path))]
+    assert rels == [
+        "src/Big.sol",
+        "src/Bridge.sol",
+        "src/Ownable.sol",
+        "src/copy/Ownable.sol",
+    ]
+    everything = IngestConfig(ignore_dirs=frozenset(), layout_dirs=frozenset())
+    assert len(walk_sol_files(str(tmp_path), everything)) == 7
+
+
+def test_layout_dirs_are_skipped_at_layout_roots_only(tmp_path, caplog):
+    files = {
+        "contracts/Bridge.sol": "contract Bridge {}",
+        "contracts/lib/BridgeLib.sol": "library BridgeLib {}",
+        "contracts/build/Builder.sol": "contract Builder {}",
+        "lib/forge-std/Test.sol": "contract Test {}",
+        "packages/core/foundry.toml": "",
+        "packages/core/lib/Dep.sol": "contract Dep {}",
+        "packages/core/src/Core.sol": "contract Core {}",
+    }
+    for rel, content in files.items():
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    with caplog.at_level("INFO", logger="policy_agent.ingest"):
+        rels = [rel for rel, _ in walk_sol_files(str(tmp_path))]
+    assert rels == [
+        "contracts/Bridge.sol",
+        "contracts/build/Builder.sol",
+        "contracts/lib/BridgeLib.sol",
+        "packages/core/src/Core.sol",
+    ]
+    assert "lib, packages/core/lib" in caplog.text
+
+
+def test_ingest_dedupes_and_enforces_budgets(tmp_path):
+    _tree(tmp_path)
+    result = ingest(str(tmp_path), IngestConfig(max_file_bytes=100))
+
+    assert result.duplicates == {"src/copy/Ownable.sol": "src/Ownable.sol"}
+    assert "src/Big.sol" in result.skipped
+    assert list(result.sources) == ["src/Bridge.sol", "src/Ownable.sol"]
+    assert result.stats.files == 2 and result.stats.peak_memory > 0
+
+    tight = ingest(str(tmp_path), IngestConfig(max_total_bytes=40))
+    assert sum(len(c) for c in tight.sources.values()) <= 40
+    assert tight.skipped
+
+
+def test_tools_are_served_from_registered_cache(tmp_path):
+    _tree(tmp_path)
+    cache = FileCache(str(tmp_path), ingest(str(tmp_path)))
+    register_file_cache(cache)
+    try:
+        (tmp_path / "src" / "Bridge.sol").write_text("changed on disk")
+        assert read_sol_file(str(tmp_path), "src/Bridge.sol") == "contract Bridge {}"
+        assert read_sol_file(str(tmp_path), "./src/copy/Ownable.sol") == (
+            "contract Ownable {}"
+        )
+        assert "src/copy/Ownable.sol" in list_sol_files(str(tmp_path))
+    finally:
+        unregister_file_cache(cache)
+    assert read_sol_file(str(tmp_path), "src/Bridge.sol") == "changed on disk"
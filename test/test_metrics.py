@@ -0,0 +1,137 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from datapizza.core.clients import ClientResponse
+from datapizza.type import TextBlock
+
+from benchmarks.stand_in import StandInClient
+from benchmarks.synth import generate_repo
+from src import clients
+from src.agent_runner import AgentRunner
+from src.clients import ContextCacheAdapter, ManagedClient
+from src.metrics import RunMetrics
+
+
+@pytest.fixture(autouse=True)
+def quiet_agent(monkeypatch):
+    monkeypatch.setenv("DATAPIZZA_AGENT_LOG_LEVEL", "WARNING")
+
+
+def test_run_records_stages_tokens_and_llm_calls(tmp_path):
+    generate_repo(str(tmp_path / "repo"), files=6, functions=2, vendored=0)
+    metrics_file = tmp_path / "metrics.json"
+    runner = AgentRunner(
+        "p",
+        str(tmp_path / "repo"),
+        str(tmp_path / "out.json"),
+        client=StandInClient(),
+        chunk_tokens=600,
+        metrics_file=str(metrics_file),
+    )
+    runner.run()
+
+    data = json.loads(metrics_file.read_text())
+    assert set(data["stages"]) == {
+        "discovery",
+        "read",
+        "prompt",
+        "agent",
+        "format",
+        "write",
+    }
+    chunks = data["counters"]["prompts"]
+    assert chunks > 1 and data["stages"]["agent"]["calls"] == chunks
+    # LLM calls made on worker threads are part of the run's trace
+    assert data["llm"]["stand-in"]["calls"] == chunks
+    assert data["tokens"]["estimated_input"] > 0
+    assert data["tokens"]["reported_input"] > 0
+    assert data["stages"]["read"]["bytes"] == runner.last_ingest.stats.bytes
+    assert data["peak_memory"] > 0
+
+
+def test_prometheus_export(tmp_path):
+    metrics = RunMetrics()
+    with metrics.stage("discovery") as stage:
+        stage.add_bytes(10)
+    metrics.collect_spans(
+        [
+            SimpleNamespace(
+                name="Tool read_sol_file",
+                attributes={"type": "tool"},
+                start_time=0,
+                end_time=2_000_000_000,
+            ),
+            SimpleNamespace(
+                name="client.invoke",
+                attributes={
+                    "type": "generation",
+                    "model_name": 'gem"ini',
+                    "prompt_tokens_used": 7,
+                    "completion_tokens_used": 3,
+                },
+                start_time=0,
+                end_time=1,
+            ),
+        ]
+    )
+    metrics.finish()
+    path = tmp_path / "policy_agent.prom"
+    metrics.export(str(path))
+
+    text = path.read_text()
+    assert 'policy_agent_stage_bytes{stage="discovery"} 10' in text
+    assert 'policy_agent_tool_seconds{tool="read_sol_file"} 2.0' in text
+    assert 'policy_agent_reported_tokens{model="gem\\"ini",direction="input"} 7' in text
+    assert 'policy_agent_tokens{source="reported",direction="output"} 3' in text
+    assert text.count("# TYPE policy_agent_stage_seconds gauge") == 1
+
+
+class PrefixCache(ContextCacheAdapter):
+    def __init__(self):
+        self.created, self.sent, self.deleted = 0, [], 0
+
+    def create(self, client, system_prompt, prefix, ttl):
+        self.created += 1
+        return "cachedContents/prefix"
+
+    def delete(self, client, name):
+        self.deleted += 1
+
+    def generate(self, client, name, input, **kwargs):
+        self.sent.append(input)
+        text = '{"policy": [{"sourceFunction": {"name": "send", "events": ["Sent"]}, "destinationFunction": {"name": "send"}}]}'
+        return ClientResponse(
+            content=[TextBlock(content=text)],
+            prompt_tokens_used=100,
+            completion_tokens_used=10,
+            cached_tokens_used=80,
+        )
+
+
+def test_context_cache_hit_rate_is_reported(tmp_path, monkeypatch):
+    clients.clear_client_cache()
+    adapter = PrefixCache()
+    monkeypatch.setitem(clients._CONTEXT_CACHES, "stand-in", adapter)
+    (tmp_path / "A.sol").write_text("contract A { function send() external {} }")
+    (tmp_path / "openzeppelin").mkdir()
+    (tmp_path / "openzeppelin" / "L.sol").write_text("library L {}\n")
+    runner = AgentRunner(
+        "p",
+        str(tmp_path),
+        str(tmp_path / "o.json"),
+        client=ManagedClient(StandInClient(), "stand-in"),
+        context_cache=True,
+    )
+    assert runner.run()["policy"][0]["sourceFunction"]["name"] == "send"
+    assert runner.metrics.counters["context_cache.created"] == 1
+    assert adapter.deleted == 1  # the run cleans up its cache
+    runner.run()
+
+    # every request sends the project file only
+    assert adapter.created == 2 and adapter.sent[1].startswith("FILE: A.sol")
+    assert runner.metrics.counters == {"prompts": 1, "context_cache.created": 1}
+    assert runner.metrics.to_dict()["cached_input_ratio"] == 0.8
+    assert "(80% of input cached)" in runner.metrics.summary()
+    assert "policy_agent_cached_input_ratio 0.8" in runner.metrics.to_prometheus()
+    clients.clear_client_cache()
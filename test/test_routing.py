@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+import benchmarks.stand_in  # noqa: F401  registers the stand-in provider
+from src.agent_runner import AgentRunner
+from src.routing import Route, Router
+
+
+@pytest.fixture(autouse=True)
+def quiet_agent(monkeypatch):
+    monkeypatch.setenv("DATAPIZZA_AGENT_LOG_LEVEL", "WARNING")
+
+
+TABLE = {
+    "output_reserve": 100,
+    "routes": [
+        {
+            "name": "small",
+            "provider": "stand-in",
+            "model": "small",
+            "max_tokens": 1000,
+            "context_limit": 1000,
+            "latency_target": 1.0,
+        },
+        {
+            "name": "large",
+            "provider": "stand-in",
+            "model": "large",
+            "context_limit": 10000,
+        },
+    ],
+}
+
+
+def test_select_by_threshold_context_and_latency():
+    router = Router.from_dict(TABLE)
+    assert router.select(500).route.name == "small"
+    # within max_tokens, but no room left for the answer
+    assert router.select(950).route.name == "large"
+    fallback = router.select(50000)
+    assert fallback.route.name == "large"
+    assert fallback.reason == "exceeds every context limit"
+
+    # the small model turns out to take 10ms per token: 500 tokens miss 1s
+    router.observe(router.routes[0], 100, 1.0)
+    decision = router.select(500)
+    assert decision.route.name == "large" and decision.predicted_latency is None
+    assert router.select(50).route.name == "small"
+
+    with pytest.raises(ValueError):
+        Router.from_dict({"routes": [{"name": "x", "model": "m"}]})
+    with pytest.raises(ValueError):
+        Router([])
+    assert Router([Route("a", "google", max_tokens=1)]).identity() != (
+        Router([Route("a", "google", max_tokens=2)]).identity()
+    )
+
+
+def test_runner_routes_each_prompt(tmp_path):
+    (tmp_path / "A.sol").write_text("contract A { function send() external {} }")
+    table = tmp_path / "routes.json"
+    table.write_text(json.dumps(TABLE))
+    router = Router.from_file(str(table))
+
+    runner = AgentRunner("p", str(tmp_path), str(tmp_path / "o.json"), router=router)
+    out = runner.run()
+    assert [e["sourceFunction"]["name"] for e in out["policy"]] == ["send"]
+    assert runner.metrics.counters["routes.small"] == 1
+    assert runner.client_id() == router.identity()
+    assert router.predicted_latency(router.routes[0], 10) is not None
+
+    (tmp_path / "B.sol").write_text("contract B { /* %s */ }" % ("x" * 8000))
+    runner.run()
+    assert runner.metrics.counters["routes.large"] == 1
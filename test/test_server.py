@@ -0,0 +1,216 @@
+import http.client
+import io
+import json
+import socket
+import tarfile
+import threading
+import time
+
+import pytest
+
+from src.agent_runner import AgentRunner
+from src.server import JobManager, make_server
+
+
+class UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def _request(conn, method, path, body=None, ctype="application/json"):
+    if isinstance(body, dict):
+        body = json.dumps(body).encode()
+    conn.request(method, path, body=body, headers={"Content-Type": ctype})
+    resp = conn.getresponse()
+    return resp.status, json.loads(resp.read())
+
+
+def _wait(conn, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        _, job = _request(conn, "GET", f"/jobs/{job_id}")
+        if job["status"] in ("done", "failed", "cancelled"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def serve(tmp_path, fake_agent):
+    servers = []
+
+    def start(socket_path=None, **kwargs):
+        manager = JobManager(
+            lambda target, output: AgentRunner("p", target, output, client=object()),
+            str(tmp_path / "data"),
+            **kwargs,
+        )
+        server = make_server(manager, port=0, socket_path=socket_path)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        manager.start()
+        servers.append((server, manager))
+        if socket_path:
+            return UnixConnection(socket_path), manager
+        return http.client.HTTPConnection(*server.server_address), manager
+
+    yield start
+    for server, manager in servers:
+        server.shutdown()
+        server.server_close()
+        manager.stop()
+
+
+def test_path_and_archive_jobs_over_http(tmp_path, serve):
+    conn, _ = serve(allowed_roots=[str(tmp_path / "repo")])
+    (tmp_path / "repo").mkdir()
+    (tmp_path / "repo" / "A.sol").write_text(
+        "contract A { function send() external {} }"
+    )
+
+    status, job = _request(
+        conn, "POST", "/jobs", {"target_path": str(tmp_path / "repo")}
+    )
+    assert status == 202 and job["status"] == "queued"
+    assert _wait(conn, job["id"])["entries"] == 1
+    status, out = _request(conn, "GET", f"/jobs/{job['id']}/result")
+    assert status == 200 and out["policy"][0]["sourceFunction"]["name"] == "send"
+
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        data = b"contract B { function relay() external {} }"
+        info = tarfile.TarInfo("pkg/B.sol")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    status, job = _request(
+        conn, "POST", "/jobs?priority=3", buf.getvalue(), "application/gzip"
+    )
+    assert status == 202 and job["priority"] == 3
+    assert _wait(conn, job["id"])["status"] == "done"
+    _, out = _request(conn, "GET", f"/jobs/{job['id']}/result")
+    assert out["policy"][0]["sourceFunction"]["name"] == "relay"
+    # the extracted sources are removed once the job finishes
+    assert not any((tmp_path / "data" / "uploads").iterdir())
+
+    assert _request(conn, "POST", "/jobs", {"target_path": str(tmp_path)})[0] == 400
+    assert _request(conn, "GET", "/jobs/unknown")[0] == 404
+    _, listing = _request(conn, "GET", "/jobs")
+    assert len(listing["jobs"]) == 2
+
+
+def test_unsafe_archives_are_rejected(tmp_path, serve):
+    conn, _ = serve()
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        info = tarfile.TarInfo("../escape.sol")
+        info.size = 1
+        tar.addfile(info, io.BytesIO(b"x"))
+    status, body = _request(conn, "POST", "/jobs", buf.getvalue(), "application/x-tar")
+    assert status == 400 and "escapes" in body["error"]
+    assert not (tmp_path / "data" / "escape.sol").exists()
+
+
+def test_malformed_requests_get_400(tmp_path, serve):
+    conn, manager = serve(keep_finished=0, max_extracted_bytes=1000)
+    # a small gzip upload expanding beyond the extraction limit
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        info = tarfile.TarInfo("Big.sol")
+        info.size = 10_000
+        tar.addfile(info, io.BytesIO(b" " * info.size))
+    status, body = _request(conn, "POST", "/jobs", buf.getvalue(), "application/gzip")
+    assert status == 400 and "expands" in body["error"]
+    assert not any((tmp_path / "data" / "uploads").iterdir())
+
+    for priority in (None, [1], {"p": 1}, "high"):
+        spec = {"target_path": str(tmp_path), "priority": priority}
+        assert _request(conn, "POST", "/jobs", spec)[0] == 400, priority
+    conn.putrequest("POST", "/jobs")
+    conn.putheader("Content-Length", "lots")
+    conn.endheaders()
+    resp = conn.getresponse()
+    assert resp.status == 400 and "Content-Length" in json.loads(resp.read())["error"]
+    conn.close()
+
+    # cancelling answers with the job even though it is evicted right away
+    manager.stop()
+    job = manager.submit(str(tmp_path))
+    status, body = _request(conn, "DELETE", f"/jobs/{job.id}")
+    assert status == 200 and body["status"] == "cancelled"
+    assert manager.get(job.id) is None
+
+
+def test_priority_order_queue_limit_and_unix_socket(tmp_path, serve):
+    conn, manager = serve(socket_path=str(tmp_path / "s.sock"), workers=1, queue_size=3)
+    release = threading.Event()
+    order = []
+
+    class Blocking:
+        def __init__(self, target, output):
+            self.target = target
+
+        def run(self):
+            order.append(self.target.rsplit("/", 1)[-1])
+            release.wait(5)
+            return {"policy": []}
+
+    manager.runner_factory = Blocking
+    for name in ["first", "low", "high", "mid"]:
+        (tmp_path / name).mkdir()
+    jobs = {}
+    _, jobs["first"] = _request(
+        conn, "POST", "/jobs", {"target_path": str(tmp_path / "first")}
+    )
+    while not order:
+        time.sleep(0.01)
+    for name, priority in [("low", 0), ("high", 9), ("mid", 5)]:
+        status, jobs[name] = _request(
+            conn,
+            "POST",
+            "/jobs",
+            {"target_path": str(tmp_path / name), "priority": priority},
+        )
+        assert status == 202
+    assert (
+        _request(conn, "POST", "/jobs", {"target_path": str(tmp_path / "low")})[0]
+        == 503
+    )
+    status, cancelled = _request(conn, "DELETE", f"/jobs/{jobs['low']['id']}")
+    assert status == 200 and cancelled["status"] == "cancelled"
+    # the cancelled job no longer takes a place in the queue
+    (tmp_path / "late").mkdir()
+    status, jobs["late"] = _request(
+        conn, "POST", "/jobs", {"target_path": str(tmp_path / "late")}
+    )
+    assert status == 202
+
+    release.set()
+    for job in jobs.values():
+        _wait(conn, job["id"])
+    assert order == ["first", "high", "mid", "late"]
+    _, health = _request(conn, "GET", "/health")
+    assert health["jobs"] == {"done": 4, "cancelled": 1}
+
+
+def test_finished_jobs_are_evicted_beyond_the_retention_limit(tmp_path, serve):
+    conn, manager = serve(workers=1, keep_finished=2)
+    (tmp_path / "repo").mkdir()
+    (tmp_path / "repo" / "A.sol").write_text(
+        "contract A { function send() external {} }"
+    )
+    ids = []
+    for _ in range(4):
+        _, job = _request(
+            conn, "POST", "/jobs", {"target_path": str(tmp_path / "repo")}
+        )
+        _wait(conn, job["id"])
+        ids.append(job["id"])
+
+    assert [job.id for job in manager.jobs()] == ids[2:]
+    assert _request(conn, "GET", f"/jobs/{ids[0]}")[0] == 404
+    results = tmp_path / "data" / "results"
+    assert sorted(p.stem for p in results.iterdir()) == sorted(ids[2:])
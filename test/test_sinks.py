@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from src import app
+from src.agent_runner import AgentRunner
+from src.sinks import RunRecord, SqliteSink, open_sink
+
+
+def _entry(name, *events):
+    return {
+        "sourceFunction": {"name": name, "events": list(events)},
+        "destinationFunction": {"name": name},
+    }
+
+
+def test_sqlite_store_lookups(tmp_path):
+    store = SqliteSink(str(tmp_path / "p.db"))
+    store.write_many(
+        [
+            RunRecord(
+                "alpha",
+                "/a",
+                [_entry("send", "Sent", "Fee"), _entry("pause", "Paused")],
+            ),
+            RunRecord("beta", "/b", [_entry("relay", "Sent")]),
+            RunRecord("beta", "/b", [_entry("relay", "Relayed")]),
+        ]
+    )
+    assert [(r["project"], r["function"]) for r in store.find_event("Sent")] == [
+        ("alpha", "send")
+    ]
+    # the older beta run is only visible with all_runs
+    assert len(store.find_event("Sent", all_runs=True)) == 2
+    assert [r["event"] for r in store.find_event("Re*")] == ["Relayed"]
+    assert store.find_function("send")[0]["events"] == "Sent,Fee"
+    assert store.policy("alpha") == {
+        "policy": [_entry("send", "Sent", "Fee"), _entry("pause", "Paused")]
+    }
+    assert [(p["project"], p["runs"], p["entries"]) for p in store.projects()] == [
+        ("alpha", 1, 2),
+        ("beta", 2, 1),
+    ]
+    store.close()
+
+
+def test_runner_sinks_and_query_cli(tmp_path, capsys):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "A.sol").write_text(
+        "contract A { event Sent(); function send() external { emit Sent(); } }"
+    )
+    db, jsonl = tmp_path / "p.db", tmp_path / "runs.jsonl"
+    sinks = [open_sink(f"sqlite:{db}"), open_sink(f"jsonl:{jsonl}")]
+    sinks.append(open_sink(f"json:{tmp_path}/out/{{project}}.json"))
+    runner = AgentRunner("p", str(tmp_path / "src"), None, mode="static", sinks=sinks)
+    out = runner.run()
+    for sink in sinks:
+        sink.close()
+
+    record = json.loads(jsonl.read_text())
+    assert record["project"] == "src" and record["policy"] == out["policy"]
+    assert json.loads((tmp_path / "out" / "src.json").read_text()) == out
+
+    rows = app.main(["query", "--db", str(db), "event", "Sent"])
+    assert rows[0]["project"] == "src" and "send" in capsys.readouterr().out
+    other = tmp_path / "other.json"
+    other.write_text(json.dumps({"policy": [_entry("bridge", "Sent")]}))
+    app.main(["query", "--db", str(db), "import", str(other)])
+    assert len(app.main(["query", "--db", str(db), "event", "Sent"])) == 2
+
+    # bad input ends with a usage error, not a traceback
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json")
+    for argv, message in (
+        (["project", "missing"], "unknown project: missing"),
+        (["import", str(broken)], "cannot import"),
+        (["import", str(tmp_path / "absent.json")], "cannot import"),
+    ):
+        with pytest.raises(SystemExit) as exc:
+            app.main(["query", "--db", str(db)] + argv)
+        assert exc.value.code == 2 and message in capsys.readouterr().err
+    assert len(app.main(["query", "--db", str(db), "projects"])) == 2
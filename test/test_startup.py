@@ -0,0 +1,67 @@
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# Cumulative import time allowed for `src.app`, measured with `-X importtime`.
+# Importing the datapizza provider SDKs alone takes several seconds.
+STARTUP_BUDGET_SECONDS = 1.0
+
+# Top-level packages that must only be imported once an analysis starts
+HEAVY_PACKAGES = {"datapizza", "google", "openai", "opentelemetry", "mcp"}
+
+
+def _imports(*args):
+    """Run Python with `-X importtime` and return {module: cumulative seconds}."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    times = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def _heavy(times):
+    return sorted(m for m in times if m.split(".")[0] in HEAVY_PACKAGES)
+
+
+def test_cli_import_stays_within_startup_budget():
+    times = _imports(
+        "-c",
+        "import src.app; from src.agent_runner import AgentRunner; "
+        "AgentRunner('p', '.', 'out.json')",
+    )
+    assert _heavy(times) == []
+    assert times["src.app"] < STARTUP_BUDGET_SECONDS, times["src.app"]
+
+
+def test_argument_parsing_does_not_import_providers():
+    for argv in (["--help"], ["batch", "--help"], ["serve", "--help"]):
+        assert _heavy(_imports("src/app.py", *argv)) == [], argv
+
+
+def test_static_run_never_imports_providers(tmp_path):
+    (tmp_path / "A.sol").write_text(
+        "contract A { event E(); function f() external { emit E(); } }"
+    )
+    times = _imports(
+        "src/app.py",
+        "--mode",
+        "static",
+        "--target-path",
+        str(tmp_path),
+        "--output-file",
+        str(tmp_path / "out.json"),
+    )
+    assert [m for m in _heavy(times) if not m.startswith("opentelemetry")] == []
+    assert (tmp_path / "out.json").exists()
@@ -0,0 +1,94 @@
+import json
+
+from src.agent_runner import AgentRunner
+from src.indexer import SolidityIndex
+from src.static_analysis import static_policy
+
+BRIDGE = """
+pragma solidity ^0.8.0;
+import "./Base.sol";
+
+contract Bridge is Base {
+    event Sent(bytes32 id);
+    event Received(bytes32 id);
+    event Paused();
+
+    function send(bytes calldata payload) external payable {
+        _dispatch(payload);
+    }
+
+    function receiveMessage(bytes calldata m, bytes calldata sig) external {
+        require(ECDSA.recover(keccak256(m), sig) == relayer);
+        emit Received(keccak256(m));
+    }
+
+    function pause() external onlyOwner {
+        emit Paused();
+    }
+
+    function quote() external view returns (uint256) {
+        return 1;
+    }
+}
+"""
+
+BASE = """
+contract Base {
+    event Dispatched(bytes32 id);
+
+    function _dispatch(bytes calldata payload) internal {
+        endpoint.send{value: msg.value}(payload);
+        emit Dispatched(keccak256(payload));
+    }
+}
+"""
+
+VENDORED = "contract Ownable { event OwnershipTransferred(); function renounce() external { emit OwnershipTransferred(); } }"
+
+
+def _report(sources):
+    return static_policy(SolidityIndex.from_sources(sources))
+
+
+def test_static_policy_entries_and_confidence():
+    report = _report(
+        {"src/Bridge.sol": BRIDGE, "src/Base.sol": BASE, "lib/oz/Ownable.sol": VENDORED}
+    )
+    by_name = {e["sourceFunction"]["name"]: e for e in report.policy}
+    assert list(by_name) == ["send", "receiveMessage", "pause"]
+    # events of internal callees in base contracts are attributed to the caller
+    assert by_name["send"]["sourceFunction"]["events"] == ["Dispatched"]
+    assert by_name["send"]["destinationFunction"]["name"] == "send"
+    signals = {f.function: f.signals for f in report.findings}
+    assert signals["send"] == ["bridge-call", "crosschain-name"]
+    assert "verification" in signals["receiveMessage"]
+    assert report.confidence == (1.0 + 1.0 + 0.5) / 3
+
+    plain = _report(
+        {
+            "Token.sol": "contract T { event E(); function pause() external { emit E(); } }"
+        }
+    )
+    assert plain.confidence == 0.5
+    assert (
+        _report({"Empty.sol": "contract E { function f() external {} }"}).confidence
+        == 1.0
+    )
+
+
+def test_static_and_hybrid_modes(tmp_path, fake_agent):
+    (tmp_path / "Bridge.sol").write_text(BRIDGE)
+    (tmp_path / "Base.sol").write_text(BASE)
+    out = tmp_path / "out.json"
+
+    static = AgentRunner("p", str(tmp_path), str(out), mode="static").run()
+    assert json.loads(out.read_text()) == static
+    assert len(static["policy"]) == 3 and fake_agent == []
+
+    hybrid = AgentRunner("p", str(tmp_path), str(out), client=object(), mode="hybrid")
+    assert hybrid.run() == static and fake_agent == []
+    assert hybrid.metrics.counters["static_accepted"] == 1
+
+    hybrid.static_threshold = 0.99
+    hybrid.run()
+    assert len(fake_agent) == 1
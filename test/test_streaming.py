@@ -0,0 +1,106 @@
+import json
+
+from src.agent_runner import AgentRunner
+from src.formatter import PolicyStreamParser, _merge_policies
+from src.streaming import StreamEmitter
+
+
+def _entry(src, events, dst="d"):
+    return {
+        "sourceFunction": {"name": src, "events": events},
+        "destinationFunction": {"name": dst},
+    }
+
+
+def test_parser_emits_entries_as_they_complete():
+    full = json.dumps({"policy": [_entry('a}"', ["E"]), _entry("b", [])]})
+    doc = "```json\n" + full[: -len("]}")]
+    parser = PolicyStreamParser()
+    completed = []
+    for i in range(0, len(doc), 3):
+        completed.append(len(parser.feed(doc[i : i + 3])))
+    assert sum(completed) == 2
+    # the first entry is available before the end of the document
+    assert completed.index(1) < len(completed) - 1
+    assert not parser.done
+    assert parser.feed("]}") == [] and parser.done
+    assert parser.text == doc + "]}"
+
+
+def test_emitter_merges_and_deduplicates(tmp_path):
+    sink = tmp_path / "s.jsonl"
+    seen = []
+    with StreamEmitter(seen.append, str(sink)) as emitter:
+        assert emitter.add(_entry("a", ["E1"]))
+        assert not emitter.add(_entry("a", ["E1"]))
+        assert not emitter.add(_entry("b", []))
+        assert emitter.add(_entry("a", ["E2", "E1"]))
+    assert [e["sourceFunction"]["events"] for e in seen] == [["E1"], ["E1", "E2"]]
+    lines = [json.loads(line) for line in sink.read_text().splitlines()]
+    assert lines == seen
+
+
+def test_emitter_matches_the_final_merge_on_odd_entries():
+    entries = [
+        _entry("a", [{"n": 1}, {"n": 1}]),
+        {"sourceFunction": "send", "destinationFunction": "recv"},
+        _entry(["x"], ["E"]),
+        _entry("a", [{"n": 1}, "E"]),
+    ]
+    seen = []
+    with StreamEmitter(seen.append) as emitter:
+        assert emitter.add_all(entries) == 2
+    assert seen[-1] == _merge_policies(entries[:1] + entries[3:])[0]
+
+
+def test_runner_streaming_mode(tmp_path, fake_agent):
+    (tmp_path / "A.sol").write_text(
+        "contract A { function send() external {} function relay() external {} }"
+    )
+    seen = []
+    out = AgentRunner(
+        "p",
+        str(tmp_path),
+        str(tmp_path / "out.json"),
+        client=object(),
+        on_entry=seen.append,
+        stream_file=str(tmp_path / "stream.jsonl"),
+    ).run()
+
+    assert [e["sourceFunction"]["name"] for e in seen] == ["send", "relay"]
+    assert len((tmp_path / "stream.jsonl").read_text().splitlines()) == 2
+    assert out["policy"] == seen
+
+
+def test_compact_output_is_streamed(tmp_path, monkeypatch):
+    from datapizza.agents.agent import StepResult
+    from datapizza.core.clients import ClientResponse
+    from datapizza.type import TextBlock
+
+    import src.agent_runner as agent_runner
+
+    text = "```policy\n@events\tSent\nsend\t=\t$1\nrelay\trecv\t$1\n```"
+
+    class CompactAgent:
+        def __init__(self, **kwargs):
+            pass
+
+        def stream_invoke(self, prompt):
+            for i in range(0, len(text), 5):
+                yield ClientResponse(content=[], delta=text[i : i + 5])
+            yield StepResult(index=1, content=[TextBlock(content=text)])
+
+    monkeypatch.setattr(agent_runner, "Agent", CompactAgent)
+    (tmp_path / "A.sol").write_text("contract A {}")
+    seen = []
+    runner = AgentRunner(
+        "p",
+        str(tmp_path),
+        str(tmp_path / "o.json"),
+        client=object(),
+        on_entry=seen.append,
+        compact_output=True,
+    )
+    out = runner.run()
+    assert [e["destinationFunction"]["name"] for e in seen] == ["send", "recv"]
+    assert out["policy"] == seen
@@ -18,3 +18,65 @@ def test_list_and_read(tmp_path):
 
     content = read_sol_file(str(base), "A.sol")
     assert "contract A" in content
+
+
+BRIDGE = """
+pragma solidity ^0.8.0;
+contract Base {
+    event Dispatched(bytes32 id);
+    function _dispatch(bytes calldata p) internal {
+        endpoint.send(p);
+        emit Dispatched(keccak256(p));
+    }
+}
+
+contract Bridge is Base {
+    event Sent(bytes32 id);
+    function send(bytes calldata p) external {
+        _dispatch(p);
+        emit Sent(keccak256(p));
+    }
+    function send(bytes calldata p, uint256 fee) external payable {}
+}
+"""
+
+
+def test_retrieval_tools(tmp_path):
+    from src.ingest import FileCache, ingest, register_file_cache, unregister_file_cache
+    from src.tools import list_contract_events, read_function, search_code
+
+    (tmp_path / "Bridge.sol").write_text(BRIDGE)
+    (tmp_path / "openzeppelin").mkdir()
+    (tmp_path / "openzeppelin" / "Vendor.sol").write_text(
+        "contract V { function f() external { emit Sent(1); } }"
+    )
+
+    body = read_function(str(tmp_path), "Bridge", "_dispatch")
+    assert body.startswith("// Bridge.sol:5 Base\nfunction _dispatch(")
+    assert "endpoint.send(p);" in body
+    assert read_function(str(tmp_path), "", "send").count("// Bridge.sol") == 2
+    assert "not found" in read_function(str(tmp_path), "Bridge", "missing")
+
+    assert search_code(str(tmp_path), "Sent|endpoint").splitlines() == [
+        "Bridge.sol:5 Base._dispatch calls endpoint.send",
+        "Bridge.sol:13 Bridge.send emits Sent",
+    ]
+    assert "openzeppelin/Vendor.sol" in search_code(str(tmp_path), "^Sent$", True)
+    assert search_code(str(tmp_path), "(").startswith("<invalid pattern")
+
+    events = list_contract_events(str(tmp_path), "Bridge").splitlines()
+    assert (
+        events[0] == "event Sent(bytes32 id); // Bridge.sol:12; emitted by: Bridge.send"
+    )
+    assert events[1].endswith("emitted by: Base._dispatch")
+
+    # during a run the tools are served from the registered cache's index
+    cache = FileCache(str(tmp_path), ingest(str(tmp_path)))
+    register_file_cache(cache)
+    try:
+        (tmp_path / "Bridge.sol").write_text("contract Gone {}")
+        assert "endpoint.send(p);" in read_function(
+            str(tmp_path), "Bridge", "_dispatch"
+        )
+    finally:
+        unregister_file_cache(cache)